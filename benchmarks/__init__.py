@@ -0,0 +1,8 @@
+"""
+Benchmarks for the Wishlists service
+
+Each module can be run with "python -m benchmarks.<module> --help". The
+benchmarks use the database in DATABASE_URI (the testdb database by
+default), create their own rows under a dedicated customer_id and delete
+them again when they finish.
+"""
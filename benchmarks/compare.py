@@ -0,0 +1,100 @@
+"""
+Regression check: compares benchmark results with a saved baseline
+
+Reads two JSON files written by a benchmark (models --output, or the
+--json output of the others), matches their results by the fields that
+are not measurements (name, size, rows, path...) and flags every result
+that got slower than the baseline by more than the threshold:
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.2
+
+Exits with status 1 when there is a regression, so it can gate a build.
+The median time is compared when the benchmark recorded one, the time
+of its single run otherwise.
+"""
+import argparse
+import json
+import sys
+
+# Fields of a result that are measurements rather than what was measured
+MEASUREMENT_SUFFIXES = ("seconds", "bytes", "per_second", "runs", "count", "ratio", "statuses")
+
+
+def load_results(path: str) -> list:
+    """Returns the results of a JSON report, or of a bare list of results"""
+    with open(path, encoding="utf-8") as file:
+        report = json.load(file)
+    return report["results"] if isinstance(report, dict) else report
+
+
+def case_key(result: dict) -> tuple:
+    """Returns what identifies a result: its fields that are not measurements"""
+    return tuple(sorted((key, value) for key, value in result.items() if not key.endswith(MEASUREMENT_SUFFIXES)))
+
+
+def case_seconds(result: dict) -> float:
+    """Returns the time a result is compared on"""
+    return result["median_seconds"] if "median_seconds" in result else result["seconds"]
+
+
+def compare(baseline: list, current: list, threshold: float) -> list:
+    """Returns one comparison per case of current, in its order
+
+    The status of a case is "regression" when it is slower than
+    (1 + threshold) times the baseline, "improvement" when it is faster
+    than the baseline divided by (1 + threshold), "new" when the baseline
+    does not have it and "ok" otherwise.
+    """
+    before = {case_key(result): case_seconds(result) for result in baseline}
+    comparisons = []
+    for result in current:
+        key = case_key(result)
+        seconds = case_seconds(result)
+        comparison = {"case": ", ".join(f"{name}={value}" for name, value in key), "seconds": seconds}
+        if key not in before:
+            comparisons.append(comparison | {"status": "new"})
+            continue
+        ratio = seconds / before[key] if before[key] else float("inf")
+        status = "ok"
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        comparisons.append(comparison | {"baseline_seconds": before[key], "ratio": ratio, "status": status})
+    return comparisons
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline", help="JSON results to compare with")
+    parser.add_argument("current", help="JSON results to check")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown allowed, as a fraction of the baseline")
+    parser.add_argument("--json", action="store_true", help="print the comparisons as JSON")
+    args = parser.parse_args(argv)
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    comparisons = compare(baseline, current, args.threshold)
+    missing = {case_key(result) for result in baseline} - {case_key(result) for result in current}
+    regressions = [comparison for comparison in comparisons if comparison["status"] == "regression"]
+    if args.json:
+        print(json.dumps(comparisons, indent=2))
+    else:
+        print(f"{'case':<60}{'baseline ms':>13}{'ms':>10}{'ratio':>8}  status")
+        for comparison in comparisons:
+            baseline_ms = f"{comparison['baseline_seconds'] * 1e3:.3f}" if "baseline_seconds" in comparison else "-"
+            ratio = f"{comparison['ratio']:.2f}" if "ratio" in comparison else "-"
+            print(
+                f"{comparison['case']:<60}{baseline_ms:>13}{comparison['seconds'] * 1e3:>10.3f}"
+                f"{ratio:>8}  {comparison['status']}"
+            )
+        if missing:
+            print(f"{len(missing)} case(s) of the baseline were not run")
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Database network: a TCP proxy that degrades the link between the service and Postgres
+
+LatencyProxy listens on a local port and forwards every connection to
+the upstream database, delaying what Postgres sends back by latency
+seconds, give or take up to jitter seconds, so that every round trip
+(every query, and every step of connecting) takes that much longer.
+Both directions can be limited to bandwidth bytes per second. With
+reset_probability, every chunk Postgres sends may reset the connection
+instead, reset_connections() resets all of them at once, and with
+refuse set new connections are reset as soon as they are accepted.
+Every setting can be changed with configure() while the proxy runs.
+
+Point DATABASE_URI at the proxy with proxied_uri(), or run it on its own:
+
+    python -m benchmarks.db_proxy --upstream localhost:5432 --port 5433 \\
+        --latency 0.05 --jitter 0.01
+"""
+import argparse
+import queue
+import random
+import socket
+import struct
+import threading
+import time
+from sqlalchemy.engine import make_url
+
+SETTINGS = ("latency", "jitter", "bandwidth", "reset_probability", "refuse")
+CHUNK_SIZE = 65536
+
+
+def reset(sock: socket.socket) -> None:
+    """Closes a socket with a TCP reset instead of the normal shutdown
+
+    Shutting down the reading side first wakes up the thread blocked in
+    recv(), which would otherwise keep the socket open after close().
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        sock.shutdown(socket.SHUT_RD)
+    except OSError:
+        pass
+    sock.close()
+
+
+class Connection:
+    """A client connection and its upstream connection, forwarded in both directions"""
+
+    def __init__(self, proxy, client: socket.socket, server: socket.socket):
+        self.proxy = proxy
+        self.client = client
+        self.server = server
+        self.open_directions = 2
+        self.closing = False  # set when the connection is reset
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts forwarding, with one reading and one writing thread per direction"""
+        for source, target, from_server in ((self.client, self.server, False), (self.server, self.client, True)):
+            chunks = queue.Queue()
+            threading.Thread(target=self._read, args=(source, chunks, from_server), daemon=True).start()
+            threading.Thread(target=self._write, args=(chunks, target, from_server), daemon=True).start()
+
+    def _read(self, source: socket.socket, chunks: queue.Queue, from_server: bool) -> None:
+        """Queues what source sends with the time it is due to be forwarded"""
+        try:
+            while data := source.recv(CHUNK_SIZE):
+                chunks.put((time.monotonic() + (self.proxy.delay() if from_server else 0), data))
+        except OSError:
+            pass
+        chunks.put(None)
+
+    def _write(self, chunks: queue.Queue, target: socket.socket, from_server: bool) -> None:
+        """Forwards the queued chunks to target in order, when they are due and the bandwidth allows"""
+        free_at = 0.0  # when the link has sent the previous chunk
+        try:
+            while (chunk := chunks.get()) is not None:
+                due, data = chunk
+                if from_server and self.proxy.should_reset():
+                    self.reset()
+                    return
+                send_at = max(due, free_at)
+                time.sleep(max(0.0, send_at - time.monotonic()))
+                target.sendall(data)
+                bandwidth = self.proxy.bandwidth
+                free_at = max(send_at, time.monotonic()) + (len(data) / bandwidth if bandwidth else 0)
+            if not self.closing:  # a reset must not be preceded by a normal end of stream
+                target.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        finally:
+            self._close_direction()
+
+    def _close_direction(self) -> None:
+        """Closes both sockets once neither direction has anything left to forward"""
+        with self.lock:
+            self.open_directions -= 1
+            if self.open_directions:
+                return
+        self.client.close()
+        self.server.close()
+        self.proxy.forget(self)
+
+    def reset(self) -> None:
+        """Resets both sides of the connection"""
+        self.closing = True
+        self.proxy.forget(self, was_reset=True)  # before both directions end and forget it as closed
+        reset(self.client)
+        reset(self.server)
+
+
+class LatencyProxy:  # pylint: disable=too-many-instance-attributes
+    """Forwards local connections to upstream through a degraded network
+
+    upstream is the (host, port) of Postgres, and port 0 listens on a
+    free port (see address once started). The settings are passed as
+    keyword arguments, see configure().
+    """
+
+    def __init__(self, upstream: tuple, port: int = 0, host: str = "127.0.0.1", seed: int = None, **settings):
+        self.upstream = upstream
+        self.address = (host, port)
+        self.random = random.Random(seed)
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.bandwidth = None
+        self.reset_probability = 0.0
+        self.refuse = False
+        self.configure(**settings)
+        self.listener = None
+        self.connections = set()
+        self.stats = {"connections": 0, "resets": 0}
+        self.lock = threading.Lock()
+
+    def configure(self, **settings) -> None:
+        """Changes the settings of the proxy, for the connections that are open too
+
+        latency and jitter are in seconds, bandwidth in bytes per second
+        (None for no limit), reset_probability is the chance that a chunk
+        from Postgres resets the connection instead of being forwarded, and
+        refuse resets the new connections.
+        """
+        unknown = set(settings) - set(SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+        for name in ("latency", "jitter", "reset_probability"):
+            if settings.get(name, 0) < 0:
+                raise ValueError(f"{name} cannot be negative")
+        if settings.get("bandwidth") is not None and settings["bandwidth"] <= 0:
+            raise ValueError("bandwidth must be more than 0")
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def delay(self) -> float:
+        """Returns how long to hold the next chunk from Postgres"""
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def should_reset(self) -> bool:
+        """Returns True if the next chunk from Postgres should reset its connection"""
+        return bool(self.reset_probability) and self.random.random() < self.reset_probability
+
+    @property
+    def port(self) -> int:
+        """The port the proxy listens on"""
+        return self.address[1]
+
+    def proxied_uri(self, database_uri: str) -> str:
+        """Returns database_uri with its host and port replaced by the proxy's"""
+        url = make_url(database_uri).set(host=self.address[0], port=self.port)
+        return url.render_as_string(hide_password=False)
+
+    def start(self) -> "LatencyProxy":
+        """Starts accepting connections and returns the proxy"""
+        self.listener = socket.create_server(self.address)
+        self.address = self.listener.getsockname()[:2]
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stops accepting connections and resets the open ones"""
+        if self.listener:
+            self.listener.shutdown(socket.SHUT_RDWR)  # wakes up accept()
+            self.listener.close()
+            self.listener = None
+        self.reset_connections()
+
+    def reset_connections(self) -> int:
+        """Resets every open connection and returns how many there were"""
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.reset()
+        return len(connections)
+
+    def forget(self, connection: Connection, was_reset: bool = False) -> None:
+        """Removes a connection that was closed"""
+        with self.lock:
+            if connection in self.connections:
+                self.connections.discard(connection)
+                self.stats["resets"] += was_reset
+
+    def _accept(self) -> None:
+        listener = self.listener
+        while True:
+            try:
+                client, _ = listener.accept()
+            except OSError:
+                return  # the proxy was stopped
+            if self.refuse:
+                reset(client)
+                continue
+            try:
+                server = socket.create_connection(self.upstream, timeout=10)
+                server.settimeout(None)
+            except OSError:
+                reset(client)
+                continue
+            connection = Connection(self, client, server)
+            with self.lock:
+                self.connections.add(connection)
+                self.stats["connections"] += 1
+            connection.start()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def host_port(value: str) -> tuple:
+    """Parses host:port"""
+    host, _, port = value.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def main(argv=None):
+    """Runs the proxy from the command line until it is interrupted"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--upstream", type=host_port, default=("localhost", 5432), help="Postgres host:port")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=5433, help="port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every round trip")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds the latency varies by, either way")
+    parser.add_argument("--bandwidth", type=int, help="bytes per second in each direction")
+    parser.add_argument("--reset-probability", type=float, default=0.0, help="chance a chunk resets its connection")
+    parser.add_argument("--seed", type=int, help="seed of the jitter and resets")
+    args = parser.parse_args(argv)
+    try:
+        proxy = LatencyProxy(
+            args.upstream, args.port, args.host, args.seed, latency=args.latency, jitter=args.jitter,
+            bandwidth=args.bandwidth, reset_probability=args.reset_probability,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    with proxy:
+        print(f"Forwarding {proxy.address[0]}:{proxy.port} to {args.upstream[0]}:{args.upstream[1]}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"Stopped after {proxy.stats['connections']} connections and {proxy.stats['resets']} resets")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,85 @@
+"""
+Export benchmark: list endpoint vs. streaming NDJSON export
+
+Compares the peak memory of building the expanded list of Wishlists
+that GET /api/wishlists?expand=items returns with streaming the same
+documents from a server-side cursor as the export does, for growing
+numbers of Wishlists:
+
+    python -m benchmarks.export --rows 1000 10000 50000
+"""
+# pylint: disable=duplicate-code
+import argparse
+import json
+from benchmarks.common import (
+    app, create_wishlists, delete_wishlists, measure, BENCHMARK_CUSTOMER_ID
+)
+from service.models import Wishlists, WishlistRecord
+from service.routes import expanded_wishlist_serializers, wishlist_json_keys
+
+ITEMS_PER_WISHLIST = 5
+
+
+def list_wishlists():
+    """Builds the expanded list of Wishlists like the list endpoint"""
+    serialize = expanded_wishlist_serializers(None)
+    wishlists = WishlistRecord.find_all(
+        Wishlists.filters(customer_id=BENCHMARK_CUSTOMER_ID), expand_items=True
+    )
+    return len(json.dumps([serialize(wishlist) for wishlist in wishlists]))
+
+
+def export_wishlists():
+    """Streams the Wishlists like the export, discarding each line once written"""
+    keys, item_keys = wishlist_json_keys(expand_items=True)
+    documents = WishlistRecord.stream_json(
+        Wishlists.filters(customer_id=BENCHMARK_CUSTOMER_ID), keys, item_keys
+    )
+    size = 0
+    for partition in documents.partitions():
+        size += len("\n".join(partition)) + 1
+    return size
+
+
+def run(sizes: list, repeat: int) -> list:
+    """Measures both paths for every number of Wishlists"""
+    results = []
+    for rows in sizes:
+        try:
+            create_wishlists(rows, items_per_wishlist=ITEMS_PER_WISHLIST)
+            for path, func in (("list", list_wishlists), ("export", export_wishlists)):
+                result = measure(func, repeat)
+                result.update(path=path, rows=rows)
+                result["rows_per_second"] = round(rows / result["seconds"])
+                results.append(result)
+        finally:
+            delete_wishlists()
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000, 10000, 50000], help="numbers of Wishlists"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per path")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        results = run(args.rows, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'rows':>8}  {'path':<8}{'ms':>10}{'rows/s':>12}{'peak MiB':>10}")
+    for result in results:
+        print(
+            f"{result['rows']:>8}  {result['path']:<8}"
+            f"{result['seconds'] * 1000:>10.1f}{result['rows_per_second']:>12,}"
+            f"{result['peak_bytes'] / 2**20:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
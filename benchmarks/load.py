@@ -0,0 +1,325 @@
+"""
+Load test: drives gunicorn wsgi:app with a mix of requests
+
+Starts gunicorn (or uses the server at --url), creates Wishlists with
+items for the benchmark customer, and sends requests at an open-loop
+arrival rate for the given duration, picking every request from the mix
+of routes by weight:
+
+    python -m benchmarks.load --rate 100 --duration 30 --workers 2 \\
+        --mix read=70,add=15,move=10,search=5
+
+Arrivals follow a Poisson process (or are evenly spaced with --arrivals
+uniform) and do not wait for the responses, so a slow server builds a
+backlog instead of slowing the load down. The latency of a request is
+measured from the time it was scheduled, so that backlog is included.
+Latency percentiles, throughput and error rates are reported per route.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import count
+from urllib.parse import urlencode, urlsplit
+from sqlalchemy.engine import make_url
+from benchmarks.common import app, db, create_wishlists, delete_wishlists, BENCHMARK_CUSTOMER_ID
+from benchmarks.db_proxy import LatencyProxy
+
+# The routes of the mix: what they request and the statuses that are not errors
+ROUTES = {
+    "read": ("GET /api/wishlists/{wishlist_id}/items/{product_id}", {200}),
+    "items": ("GET /api/wishlists/{wishlist_id}/items", {200}),
+    "get": ("GET /api/wishlists/{wishlist_id}", {200}),
+    "add": ("POST /api/wishlists/{wishlist_id}/items", {201}),
+    "move": ("PATCH /api/wishlists/{wishlist_id}/items/{product_id}", {204}),
+    "search": ("GET /api/wishlists?{query}", {200}),
+}
+DEFAULT_MIX = "read=70,add=15,move=10,search=5"
+PERCENTILES = (50, 90, 99)
+
+
+def parse_mix(text: str) -> dict:
+    """Returns the weights of a mix written as route=weight,route=weight"""
+    mix = {}
+    for part in text.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip() not in ROUTES:
+            raise ValueError(f"Unknown route '{route.strip()}', expected one of {', '.join(ROUTES)}")
+        try:
+            mix[route.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight '{weight}' for route '{route.strip()}'") from None
+    if sum(mix.values()) <= 0:
+        raise ValueError("The weights of the mix must add up to more than 0")
+    return mix
+
+
+class Traffic:  # pylint: disable=too-few-public-methods
+    """Draws the requests of the mix against the Wishlists the run created"""
+
+    def __init__(self, mix: dict, wishlist_ids: list, items_per_wishlist: int, seed: int = 42):
+        self.routes = list(mix)
+        self.weights = list(mix.values())
+        self.wishlist_ids = wishlist_ids
+        self.items_per_wishlist = items_per_wishlist
+        self.random = random.Random(seed)
+        self.product_ids = count(items_per_wishlist)  # new products are never on a Wishlist yet
+
+    def request(self) -> tuple:
+        """Returns the route, method, path and JSON body of the next request"""
+        draw = self.random
+        route = draw.choices(self.routes, self.weights)[0]
+        values = {
+            "wishlist_id": draw.choice(self.wishlist_ids),
+            "product_id": draw.randrange(self.items_per_wishlist),
+            "query": urlencode({"customer_id": BENCHMARK_CUSTOMER_ID, "name": f"wishlist {draw.randrange(10)}"}),
+        }
+        body = None
+        if route == "add":
+            product_id = next(self.product_ids)
+            body = {"product_id": product_id, "description": f"product {product_id}"}
+        elif route == "move":
+            body = {"before_position": (draw.randrange(self.items_per_wishlist) + 1) * 1000}
+        method, path = ROUTES[route][0].split(" ")
+        return route, method, path.format(**values), body
+
+
+class Client:  # pylint: disable=too-few-public-methods
+    """Sends requests over one keep-alive connection per thread"""
+
+    def __init__(self, url: str, timeout: float = 30):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def send(self, method: str, path: str, body=None, content_type: str = "application/json") -> int:
+        """Sends body (bytes, or an object sent as JSON) and returns the status of the response, or 0 if there was none"""
+        return self.fetch(method, path, body, {"Content-Type": content_type})[0]
+
+    def fetch(self, method: str, path: str, body=None, headers: dict = None) -> tuple:
+        """Sends body like send() with headers and returns the status and headers of the response, or 0 and {} if none
+
+        The Content-Type is JSON unless headers give another, and only sent with a body.
+        """
+        payload = body if body is None or isinstance(body, bytes) else json.dumps(body)
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        if body is None:
+            del headers["Content-Type"]
+        for _ in range(2):  # the server may have closed an idle connection
+            if getattr(self.local, "connection", None) is None:
+                self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.local.connection.request(method, path, payload, headers)
+                response = self.local.connection.getresponse()
+                response.read()
+                return response.status, response.headers
+            except (OSError, http.client.HTTPException):
+                self.local.connection.close()
+                self.local.connection = None
+        return 0, {}
+
+
+def arrivals(rate: float, duration: float, uniform: bool, seed: int = 42):
+    """Yields the times of the requests, in seconds from the start"""
+    draw = random.Random(seed)
+    at = 0.0
+    while True:
+        at += 1 / rate if uniform else draw.expovariate(rate)
+        if at >= duration:
+            return
+        yield at
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """Returns the nearest-rank percentile of sorted values"""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(name: str, latencies: list, statuses: Counter, errors: int, seconds: float) -> dict:
+    """Returns the latency percentiles, throughput and error rate of a route"""
+    latencies = sorted(latencies)
+    result = {
+        "route": name,
+        "request_count": len(latencies),
+        "error_count": errors,
+        "error_ratio": errors / len(latencies) if latencies else 0,
+        "throughput_per_second": len(latencies) / seconds,
+        "statuses": {str(code): number for code, number in sorted(statuses.items())},
+    }
+    for percent in PERCENTILES:
+        result[f"p{percent}_seconds"] = percentile(latencies, percent) if latencies else 0
+    result["max_seconds"] = latencies[-1] if latencies else 0
+    result["median_seconds"] = result["p50_seconds"]
+    return result
+
+
+def send_all(client: Client, schedule, concurrency: int) -> tuple:
+    """Sends the requests of schedule at their times and returns what they got and how long it all took
+
+    schedule yields (seconds from the start, tag, method, path, body,
+    headers) tuples, and one (tag, status, latency, headers) record is
+    returned per request, in the order the responses came back.
+    """
+    records = []
+    lock = threading.Lock()
+
+    def send(request, scheduled):
+        tag, *request = request
+        status, headers = client.fetch(*request)
+        latency = time.perf_counter() - scheduled
+        with lock:
+            records.append((tag, status, latency, headers))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for at, *request in schedule:
+            delay = start + at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, request, start + at)
+    return records, time.perf_counter() - start
+
+
+def run(client: Client, traffic: Traffic, arrival_times, concurrency: int) -> list:
+    """Sends the requests at their arrival times and returns the results per route and in total"""
+    schedule = ((at, *traffic.request(), None) for at in arrival_times)
+    records, seconds = send_all(client, schedule, concurrency)
+    return report(records, traffic.routes, seconds)
+
+
+def report(records: list, routes: list, seconds: float) -> list:
+    """Returns the results of (route, status, latency, headers) records per route and in total"""
+    results = []
+    for name in routes + [None]:
+        route_records = [record for record in records if name in (None, record[0])]
+        statuses = Counter(status for _, status, *_ in route_records)
+        errors = sum(status not in ROUTES[route][1] for route, status, *_ in route_records)
+        latencies = [latency for _, _, latency, *_ in route_records]
+        results.append(summarize(name or "total", latencies, statuses, errors, seconds))
+    return results
+
+
+def free_port() -> int:
+    """Returns a TCP port that nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, database_uri: str = None, timeout: float = 30, environment: dict = None) -> tuple:
+    """Starts gunicorn wsgi:app on a free port with environment set and returns the process and its URL once it answers"""
+    port = free_port()
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+         "--log-level", "warning", "wsgi:app"],
+        env=os.environ | {"DATABASE_URI": database_uri or os.environ["DATABASE_URI"]} | (environment or {}),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    client = Client(url, timeout=1)
+    deadline = time.monotonic() + timeout
+    while client.send("GET", "/health") != 200:
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError(f"gunicorn did not start on port {port}: start it yourself and use --url to see why")
+        time.sleep(0.2)
+    return server, url
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the options of the server to test, and of the network between it and Postgres"""
+    parser.add_argument("--url", help="server to test instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers to start")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added to every round trip with Postgres")
+    parser.add_argument("--db-jitter", type=float, default=0.0, help="seconds the database latency varies by")
+    parser.add_argument("--db-bandwidth", type=int, help="bytes per second between gunicorn and Postgres")
+    parser.add_argument("--db-reset-probability", type=float, default=0.0,
+                        help="chance that a chunk from Postgres resets its connection")
+
+
+@contextmanager
+def serve(args: argparse.Namespace, environment: dict = None):
+    """Yields the URL of the server to test, starting gunicorn with environment behind a LatencyProxy if needed"""
+    if args.url:
+        yield args.url
+        return
+    settings = {"latency": args.db_latency, "jitter": args.db_jitter, "bandwidth": args.db_bandwidth,
+                "reset_probability": args.db_reset_probability}
+    database_uri = make_url(os.environ["DATABASE_URI"])
+    with ExitStack() as stack:
+        proxied_uri = None
+        if any(settings.values()):
+            proxy = LatencyProxy((database_uri.host, database_uri.port or 5432), **settings)
+            proxied_uri = stack.enter_context(proxy).proxied_uri(os.environ["DATABASE_URI"])
+        server, url = start_server(args.workers, proxied_uri, environment=environment)
+        try:
+            yield url
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def print_results(results: list) -> None:
+    """Prints the results as a table"""
+    print(f"{'route':<10}{'requests':>10}{'req/s':>9}{'errors':>8}"
+          + "".join(f"{f'p{percent} ms':>10}" for percent in PERCENTILES) + f"{'max ms':>10}  statuses")
+    for result in results:
+        print(
+            f"{result['route']:<10}{result['request_count']:>10}{result['throughput_per_second']:>9.1f}"
+            f"{result['error_ratio']:>8.1%}"
+            + "".join(f"{result[f'p{percent}_seconds'] * 1e3:>10.1f}" for percent in PERCENTILES)
+            + f"{result['max_seconds'] * 1e3:>10.1f}  "
+            + " ".join(f"{code}:{number}" for code, number in result["statuses"].items())
+        )
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=50, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to send requests for")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weights of the routes ({', '.join(ROUTES)})")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson", help="spacing of the requests")
+    parser.add_argument("--concurrency", type=int, default=64, help="most requests in flight")
+    parser.add_argument("--wishlists", type=int, default=100, help="Wishlists to create")
+    parser.add_argument("--items", type=int, default=20, help="items per Wishlist")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the arrivals and requests")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as error:
+        parser.error(str(error))
+
+    with app.app_context():
+        wishlist_ids = create_wishlists(args.wishlists, items_per_wishlist=args.items)
+        db.session.remove()
+        try:
+            with serve(args) as url:
+                traffic = Traffic(mix, wishlist_ids, args.items, args.seed)
+                schedule = arrivals(args.rate, args.duration, args.arrivals == "uniform", args.seed)
+                results = run(Client(url), traffic, schedule, args.concurrency)
+        finally:
+            delete_wishlists()
+
+    if args.json:
+        print(json.dumps({"benchmark": "load", "rate": args.rate, "mix": mix, "results": results}, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
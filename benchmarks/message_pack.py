@@ -0,0 +1,65 @@
+"""
+Payload benchmark: JSON vs. MessagePack
+
+Encodes and decodes 1, 100 and 10k expanded Wishlists (5 items each), as
+the service sends them, with the JSON backend in use and with MessagePack,
+and reports the payload sizes and the time per call:
+
+    python -m benchmarks.message_pack
+"""
+import argparse
+import json
+import timeit
+from functools import partial
+from benchmarks.common import app
+from benchmarks.serializers import make_records
+from service.common.message_pack import packb, unpackb
+from service.common.serializers import compile_serializer
+from service.models import Wishlists
+from service.routes import wishlist_expanded_model
+
+SIZES = (1, 100, 10000)
+
+
+def run(repeat: int) -> list:
+    """Measures both formats for every size and returns the results"""
+    serialize = compile_serializer(wishlist_expanded_model, Wishlists)
+    formats = {
+        f"json ({app.json.backend})": (app.json.encode, app.json.loads),
+        "msgpack": (packb, unpackb),
+    }
+    results = []
+    for size in SIZES:
+        payload = [serialize(record) for record in make_records(size, 5)]
+        number = max(1, 10000 // size)
+        for name, (encode, decode) in formats.items():
+            encoded = encode(payload)
+            assert decode(encoded) == payload, f"{name} does not round-trip"
+            result = {"objects": size, "format": name, "bytes": len(encoded)}
+            for operation, func in (("encode", partial(encode, payload)), ("decode", partial(decode, encoded))):
+                result[operation] = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per format")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'objects':>8}  {'format':<16}{'bytes':>12}{'encode us':>12}{'decode us':>12}")
+    for result in results:
+        print(
+            f"{result['objects']:>8}  {result['format']:<16}{result['bytes']:>12,}"
+            f"{result['encode'] * 1e6:>12.1f}{result['decode'] * 1e6:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Model microbenchmark: serialization, finders and item ordering
+
+Times Wishlists.serialize/deserialize, every Wishlists.find_* finder,
+reposition, move_item (with and without the reposition fallback) and
+WishlistItems.find_last_position at several data sizes, and writes the
+results as JSON that benchmarks.compare checks against a baseline:
+
+    python -m benchmarks.models --sizes 10 100 1000 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+The size is the number of Wishlists of the benchmark customer for the
+Wishlist operations, and the number of items of one Wishlist for the
+item operations.
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+import sqlalchemy
+from sqlalchemy import text
+from sqlalchemy.orm import selectinload
+from benchmarks.common import app, db, create_wishlists, delete_wishlists, BENCHMARK_CUSTOMER_ID
+from service.models import Wishlists, WishlistItems
+
+
+def set_positions(wishlist_id: int, step: int) -> None:
+    """Numbers the items of a Wishlist step, 2 * step, ... in product order"""
+    db.session.execute(
+        text("UPDATE wishlist_items SET position = (product_id + 1) * :step WHERE wishlist_id = :id"),
+        {"step": step, "id": wishlist_id},
+    )
+    db.session.commit()
+    db.session.remove()
+
+
+def fresh(value=None):
+    """Returns a setup that starts every run with an empty session"""
+
+    def setup():
+        db.session.remove()
+        return value
+
+    return setup
+
+
+def loaded(wishlist_ids: list):
+    """Returns a setup that loads the Wishlists with these ids, with their items, into an empty session"""
+
+    def setup():
+        db.session.remove()
+        wishlists = Wishlists.query.filter(Wishlists.id.in_(wishlist_ids)).options(selectinload(Wishlists.wishlist_items))
+        return wishlists.all()
+
+    return setup
+
+
+def wishlist_cases(size: int, ids: list) -> dict:
+    """Benchmarks of the Wishlist operations, as {name: (setup, func)}
+
+    func is timed on what setup returns, and setup runs untimed before
+    every run.
+    """
+    middle = ids[len(ids) // 2]
+    payloads = [{"customer_id": BENCHMARK_CUSTOMER_ID, "name": f"wishlist {n}", "category": "gifts",
+                 "created_date": "2025-01-31"} for n in range(size)]
+    return {
+        "serialize": (loaded(ids), lambda wishlists: [wishlist.serialize(expand_items=False) for wishlist in wishlists]),
+        "deserialize": (fresh(payloads), lambda data: [Wishlists().deserialize(payload) for payload in data]),
+        "find": (fresh(), lambda _: Wishlists.find(middle)),
+        "find_by_id": (fresh(), lambda _: Wishlists.find_by_id(middle)),
+        "find_version": (fresh(), lambda _: Wishlists.find_version(middle)),
+        "find_all_by_customer_id": (fresh(), lambda _: Wishlists.find_all_by_customer_id(BENCHMARK_CUSTOMER_ID)),
+        "find_all_by_customer_id_and_name_like": (
+            fresh(), lambda _: Wishlists.find_all_by_customer_id_and_name_like(BENCHMARK_CUSTOMER_ID, "wishlist 1")
+        ),
+        "find_by_category": (fresh(), lambda _: Wishlists.find_by_category("garden")),
+        "find_by_name_like": (fresh(), lambda _: Wishlists.find_by_name_like("wishlist 1")),
+        "find_by_customer_and_category": (
+            fresh(), lambda _: Wishlists.find_by_customer_and_category(BENCHMARK_CUSTOMER_ID, "garden")
+        ),
+        "find_by_customer_category_name_like": (
+            fresh(), lambda _: Wishlists.find_by_customer_category_name_like(BENCHMARK_CUSTOMER_ID, "garden", "1")
+        ),
+    }
+
+
+def item_cases(size: int, wishlist_id: int) -> dict:
+    """Benchmarks of the item operations on a Wishlist of size items, as {name: (setup, func)}"""
+    last = size - 1  # product_id of the last item
+    return {
+        "serialize_items": (loaded([wishlist_id]), lambda wishlists: wishlists[0].serialize()),
+        # every item is renumbered
+        "reposition": (lambda: set_positions(wishlist_id, 1), lambda _: Wishlists.reposition(wishlist_id)),
+        # the last item moves halfway between two others
+        "move_item": (
+            lambda: set_positions(wishlist_id, 1000),
+            lambda _: Wishlists.move_item(wishlist_id, last, (size // 2 + 1) * 1000),
+        ),
+        # there is no room before the second item: every item is renumbered first
+        "move_item_reposition": (
+            lambda: set_positions(wishlist_id, 1),
+            lambda _: Wishlists.move_item(wishlist_id, last, 2),
+        ),
+        "find_last_position": (fresh(), lambda _: WishlistItems.find_last_position(wishlist_id)),
+    }
+
+
+def time_case(setup, func, repeat: int) -> dict:
+    """Runs setup then times func repeat times and returns the fastest and median run"""
+    timings = []
+    for _ in range(repeat):
+        value = setup()
+        start = time.perf_counter()
+        func(value)
+        timings.append(time.perf_counter() - start)
+    db.session.remove()
+    return {"min_seconds": min(timings), "median_seconds": statistics.median(timings), "runs": repeat}
+
+
+def run(sizes: list, repeat: int, progress=None) -> list:
+    """Times every case at every size and returns one result per case and size"""
+    results = []
+    for size in sizes:
+        try:
+            ids = create_wishlists(size)
+            (wishlist_id,) = create_wishlists(1, items_per_wishlist=max(size, 2))
+            cases = wishlist_cases(size, ids) | item_cases(max(size, 2), wishlist_id)
+            for name, (setup, func) in cases.items():
+                result = {"name": name, "size": size} | time_case(setup, func, repeat)
+                results.append(result)
+                if progress:
+                    progress(result)
+        finally:
+            delete_wishlists()
+    return results
+
+
+def environment() -> dict:
+    """Describes what the results were measured on"""
+    return {
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "postgres": db.session.execute(text("SHOW server_version")).scalar(),
+        "machine": platform.machine(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def print_result(result: dict) -> None:
+    """Prints one result as a line of the table"""
+    print(
+        f"{result['name']:<40}{result['size']:>8}"
+        f"{result['min_seconds'] * 1e3:>12.3f}{result['median_seconds'] * 1e3:>12.3f}"
+    )
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="data sizes")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case and size")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.json:
+        print(f"{'case':<40}{'size':>8}{'min ms':>12}{'median ms':>12}")
+    with app.app_context():
+        results = run(args.sizes, args.repeat, None if args.json else print_result)
+        report = {"benchmark": "models", "environment": environment(), "results": results}
+        db.session.remove()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
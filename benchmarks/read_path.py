@@ -0,0 +1,93 @@
+"""
+Read path benchmark: ORM instances vs. Core records
+
+Compares the memory and throughput of serializing a large result with
+the ORM finders (Wishlists.find_*) and with the read-only records
+(WishlistRecord) used by the GET endpoints:
+
+    python -m benchmarks.read_path --rows 10000
+"""
+import argparse
+import json
+from benchmarks.common import (
+    app, create_wishlists, delete_wishlists, measure, BENCHMARK_CUSTOMER_ID
+)
+from service.models import Wishlists, WishlistRecord
+
+
+def orm_list():
+    """Lists the Wishlists of a customer through the ORM"""
+    return [
+        wishlist.serialize(expand_items=False)
+        for wishlist in Wishlists.find_all_by_customer_id(BENCHMARK_CUSTOMER_ID)
+    ]
+
+
+def record_list():
+    """Lists the Wishlists of a customer through the records"""
+    return [
+        record.serialize(expand_items=False)
+        for record in WishlistRecord.find_all(
+            Wishlists.filters(customer_id=BENCHMARK_CUSTOMER_ID)
+        )
+    ]
+
+
+def orm_items(wishlist_id: int):
+    """Lists the items of a Wishlist through the ORM"""
+    wishlist = Wishlists.find_by_id(wishlist_id)
+    return [item.serialize() for item in wishlist.wishlist_items]
+
+
+def record_items(wishlist_id: int):
+    """Lists the items of a Wishlist through the records"""
+    record = WishlistRecord.find(wishlist_id, ["id"], expand_items=True)
+    return [item.serialize() for item in record.wishlist_items]
+
+
+def run(rows: int, repeat: int) -> list:
+    """Runs every scenario and returns one result per scenario and path"""
+    results = []
+    try:
+        create_wishlists(rows)
+        (big_id,) = create_wishlists(1, items_per_wishlist=rows)
+        scenarios = {
+            "list wishlists": (orm_list, record_list),
+            "list items": (lambda: orm_items(big_id), lambda: record_items(big_id)),
+        }
+        for scenario, (orm, record) in scenarios.items():
+            assert orm() == record(), f"{scenario}: paths disagree"
+            for path, func in (("orm", orm), ("records", record)):
+                result = measure(func, repeat)
+                result.update(scenario=scenario, path=path, rows=rows)
+                result["rows_per_second"] = round(rows / result["seconds"])
+                results.append(result)
+    finally:
+        delete_wishlists()
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000, help="rows per result")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        results = run(args.rows, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<16}{'path':<9}{'ms':>10}{'rows/s':>12}{'peak MiB':>10}")
+    for result in results:
+        print(
+            f"{result['scenario']:<16}{result['path']:<9}"
+            f"{result['seconds'] * 1000:>10.1f}{result['rows_per_second']:>12,}"
+            f"{result['peak_bytes'] / 2**20:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
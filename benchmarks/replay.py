@@ -0,0 +1,186 @@
+"""
+Replay: sends captured requests again and compares their latencies
+
+Reads the NDJSON files written by the request capture (CAPTURE_FILE,
+see service.common.request_capture), including the rotated ones, and
+sends the requests again in their original order and at their original
+pace, or --speed times faster, to gunicorn (started here, or --url):
+
+    python -m benchmarks.replay capture-*.ndjson* --speed 2 --workers 2
+
+Requests whose body was captured only as a hash cannot be sent again and
+are skipped. The latencies are reported per route (the method and path
+with the ids replaced by {id}) next to the recorded ones, with the
+number of responses whose status differs from the recorded one. The
+replay runs against the database in DATABASE_URI, which should hold the
+Wishlists the captured requests refer to.
+
+The recorded latencies were measured by the capture, so the replayed
+ones are too, the same way: the server runs with CAPTURE_FILE set, every
+request is sent with an X-Request-ID that the capture writes down, and
+the seconds it captured for each request are compared with the recorded
+ones, leaving out the network and the client. A server given with --url
+must capture its requests too, to the files given with --replayed:
+
+    python -m benchmarks.replay capture-*.ndjson* --url http://localhost:8080 --replayed replay-*.ndjson
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from benchmarks.load import PERCENTILES, Client, add_server_arguments, percentile, send_all, serve
+
+ID_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+
+def load_capture(paths: list) -> list:
+    """Returns the records of capture files in the order the requests were received"""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            records.extend(json.loads(line) for line in file if line.strip())
+    return sorted(records, key=lambda record: record["time"])
+
+
+def request_body(record: dict):
+    """Returns the body of a captured request, or None if only its hash was captured"""
+    if "body" in record:
+        return record["body"].encode()
+    if "body_base64" in record:
+        return base64.b64decode(record["body_base64"])
+    return b"" if record["body_bytes"] == 0 else None
+
+
+def route_of(record: dict) -> str:
+    """Returns the method and path of a record, with the ids replaced by {id}"""
+    return f"{record['method']} {ID_PATTERN.sub('/{id}', record['path'])}"
+
+
+def schedule(records: list, speed: float, run_id: str):
+    """Yields the requests to send at their original offsets divided by speed, tagged with their id and record
+
+    The ids are run_id-<number>, and are sent as X-Request-ID with the
+    captured Content-Type.
+    """
+    start = datetime.fromisoformat(records[0]["time"])
+    for number, record in enumerate(records):
+        at = (datetime.fromisoformat(record["time"]) - start).total_seconds() / speed
+        path = f"{record['path']}?{record['query']}" if record["query"] else record["path"]
+        body = request_body(record)
+        request_id = f"{run_id}-{number}"
+        headers = {"Content-Type": record.get("content_type") or "application/json", "X-Request-ID": request_id}
+        yield at, (request_id, record), record["method"], path, body or None, headers
+
+
+def replayed_seconds(paths: list, run_id: str, count: int, timeout: float = 5) -> dict:
+    """Returns the seconds captured for the requests of a run by their id, waiting up to timeout for count of them
+
+    A server writes the capture of a request once the response is sent,
+    so the last ones may come a moment after the responses.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        seconds = {
+            record["request_id"]: record["seconds"]
+            for record in load_capture(paths)
+            if record.get("request_id", "").startswith(f"{run_id}-")
+        }
+        if len(seconds) >= count or time.monotonic() > deadline:
+            return seconds
+        time.sleep(0.1)
+
+
+def compare_route(route: str, recorded: list, replayed: list, requests: int, mismatches: int) -> dict:
+    """Returns the recorded and replayed latency percentiles of a route"""
+    recorded, replayed = sorted(recorded), sorted(replayed)
+    result = {"route": route, "request_count": requests, "status_mismatch_count": mismatches}
+    for percent in PERCENTILES:
+        before, after = (percentile(recorded, percent), percentile(replayed, percent)) if replayed else (0, 0)
+        result[f"recorded_p{percent}_seconds"] = before
+        result[f"p{percent}_seconds"] = after
+        result[f"p{percent}_ratio"] = after / before if before else float("inf")
+    result["median_seconds"] = result["p50_seconds"]
+    return result
+
+
+def report(results: list, replayed_by_id: dict) -> list:
+    """Returns the comparison of every route of ((id, record), status, latency, headers) results, and in total
+
+    The recorded seconds are compared with the seconds replayed_by_id
+    holds for the same request; a request without a response, or that was
+    not captured, is only counted, as a status mismatch if it is one.
+    """
+    routes = {}
+    for (request_id, record), status, _, _ in results:
+        seconds = replayed_by_id.get(request_id)
+        for route in (route_of(record), "total"):
+            recorded, replayed, counts = routes.setdefault(route, ([], [], [0, 0]))
+            if seconds is not None:
+                recorded.append(record["seconds"])
+                replayed.append(seconds)
+            counts[0] += 1
+            counts[1] += status != record["status"]
+    total = routes.pop("total", ([], [], [0, 0]))
+    ordered = sorted(routes.items(), key=lambda item: -item[1][2][0]) + [("total", total)]
+    return [compare_route(route, recorded, replayed, *counts) for route, (recorded, replayed, counts) in ordered]
+
+
+def print_results(results: list, skipped: int) -> None:
+    """Prints the comparison as a table"""
+    print(f"{'route':<48}{'requests':>9}{'mismatch':>9}"
+          + "".join(f"{f'p{percent} ms was':>12}{'now':>9}{'ratio':>7}" for percent in PERCENTILES))
+    for result in results:
+        print(
+            f"{result['route']:<48}{result['request_count']:>9}{result['status_mismatch_count']:>9}"
+            + "".join(
+                f"{result[f'recorded_p{percent}_seconds'] * 1e3:>12.1f}{result[f'p{percent}_seconds'] * 1e3:>9.1f}"
+                f"{result[f'p{percent}_ratio']:>7.2f}"
+                for percent in PERCENTILES
+            )
+        )
+    if skipped:
+        print(f"{skipped} request(s) skipped: only the hash of their body was captured")
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="+", help="capture files")
+    parser.add_argument("--speed", type=float, default=1, help="how many times faster than captured to send the requests")
+    parser.add_argument("--concurrency", type=int, default=64, help="most requests in flight")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--replayed", nargs="+", help="capture files of the server given with --url")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be more than 0")
+    if args.url and not args.replayed:
+        parser.error("--url needs --replayed: run the server with CAPTURE_FILE and give its files")
+
+    captured = load_capture(args.files)
+    records = [record for record in captured if request_body(record) is not None]
+    if not records:
+        parser.error("There is no request to replay")
+    run_id = uuid.uuid4().hex[:12]
+    with tempfile.TemporaryDirectory() as folder:
+        with serve(args, {"CAPTURE_FILE": os.path.join(folder, "replay-{pid}.ndjson")}) as url:
+            results, _ = send_all(Client(url), schedule(records, args.speed, run_id), args.concurrency)
+        paths = args.replayed or glob.glob(os.path.join(folder, "replay-*.ndjson*"))
+        replayed = replayed_seconds(paths, run_id, sum(status != 0 for _, status, _, _ in results))
+
+    comparison = report(results, replayed)
+    if args.json:
+        print(json.dumps({"benchmark": "replay", "speed": args.speed, "skipped": len(captured) - len(records),
+                          "results": comparison}, indent=2))
+    else:
+        print_results(comparison, len(captured) - len(records))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Serializer microbenchmark: marshal() over serialize() vs. compiled serializers
+
+Serializes 1, 100 and 10k in-memory Wishlists (with and without 5 items
+each) both ways and reports the time per call:
+
+    python -m benchmarks.serializers
+"""
+import argparse
+import json
+import timeit
+from functools import partial
+from datetime import date, datetime, timezone
+from flask_restx import marshal
+from benchmarks.common import app
+from service.common.serializers import compile_serializer
+from service.models import Wishlists, WishlistRecord, WishlistItemRecord
+from service.routes import wishlist_model, wishlist_expanded_model
+
+SIZES = (1, 100, 10000)
+
+
+def make_records(count: int, items: int) -> list:
+    """Builds count Wishlist records with items each, without touching the database"""
+    now = datetime.now(timezone.utc)
+    records = []
+    for n in range(count):
+        row = (n, 1001, f"wishlist {n}", "a benchmark wishlist", "gifts",
+               date.today(), date.today(), 1, items, now if items else None)
+        record = WishlistRecord(Wishlists.FIELDS, row)
+        record.wishlist_items = [
+            WishlistItemRecord(n, product_id, f"product {product_id}", (product_id + 1) * 1000)
+            for product_id in range(items)
+        ]
+        records.append(record)
+    return records
+
+
+def marshal_records(records: list, model, expand_items: bool) -> list:
+    """Serializes the records the way @api.marshal_with does"""
+    return marshal([record.serialize(expand_items=expand_items) for record in records], model)
+
+
+def compiled_records(records: list, compiled) -> list:
+    """Serializes the records with a compiled serializer"""
+    return [compiled(record) for record in records]
+
+
+def run(repeat: int) -> list:
+    """Times both serializers for every size and returns the results"""
+    results = []
+    for model, items in ((wishlist_model, 0), (wishlist_expanded_model, 5)):
+        expand_items = bool(items)
+        compiled = compile_serializer(model, Wishlists)
+        for size in SIZES:
+            records = make_records(size, items)
+            paths = {
+                "marshal": partial(marshal_records, records, model, expand_items),
+                "compiled": partial(compiled_records, records, compiled),
+            }
+            assert paths["marshal"]() == paths["compiled"](), "serializers disagree"
+            number = max(1, 10000 // size)
+            for path, func in paths.items():
+                seconds = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+                results.append(
+                    {"model": model.name, "objects": size, "path": path, "seconds": seconds}
+                )
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'model':<24}{'objects':>8}  {'path':<10}{'per call':>12}")
+    for result in results:
+        seconds = result["seconds"]
+        per_call = f"{seconds * 1e6:.1f} us" if seconds < 1e-3 else f"{seconds * 1e3:.2f} ms"
+        print(f"{result['model']:<24}{result['objects']:>8}  {result['path']:<10}{per_call:>12}")
+
+
+if __name__ == "__main__":
+    main()
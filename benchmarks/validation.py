@@ -0,0 +1,90 @@
+"""
+Validation microbenchmark: compiled schemas vs. flask-restx validation
+
+Measures the validation cost per request of the POST bodies and of the
+list query string, with the compiled schemas the service uses and with
+what @api.expect(validate=True) and reqparse would do instead:
+
+    python -m benchmarks.validation
+"""
+import argparse
+import json
+import timeit
+from functools import partial
+from flask import request
+from flask_restx import reqparse
+from benchmarks.common import app
+from service.models.schemas import (
+    validate_wishlist,
+    validate_wishlist_item,
+    validate_wishlist_query,
+)
+from service.routes import wishlist_create_model, wishlist_item_create_model
+
+WISHLIST = {
+    "customer_id": 1001,
+    "name": "Birthday",
+    "description": "Things I would like for my birthday",
+    "category": "gifts",
+    "created_date": "2025-01-31",
+}
+WISHLIST_ITEM = {"product_id": 42, "description": "A good book"}
+QUERY = "/api/wishlists?customer_id=1001&name=birth&category=gifts&expand=items"
+
+
+def query_parser() -> reqparse.RequestParser:
+    """The reqparse parser that the list endpoint used before the schemas"""
+    parser = reqparse.RequestParser()
+    parser.add_argument("customer_id", type=int, location="args")
+    parser.add_argument("name", type=str, location="args")
+    parser.add_argument("category", type=str, location="args")
+    parser.add_argument("fields", type=str, location="args")
+    parser.add_argument("expand", type=str, location="args", choices=("items",))
+    return parser
+
+
+def run(number: int, repeat: int) -> list:
+    """Times every validator and returns the per-call results"""
+    parser = query_parser()
+    cases = {
+        "POST /wishlists": {
+            "compiled": partial(validate_wishlist, WISHLIST),
+            "restx": partial(wishlist_create_model.validate, WISHLIST),
+        },
+        "POST /wishlists/<id>/items": {
+            "compiled": partial(validate_wishlist_item, WISHLIST_ITEM),
+            "restx": partial(wishlist_item_create_model.validate, WISHLIST_ITEM),
+        },
+        "GET /wishlists query": {
+            "compiled": lambda: validate_wishlist_query(request.args),
+            "restx": parser.parse_args,
+        },
+    }
+    results = []
+    with app.test_request_context(QUERY):
+        for case, paths in cases.items():
+            for path, func in paths.items():
+                seconds = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+                results.append({"case": case, "path": path, "seconds": seconds})
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000, help="calls per timed run")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.number, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'case':<30}{'path':<10}{'per call':>12}")
+    for result in results:
+        print(f"{result['case']:<30}{result['path']:<10}{result['seconds'] * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,24 @@ Environment for Behave Testing
 
 from os import getenv
 from selenium import webdriver
+from benchmarks.db_proxy import LatencyProxy, host_port
 
 WAIT_SECONDS = int(getenv("WAIT_SECONDS", "30"))
 BASE_URL = getenv("BASE_URL", "http://localhost:8080")
 DRIVER = getenv("DRIVER", "chrome").lower()
 
+# With DB_PROXY_PORT set, a LatencyProxy to DB_PROXY_UPSTREAM listens on that
+# port: start the service with DATABASE_URI pointing at it so that scenarios
+# can degrade its database (see "the database has a latency of ...")
+DB_PROXY_PORT = getenv("DB_PROXY_PORT")
+DB_PROXY_UPSTREAM = getenv("DB_PROXY_UPSTREAM", "localhost:5432")
+DB_PROXY_SETTINGS = {
+    "latency": float(getenv("DB_PROXY_LATENCY", "0")),
+    "jitter": float(getenv("DB_PROXY_JITTER", "0")),
+    "bandwidth": int(getenv("DB_PROXY_BANDWIDTH", "0")) or None,
+    "reset_probability": float(getenv("DB_PROXY_RESET_PROBABILITY", "0")),
+}
+
 
 def before_all(context):
     """Executed once before all tests"""
@@ -22,11 +35,23 @@ def before_all(context):
     context.driver.implicitly_wait(context.wait_seconds)
     context.driver.set_window_size(1280, 1300)
     context.config.setup_logging()
+    context.db_proxy = None
+    if DB_PROXY_PORT:
+        upstream = host_port(DB_PROXY_UPSTREAM)
+        context.db_proxy = LatencyProxy(upstream, int(DB_PROXY_PORT), **DB_PROXY_SETTINGS).start()
+
+
+def after_scenario(context, scenario):  # pylint: disable=unused-argument
+    """Restores the database network a scenario may have degraded"""
+    if context.db_proxy:
+        context.db_proxy.configure(refuse=False, **DB_PROXY_SETTINGS)
 
 
 def after_all(context):
     """Executed after all tests"""
     context.driver.quit()
+    if context.db_proxy:
+        context.db_proxy.stop()
 
 
 ######################################################################
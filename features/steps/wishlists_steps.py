@@ -14,6 +14,8 @@
 # limitations under the License.
 ######################################################################
 
+# pylint: disable=function-redefined
+# flake8: noqa
 """
 Wishlist Steps
 
@@ -59,3 +61,22 @@ def step_impl(context):
         }
         context.resp = requests.post(rest_endpoint, json=payload, timeout=WAIT_TIMEOUT)
         expect(context.resp.status_code).equal_to(HTTP_201_CREATED)
+
+
+@given('the database has a latency of "{milliseconds}" ms')
+def step_impl(context, milliseconds):
+    """Delays every round trip of the service with the database (needs DB_PROXY_PORT)"""
+    if not context.db_proxy:
+        context.scenario.skip("DB_PROXY_PORT is not set")
+        return
+    context.db_proxy.configure(latency=int(milliseconds) / 1000)
+
+
+@given("the database drops its connections")
+def step_impl(context):
+    """Resets the connections of the service to the database and refuses new ones (needs DB_PROXY_PORT)"""
+    if not context.db_proxy:
+        context.scenario.skip("DB_PROXY_PORT is not set")
+        return
+    context.db_proxy.configure(refuse=True)
+    context.db_proxy.reset_connections()
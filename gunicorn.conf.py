@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration
+
+gunicorn reads this file from the working directory. Every worker keeps
+its Prometheus metrics in files under PROMETHEUS_MULTIPROC_DIR (a new
+temporary directory unless it is set), so that /metrics reports the sum
+of all the workers (see service.common.metrics).
+"""
+import glob
+import os
+import tempfile
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="wishlists-metrics-"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(_server):
+    """Removes the metrics left by a previous run"""
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+
+def child_exit(_server, worker):
+    """Stops counting the gauges of a worker that exited"""
+    from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+
+    multiprocess.mark_process_dead(worker.pid)
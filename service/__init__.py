@@ -21,7 +21,17 @@ and SQL database
 import sys
 from flask import Flask
 from service import config
-from service.common import log_handlers
+from service.common import (
+    compression,
+    log_handlers,
+    metrics,
+    query_budget,
+    request_capture,
+    request_timing,
+    slow_queries,
+)
+from service.common.json_provider import FastJSONProvider
+from service.common.message_pack import MessagePackRequest
 
 
 ############################################################
@@ -32,6 +42,9 @@ def create_app():
     # Create Flask application
     app = Flask(__name__)
     app.config.from_object(config)
+    app.json = FastJSONProvider(app)
+    app.request_class = MessagePackRequest
+    request_capture.init_app(app)
 
     # Initialize Plugins
     # pylint: disable=import-outside-toplevel
@@ -39,10 +52,19 @@ def create_app():
     db.init_app(app)
 
     with app.app_context():
+        # Registered first so that every request is timed
+        metrics.init_app(app, db.engine)
+        request_timing.init_app(app, db.engine)
+        query_budget.init_app(app, db.engine)
+        slow_queries.init_app(app, db.engine)
+        # Registered last so that it runs first (after_request hooks run in
+        # reverse) and the compression is part of the timing of the request
+        compression.init_app(app)
+
         # Dependencies require we import the routes AFTER the Flask app is created
         # pylint: disable=wrong-import-position, wrong-import-order, unused-import
         from service import routes, models  # noqa: F401 E402
-        from service.common import error_handlers, cli_commands  # noqa: F401, E402
+        from service.common import api_spec, error_handlers, cli_commands  # noqa: F401, E402
 
         try:
             db.create_all()
@@ -54,6 +76,9 @@ def create_app():
         # Set up logging for production
         log_handlers.init_logging(app, "gunicorn.error")
 
+        # Build the Swagger specification and docs once all the routes exist
+        api_spec.init_app(app, routes.api)
+
         app.logger.info(70 * "*")
         app.logger.info("  S E R V I C E   R U N N I N G  ".center(70, "*"))
         app.logger.info(70 * "*")
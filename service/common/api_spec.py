@@ -0,0 +1,90 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: api_spec
+
+The Swagger specification and documentation page, built once.
+
+flask-restx encodes /api/swagger.json and renders /apidocs on every
+request. init_app() builds both when the app starts and serves the
+encoded bytes with an ETag, so repeated requests cost a lookup and
+revalidations a 304. When API_SPEC_FILE names an existing file the
+specification is read from it instead of being generated; write that
+file when the image is built with:
+
+    flask api-spec /app/swagger.json
+"""
+import hashlib
+import os
+from functools import partial
+from flask import current_app, request
+from flask_restx import apidoc
+from . import status
+from .compression import matching_etag
+
+
+def generate_spec(api) -> bytes:
+    """Generates the Swagger specification of api as JSON"""
+    with current_app.test_request_context():
+        schema = api.__schema__
+    if "error" in schema:
+        raise RuntimeError(f"Cannot generate the Swagger specification: {schema['error']}")
+    return current_app.json.dumps(schema).encode()
+
+
+def write_spec(api, path: str) -> int:
+    """Writes the Swagger specification of api to a file and returns its size"""
+    spec = generate_spec(api)
+    with open(path, "wb") as file:
+        file.write(spec)
+    return len(spec)
+
+
+def load_spec(api) -> bytes:
+    """Reads the specification from API_SPEC_FILE, or generates it if there is no such file"""
+    path = current_app.config.get("API_SPEC_FILE")
+    if not path or not os.path.isfile(path):
+        return generate_spec(api)
+    current_app.logger.info("Swagger specification read from %s", path)
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def send_cached(body: bytes, mimetype: str):
+    """Sends a body that never changes while the app runs, with an ETag"""
+    etag = hashlib.sha256(body).hexdigest()[:16]
+    matched = matching_etag(request.if_none_match, etag)  # compressed bodies have their own tags
+    if matched:
+        response = current_app.response_class(status=status.HTTP_304_NOT_MODIFIED)
+        response.set_etag(matched)
+    else:
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def init_app(app, api) -> None:
+    """Serves the specification and the documentation page of api from memory
+
+    Must be called once every route of api is registered.
+    """
+    with app.app_context():
+        spec = load_spec(api)
+        with app.test_request_context():
+            page = apidoc.ui_for(api).encode()
+    app.view_functions[api.endpoint("specs")] = partial(send_cached, spec, "application/json")
+    api.documentation(partial(send_cached, page, "text/html"))
@@ -16,8 +16,16 @@
 """
 Flask CLI Command Extensions
 """
+import os
+import time
+import click
 from flask import current_app as app  # Import Flask application
-from service.models import db
+from service.models import db, Wishlists, WishlistRecord
+from service.models.bulk_export import EXPORT_TABLES, FORMATS, TableExport
+from service.models.bulk_import import WishlistImport
+from service.models.synthetic_data import DatasetGenerator, truncate_wishlists
+from service.common.api_spec import write_spec
+from service.routes import api, wishlist_json_keys
 
 
 ######################################################################
@@ -34,3 +42,268 @@ def db_create():
     db.drop_all()
     db.create_all()
     db.session.commit()
+
+
+######################################################################
+# Command to repair the denormalized item counts of Wishlists
+# Usage:
+#   flask wishlists-reconcile [--batch-size 1000]
+######################################################################
+@app.cli.command("wishlists-reconcile")
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Number of wishlist ids to reconcile per transaction",
+)
+def wishlists_reconcile(batch_size):
+    """
+    Recounts the items of every Wishlist and repairs item_count and
+    last_item_added_at where they have drifted, committing one range of ids
+    at a time.
+    """
+    first_id, last_id = db.session.query(
+        db.func.min(Wishlists.id), db.func.max(Wishlists.id)
+    ).one()
+    if first_id is None:
+        click.echo("No wishlists to reconcile")
+        return
+
+    repaired = 0
+    for start in range(first_id, last_id + 1, batch_size):
+        end = min(start + batch_size - 1, last_id)
+        repaired += Wishlists.reconcile_item_counts(start, end)
+        db.session.commit()
+        click.echo(f"Reconciled ids {start}-{end} ({repaired} repaired so far)")
+    click.echo(f"Repaired {repaired} wishlists")
+
+
+######################################################################
+# Command to export Wishlists as newline-delimited JSON
+# Usage:
+#   flask wishlists-export [--output wishlists.ndjson] [--customer-id 1]
+######################################################################
+@app.cli.command("wishlists-export")
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write to (standard output by default)",
+)
+@click.option("--customer-id", type=int, help="Only export the Wishlists of this customer")
+@click.option("--category", help="Only export the Wishlists of this category")
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Number of Wishlists read from the server-side cursor at a time",
+)
+def wishlists_export(output, customer_id, category, batch_size):
+    """
+    Writes every Wishlist with its items embedded as one JSON document per
+    line. Rows are read from a server-side cursor, so memory use does not
+    grow with the size of the table.
+    """
+    keys, item_keys = wishlist_json_keys(expand_items=True)
+    clauses = Wishlists.filters(customer_id=customer_id, category=category)
+    exported = 0
+    for partition in WishlistRecord.stream_json(clauses, keys, item_keys, batch_size).partitions():
+        output.write("\n".join(partition) + "\n")
+        exported += len(partition)
+    click.echo(f"Exported {exported} wishlists", err=True)
+
+
+######################################################################
+# Command to import Wishlists in bulk
+# Usage:
+#   flask wishlists-import wishlists.ndjson
+#   flask wishlists-import wishlists.csv --items wishlist_items.csv
+######################################################################
+@app.cli.command("wishlists-import")
+@click.argument("path", type=click.File("rb"))
+@click.option("--items", type=click.File("rb"), help="CSV file of wishlist items to import with a CSV of wishlists")
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["auto", "csv", "ndjson"]),
+    default="auto",
+    show_default=True,
+    help="Format of PATH (auto uses its extension)",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help="Number of wishlists merged per transaction",
+)
+@click.option("--max-errors", type=click.IntRange(min=0), default=20, show_default=True, help="Invalid rows to list")
+def wishlists_import(path, items, file_format, batch_size, max_errors):
+    """
+    Imports wishlists from PATH, a CSV file or an NDJSON file with one
+    wishlist per line and its items embedded (like wishlists-export). The
+    rows are loaded with COPY into staging tables, validated and merged in
+    bulk: rows with an id update that wishlist, the others are created.
+    Invalid rows are skipped and listed.
+    """
+    if file_format == "auto":
+        file_format = "csv" if os.path.splitext(path.name)[1].lower() == ".csv" else "ndjson"
+    if items and file_format != "csv":
+        raise click.UsageError("--items can only be used with a CSV file of wishlists")
+
+    started = time.perf_counter()
+
+    def progress(message):
+        click.echo(f"[{time.perf_counter() - started:7.1f}s] {message}")
+
+    with db.engine.connect() as connection:
+        wishlist_import = WishlistImport(connection, batch_size, progress)
+        try:
+            if file_format == "csv":
+                wishlist_import.load_csv(path)
+                if items:
+                    wishlist_import.load_csv(items, items=True)
+            else:
+                wishlist_import.load_ndjson(path)
+            counts = wishlist_import.validate()
+            echo_import_errors(wishlist_import.errors(max_errors))
+            wishlist_import.merge()
+        except ValueError as error:
+            raise click.UsageError(str(error)) from error
+        finally:
+            wishlist_import.close()
+
+    seconds = time.perf_counter() - started
+    click.echo(
+        f"Imported {counts['wishlists']:,} wishlists and {counts['items']:,} items in {seconds:.1f}s "
+        f"({(counts['staged_wishlists'] + counts['staged_items']) / seconds:,.0f} rows/s), "
+        f"skipped {counts['invalid_wishlists']:,} invalid wishlists and {counts['invalid_items']:,} invalid items"
+    )
+
+
+def echo_import_errors(errors: list) -> None:
+    """Lists the invalid rows of an import on stderr"""
+    for table, line, item, message in errors:
+        where = f"line {line}, item {item}" if item else f"{table} line {line}"
+        click.echo(f"  {where}: {message}", err=True)
+
+
+######################################################################
+# Command to extract the tables for the data warehouse
+# Usage:
+#   flask wishlists-extract /data/extract --format parquet --workers 8
+######################################################################
+@app.cli.command("wishlists-extract")
+@click.argument("output_dir", type=click.Path(file_okay=False))
+@click.option(
+    "--format", "file_format", type=click.Choice(FORMATS), default="csv", show_default=True, help="File format"
+)
+@click.option(
+    "--table", "table_names", type=click.Choice(list(EXPORT_TABLES)), multiple=True,
+    help="Table to export (repeat for several; all tables by default)",
+)
+@click.option(
+    "--columns", "column_lists", multiple=True, metavar="TABLE=COLUMN,...",
+    help="Columns to export from a table, e.g. wishlists=id,customer_id,name",
+)
+@click.option(
+    "--workers", type=click.IntRange(min=1), default=os.cpu_count(), show_default=True,
+    help="Number of worker processes, each with its own connection",
+)
+@click.option("--partitions", type=click.IntRange(min=1), help="Id ranges per table  [default: 4 per worker]")
+def wishlists_extract(output_dir, file_format, table_names, column_lists, workers, partitions):
+    """
+    Exports the wishlists and wishlist_items tables into OUTPUT_DIR, one
+    folder per table with one CSV or Parquet file per id range. The ranges
+    are exported in parallel by a pool of processes, from one consistent
+    snapshot of the database.
+    """
+    tables = {name: None for name in table_names or EXPORT_TABLES}
+    for column_list in column_lists:
+        table_name, _, columns = column_list.partition("=")
+        if table_name not in tables or not columns:
+            raise click.BadParameter(f"{column_list} does not name an exported table", param_hint="--columns")
+        tables[table_name] = columns.split(",")
+
+    started = time.perf_counter()
+
+    def progress(table_name, path, rows):
+        click.echo(f"[{time.perf_counter() - started:7.1f}s] Wrote {rows:,} {table_name} to {path}")
+
+    with db.engine.connect() as connection:
+        try:
+            totals = TableExport(output_dir, file_format, workers, progress).run(connection, tables, partitions)
+        except ValueError as error:
+            raise click.UsageError(str(error)) from error
+    seconds = time.perf_counter() - started
+    for table_name, total in totals.items():
+        click.echo(f"Extracted {total['rows']:,} {table_name} into {total['files']} files")
+    click.echo(f"Done in {seconds:.1f}s with {workers} workers")
+
+
+######################################################################
+# Command to generate a synthetic dataset for benchmarks
+# Usage:
+#   flask wishlists-generate --wishlists 1000000 --customers 100000 --seed 7 --replace
+######################################################################
+@app.cli.command("wishlists-generate")
+@click.option("--wishlists", "count", type=click.IntRange(min=0), default=10000, show_default=True,
+              help="Number of wishlists to create")
+@click.option("--customers", type=click.IntRange(min=1), default=1000, show_default=True,
+              help="Number of customers owning them")
+@click.option("--products", type=click.IntRange(min=1), default=100000, show_default=True,
+              help="Number of products in the catalog")
+@click.option("--max-items", type=click.IntRange(min=0), default=200, show_default=True, help="Most items in a wishlist")
+@click.option("--exponent", type=click.FloatRange(min=0), default=1.2, show_default=True,
+              help="Zipf exponent of the number of items per wishlist (higher gives more small wishlists)")
+@click.option("--seed", type=int, default=42, show_default=True, help="Seed of the random generator")
+@click.option("--batch-size", type=click.IntRange(min=1), default=10000, show_default=True,
+              help="Number of wishlists inserted per transaction")
+@click.option("--replace", is_flag=True, help="Delete every wishlist first and number the new ones from 1")
+def wishlists_generate(count, customers, products, max_items, exponent, seed, batch_size, replace):
+    """
+    Creates wishlists with realistic names, categories and items, with a
+    skewed number of items per wishlist, wishlists per customer and
+    wishlists per product. The same options and seed always create the
+    same rows, and with --replace the same ids, so that benchmarks can be
+    compared from one run to the next.
+    """
+    try:
+        generator = DatasetGenerator(seed, customers, products, max_items=max_items, exponent=exponent)
+    except ValueError as error:
+        raise click.UsageError(str(error)) from error
+    if replace:
+        truncate_wishlists()
+
+    started = time.perf_counter()
+
+    def progress(totals):
+        click.echo(
+            f"[{time.perf_counter() - started:7.1f}s] Created {totals['wishlists']:,} wishlists "
+            f"and {totals['items']:,} items"
+        )
+
+    totals = generator.load(count, batch_size, progress)
+    seconds = time.perf_counter() - started
+    click.echo(
+        f"Generated {totals['wishlists']:,} wishlists with {totals['items']:,} items for {customers:,} customers "
+        f"in {seconds:.1f}s ({(totals['wishlists'] + totals['items']) / seconds:,.0f} rows/s)"
+    )
+
+
+######################################################################
+# Command to write the Swagger specification to a file
+# Usage:
+#   flask api-spec /app/swagger.json
+######################################################################
+@app.cli.command("api-spec")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+def api_spec(path):
+    """
+    Writes the Swagger specification to PATH. Point API_SPEC_FILE at it
+    so that the workers serve it without generating it.
+    """
+    size = write_spec(api, path)
+    click.echo(f"Wrote the Swagger specification to {path} ({size} bytes)")
@@ -0,0 +1,148 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: compression
+
+Compresses responses with brotli (when installed) or gzip.
+
+Responses of a compressible type are compressed when the client accepts
+it and the body is at least COMPRESS_MIN_SIZE bytes. Streamed responses
+are compressed chunk by chunk as they are sent. Files sent with
+send_file() are left alone: static assets are precompressed instead
+(see static_assets).
+
+A compressed body is a different sequence of bytes than the identity one,
+so its ETag gets the content coding as a suffix ("<etag>-gzip"), and
+matching_etag() accepts these derived tags in conditional requests.
+"""
+import gzip
+import zlib
+from flask import current_app, request
+from service.common.request_timing import timed
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/msgpack",
+    "application/x-msgpack",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+CONTENT_CODINGS = ("br", "gzip")
+
+# Quality settings meant for compressing on the fly
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def encodings() -> tuple:
+    """Returns the supported content codings in order of preference"""
+    return CONTENT_CODINGS if brotli else CONTENT_CODINGS[1:]
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Returns the (unquoted) entity tag of a body compressed with a content coding"""
+    return f"{etag}-{encoding}"
+
+
+def etag_encodings(etag: str) -> list:
+    """Returns an entity tag and the tags of its compressed bodies"""
+    return [etag] + [encoded_etag(etag, encoding) for encoding in CONTENT_CODINGS]
+
+
+def matching_etag(if_none_match, etag: str):
+    """Returns the tag of If-None-Match that is etag or one of its compressed forms, or None"""
+    for candidate in etag_encodings(etag):
+        if if_none_match.contains_weak(candidate):
+            return candidate
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compresses data with the given content coding"""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding: str):
+    """Compresses an iterable of chunks, flushing after each one so that it is sent right away"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(_bytes(chunk)) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(_bytes(chunk)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def _bytes(chunk) -> bytes:
+    """Encodes a str chunk of a streamed response"""
+    return chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def should_compress(response, min_size: int) -> bool:
+    """Returns True if the response is worth compressing"""
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return False
+    return response.is_streamed or response.content_length >= min_size
+
+
+def compress_response(response):
+    """after_request hook that compresses the response when the client accepts it"""
+    if response.mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add("Accept-Encoding")
+    if not should_compress(response, current_app.config.get("COMPRESS_MIN_SIZE", 1024)):
+        return response
+    encoding = request.accept_encodings.best_match(encodings())
+    if encoding is None:
+        return response
+
+    with timed("compress"):
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compress(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(encoded_etag(etag, encoding), weak)
+    return response
+
+
+def init_app(app) -> None:
+    """Compresses the responses of the app"""
+    app.after_request(compress_response)
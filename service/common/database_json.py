@@ -0,0 +1,118 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: database_json
+
+Responses whose JSON is built by Postgres.
+
+When DATABASE_JSON is enabled in the configuration, the GET endpoints ask
+Postgres for the finished JSON documents (see the *_json finders of
+WishlistRecord) and send them to the client without decoding, serializing
+or marshalling them in Python.
+"""
+from functools import wraps
+from flask import stream_with_context
+from flask import current_app as app
+from . import status
+from .message_pack import prefers_msgpack
+
+NDJSON = "application/x-ndjson"
+
+
+def database_json_enabled() -> bool:
+    """Returns True if GET responses should be built by the database
+
+    Only JSON is built by the database, so clients that prefer MessagePack
+    are served as usual.
+    """
+    return app.config.get("DATABASE_JSON", False) and not prefers_msgpack()
+
+
+def json_response(document: str):
+    """Returns a JSON document built by the database as-is"""
+    response = app.response_class(
+        document, status=status.HTTP_200_OK, mimetype="application/json"
+    )
+    response.vary.add("Accept")  # MessagePack clients are served by the API
+    return response
+
+
+def json_array_response(find_documents):
+    """Streams a result of JSON objects built by the database as a JSON array
+
+    Each partition of the result is sent as soon as it has been read, so
+    large results are never held in memory as a whole. find_documents runs
+    the query and is only called once the response is being sent: Flask
+    removes the session of the request when the view returns, which would
+    close the server-side cursor of a result obtained in the view.
+    """
+
+    def generate():
+        yield "["
+        separator = ""
+        for partition in find_documents().partitions():
+            yield separator + ",".join(partition)
+            separator = ","
+        yield "]"
+
+    response = app.response_class(
+        stream_with_context(generate()),
+        status=status.HTTP_200_OK,
+        mimetype="application/json",
+    )
+    response.vary.add("Accept")
+    return response
+
+
+def ndjson_response(find_documents):
+    """Streams a result of JSON objects built by the database as newline-delimited JSON
+
+    Like json_array_response(), only one partition of the result is held in
+    memory at a time, whatever the size of the result.
+    """
+
+    def generate():
+        for partition in find_documents().partitions():
+            yield "\n".join(partition) + "\n"
+
+    return app.response_class(
+        stream_with_context(generate()),
+        status=status.HTTP_200_OK,
+        mimetype=NDJSON,
+    )
+
+
+def json_from_database(find_json):
+    """Serves a GET handler from the database when DATABASE_JSON is enabled
+
+    find_json is called with the arguments of the route and returns the
+    JSON document, or None to let the handler run as usual (e.g. for its
+    404). This decorator must be placed above @api.marshal_with so that
+    marshalling is skipped as well.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if database_json_enabled():
+                document = find_json(**kwargs)
+                if document is not None:
+                    return json_response(document)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -16,8 +16,9 @@
 """
 Module: error_handlers
 """
+from flask import request
 from flask import current_app as app  # Import Flask application
-from service.models import DataValidationError
+from service.models import DataValidationError, VersionConflictError
 from . import status
 
 
@@ -30,18 +31,59 @@ def request_validation_error(error):
     return bad_request(error)
 
 
+@app.errorhandler(VersionConflictError)
+def version_conflict_error(error):
+    """Handles writes against a version that is no longer current"""
+    if request.if_match:
+        return precondition_failed(error)
+    return conflict(error)
+
+
 @app.errorhandler(status.HTTP_400_BAD_REQUEST)
 def bad_request(error):
-    """Handles bad requests with 400_BAD_REQUEST"""
+    """Handles bad requests with 400_BAD_REQUEST
+
+    Validation errors also list the invalid fields under "errors".
+    """
+    message = str(error)
+    app.logger.warning(message)
+    body = {
+        "status": status.HTTP_400_BAD_REQUEST,
+        "error": "Bad Request",
+        "message": message,
+    }
+    if getattr(error, "errors", None):
+        body["errors"] = error.errors
+    return body, status.HTTP_400_BAD_REQUEST
+
+
+@app.errorhandler(status.HTTP_409_CONFLICT)
+def conflict(error):
+    """Handles conflict errors with 409_CONFLICT"""
     message = str(error)
     app.logger.warning(message)
     return (
         {
-            "status": status.HTTP_400_BAD_REQUEST,
-            "error": "Bad Request",
+            "status": status.HTTP_409_CONFLICT,
+            "error": "Conflict",
             "message": message,
         },
-        status.HTTP_400_BAD_REQUEST,
+        status.HTTP_409_CONFLICT,
+    )
+
+
+@app.errorhandler(status.HTTP_412_PRECONDITION_FAILED)
+def precondition_failed(error):
+    """Handles failed If-Match preconditions with 412_PRECONDITION_FAILED"""
+    message = str(error)
+    app.logger.warning(message)
+    return (
+        {
+            "status": status.HTTP_412_PRECONDITION_FAILED,
+            "error": "Precondition Failed",
+            "message": message,
+        },
+        status.HTTP_412_PRECONDITION_FAILED,
     )
 
 
@@ -101,21 +143,6 @@ def bad_request(error):
 #     )
 
 
-# @app.errorhandler(status.HTTP_409_CONFLICT)
-# def conflict(error):
-#     """Handles conflict errors with 409_CONFLICT"""
-#     message = str(error)
-#     app.logger.warning(message)
-#     return (
-#         jsonify(
-#             status=status.HTTP_409_CONFLICT,
-#             error="Conflict",
-#             message=message,
-#         ),
-#         status.HTTP_409_CONFLICT,
-#     )
-
-
 # @app.errorhandler(status.HTTP_403_FORBIDDEN)
 # def forbidden(error):
 #     """Handles forbidden errors with 403_FORBIDDEN"""
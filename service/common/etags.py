@@ -0,0 +1,117 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: etags
+
+Entity tags and conditional requests for Wishlist resources.
+
+Every Wishlist carries a version that is incremented whenever the
+Wishlist or any of its items changes, so the ETag of a Wishlist and of
+its item list can be computed from a single column lookup. The same
+ETag is used with If-Match to make writes conditional.
+
+The MessagePack representation is a different sequence of bytes than the
+JSON one, so its ETag has a suffix (see representation_etag()). If-Match
+accepts the ETag of either representation, since both describe the same
+version. Compressed bodies get the content coding as a further suffix
+(see compression), and the conditional requests accept those tags too.
+"""
+from functools import wraps
+from flask import Response, request
+from flask_restx.utils import unpack
+from werkzeug.http import quote_etag
+from service.models import Wishlists, VersionConflictError
+from . import status
+from .compression import etag_encodings, matching_etag
+from .message_pack import ETAG_SUFFIX, prefers_msgpack
+
+
+def make_etag(wishlist_id: int, version: int) -> str:
+    """Builds the (unquoted) strong entity tag for a version of a Wishlist"""
+    return f"{wishlist_id}-{version}"
+
+
+def representation_etag(etag: str) -> str:
+    """Returns the entity tag of the representation negotiated by the request"""
+    return etag + ETAG_SUFFIX if prefers_msgpack() else etag
+
+
+def etag_variants(etag: str) -> list:
+    """Returns the entity tags of every representation of a version, compressed or not"""
+    return etag_encodings(etag) + etag_encodings(etag + ETAG_SUFFIX)
+
+
+def etag_header(wishlist) -> dict:
+    """Returns the ETag response header for the current version of a Wishlist"""
+    return {"ETag": quote_etag(representation_etag(make_etag(wishlist.id, wishlist.version)))}
+
+
+def check_if_match(wishlist) -> None:
+    """Raises VersionConflictError if If-Match does not match the Wishlist
+
+    Requests without an If-Match header are not checked. Because the
+    Wishlist is versioned by the mapper, a write made by another request
+    after this check still fails when the change is flushed.
+    """
+    if not request.if_match:
+        return
+    etag = make_etag(wishlist.id, wishlist.version)
+    if not any(request.if_match.contains(variant) for variant in etag_variants(etag)):
+        raise VersionConflictError(
+            f"Wishlist with id '{wishlist.id}' has been modified "
+            f"(current ETag {quote_etag(representation_etag(etag))})"
+        )
+
+
+def conditional_get(func):
+    """Adds ETag support to a GET handler that takes a wishlist_id
+
+    When the If-None-Match header matches the current version the handler
+    is never called and 304 Not Modified is returned, so the Wishlist and
+    its items are neither loaded nor serialized. This decorator must be
+    placed above @api.marshal_with so that marshalling is skipped as well.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        wishlist_id = kwargs["wishlist_id"]
+        version = Wishlists.find_version(wishlist_id)
+        if version is None:
+            # Let the handler produce its usual 404
+            return func(*args, **kwargs)
+
+        etag = representation_etag(make_etag(wishlist_id, version))
+        matched = matching_etag(request.if_none_match, etag)
+        if matched:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response.set_etag(matched)  # the tag of the body the client holds
+            response.vary.add("Accept")
+            return response
+
+        result = func(*args, **kwargs)
+        if isinstance(result, Response):
+            # Already a response, e.g. JSON built by the database
+            if result.status_code == status.HTTP_200_OK:
+                result.set_etag(etag)
+            return result
+
+        data, code, headers = unpack(result)
+        headers = dict(headers or {})
+        if code == status.HTTP_200_OK:
+            headers["ETag"] = quote_etag(etag)
+        return data, code, headers
+
+    return wrapper
@@ -0,0 +1,140 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: json_provider
+
+A JSON provider backed by the fastest encoder that is installed.
+
+The JSON_BACKEND setting picks orjson, msgspec or the standard library
+json module ("auto" tries them in that order). Whichever is used, the
+output is compact, keys keep their order and dates and datetimes are
+written in ISO 8601 format. The provider is used by jsonify() and, through
+output_json(), by the flask-restx representations.
+"""
+import json
+import logging
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+from flask import current_app
+from flask.json.provider import JSONProvider
+from service.common.request_timing import timed
+
+logger = logging.getLogger("flask.app")
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+def _default(obj):
+    """Encodes the types that the JSON backends do not handle natively"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, UUID)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _orjson():
+    """Returns the (dumps, loads) functions of orjson"""
+    import orjson  # pylint: disable=import-outside-toplevel
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    return dumps, orjson.loads
+
+
+def _msgspec():
+    """Returns the (dumps, loads) functions of msgspec"""
+    import msgspec  # pylint: disable=import-outside-toplevel
+
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    decoder = msgspec.json.Decoder()
+
+    def loads(data):
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as error:
+            # Flask expects a ValueError for malformed request bodies
+            raise ValueError(str(error)) from error
+
+    return encoder.encode, loads
+
+
+def _json():
+    """Returns the (dumps, loads) functions of the standard library"""
+
+    def dumps(obj) -> bytes:
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+
+    return dumps, json.loads
+
+
+_FACTORIES = {"orjson": _orjson, "msgspec": _msgspec, "json": _json}
+
+
+def load_backend(name: str = "auto"):
+    """Returns (name, dumps, loads) for the named backend ("auto" for the fastest installed)
+
+    A backend that is not installed falls back to the standard library.
+    """
+    if name != "auto" and name not in _FACTORIES:
+        raise ValueError(f"Unknown JSON backend '{name}', use one of: auto, {', '.join(BACKENDS)}")
+    for candidate in BACKENDS if name == "auto" else (name, "json"):
+        try:
+            dumps, loads = _FACTORIES[candidate]()
+        except ImportError:
+            logger.warning("JSON backend %s is not installed", candidate)
+            continue
+        return candidate, dumps, loads
+    raise ImportError("No JSON backend available")  # pragma: no cover
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider that uses the backend selected by JSON_BACKEND"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.backend, self.encode, self._loads = load_backend(
+            app.config.get("JSON_BACKEND", "auto")
+        )
+        logger.info("Using the %s JSON backend", self.backend)
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serializes obj as a JSON string (kwargs are accepted and ignored)"""
+        return self.encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        """Deserializes a JSON string or bytes (kwargs are accepted and ignored)"""
+        return self._loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serializes the arguments like jsonify() into an application/json response"""
+        obj = self._prepare_response_obj(args, kwargs)
+        with timed("encode"):
+            data = self.encode(obj)
+        return self._app.response_class(data, mimetype="application/json")
+
+
+def output_json(data, code, headers=None):
+    """flask-restx representation that encodes with the app's JSON provider"""
+    response = current_app.json.response(data)
+    response.status_code = code
+    response.headers.extend(headers or {})
+    response.vary.add("Accept")  # or MessagePack
+    return response
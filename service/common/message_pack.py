@@ -0,0 +1,99 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: message_pack
+
+MessagePack as an alternative format to JSON for service-to-service calls.
+
+Responses are encoded as MessagePack when the Accept header prefers
+application/msgpack (see output_msgpack, registered as a flask-restx
+representation), and request bodies sent with a MessagePack Content-Type
+are decoded by MessagePackRequest.get_json(), so api.payload works with
+both formats. Both formats vary on Accept, and the MessagePack one has its
+own ETag (the one of the JSON with ETAG_SUFFIX).
+"""
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+import msgpack
+from flask import Request, current_app, request
+from werkzeug.exceptions import BadRequest
+from service.common.request_timing import timed
+
+MSGPACK = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK, "application/x-msgpack")
+ETAG_SUFFIX = "-msgpack"
+
+
+def _default(obj):
+    """Encodes the types that MessagePack does not handle natively, like the JSON provider"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, UUID)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+def packb(obj) -> bytes:
+    """Serializes obj as MessagePack"""
+    return msgpack.packb(obj, default=_default)
+
+
+def unpackb(data: bytes):
+    """Deserializes MessagePack data"""
+    return msgpack.unpackb(data)
+
+
+def prefers_msgpack() -> bool:
+    """Returns True if the Accept header of the request prefers MessagePack over JSON"""
+    return request.accept_mimetypes.best_match(("application/json",) + MSGPACK_MIMETYPES) in MSGPACK_MIMETYPES
+
+
+def output_msgpack(data, code, headers=None):
+    """flask-restx representation that encodes with MessagePack"""
+    with timed("encode"):
+        body = packb(data)
+    response = current_app.response_class(body, status=code, mimetype=MSGPACK)
+    response.headers.extend(headers or {})
+    response.vary.add("Accept")
+    return response
+
+
+class MessagePackRequest(Request):
+    """Request that decodes MessagePack bodies in get_json()"""
+
+    @property
+    def is_msgpack(self) -> bool:
+        """Returns True if the Content-Type of the body is MessagePack"""
+        return self.mimetype in MSGPACK_MIMETYPES
+
+    def get_json(self, force=False, silent=False, cache=True):
+        """Parses the body as MessagePack or, for any other Content-Type, as JSON"""
+        if not self.is_msgpack:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if cache and self._cached_json[silent] is not Ellipsis:
+            return self._cached_json[silent]
+
+        try:
+            value = unpackb(self.get_data(cache=cache))
+        except (ValueError, msgpack.UnpackException) as error:
+            if silent:
+                return None
+            raise BadRequest(f"Failed to decode MessagePack object: {error}") from error
+
+        if cache:
+            self._cached_json = (value, value)
+        return value
@@ -0,0 +1,132 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: metrics
+
+Prometheus metrics of the requests, the SQL statements and the pool.
+
+GET /metrics reports, in the Prometheus text format:
+
+- http_requests_total and http_request_duration_seconds, by method,
+  route (the URL rule, such as /api/wishlists/<int:wishlist_id>) and
+  status, timed until the response starts;
+- http_requests_in_flight, by method and route;
+- db_queries_total and db_query_duration_seconds, by statement (SELECT,
+  INSERT, UPDATE, DELETE...), timed around the cursor execution;
+- db_pool_connections and db_pool_checked_out_connections, the
+  connections the pool holds and the ones in use.
+
+Under gunicorn every worker has its own metrics. gunicorn.conf.py sets
+PROMETHEUS_MULTIPROC_DIR, where prometheus_client keeps the values of
+every worker in memory-mapped files, and /metrics then adds up the files
+of all the workers, whichever one answers. The gauges only count the
+workers that are alive.
+"""
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from service.common import statement_timing
+
+HTTP_BUCKETS = (0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY")
+
+REQUESTS = Counter("http_requests_total", "Requests handled", ["method", "route", "status"])
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response starts", ["method", "route", "status"], buckets=HTTP_BUCKETS
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled", ["method", "route"], multiprocess_mode="livesum")
+QUERIES = Counter("db_queries_total", "SQL statements executed", ["statement"])
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "Time to execute SQL statements", ["statement"], buckets=DB_BUCKETS)
+POOL_CONNECTIONS = Gauge("db_pool_connections", "Connections held by the pool", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out_connections", "Connections in use", multiprocess_mode="livesum")
+
+
+def route() -> str:
+    """Returns the URL rule of the request, which keeps the number of label values small"""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def statement_type(statement: str) -> str:
+    """Returns the first keyword of a SQL statement, or OTHER"""
+    keyword = statement.lstrip(" \n\t(").split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in STATEMENTS else "OTHER"
+
+
+def before_request() -> None:
+    """Starts timing the request"""
+    g.metrics = (time.perf_counter(), request.method, route())
+    IN_FLIGHT.labels(request.method, g.metrics[2]).inc()
+
+
+def after_request(response):
+    """Keeps the status of the response for teardown_request()"""
+    g.metrics_status = response.status_code
+    return response
+
+
+def teardown_request(_error=None) -> None:
+    """Records the request, with a 500 status if no response was made"""
+    if "metrics" not in g:
+        return
+    start, method, rule = g.pop("metrics")
+    status = str(g.pop("metrics_status", 500))
+    IN_FLIGHT.labels(method, rule).dec()
+    REQUESTS.labels(method, rule, status).inc()
+    REQUEST_SECONDS.labels(method, rule, status).observe(time.perf_counter() - start)
+
+
+def registry() -> CollectorRegistry:
+    """Returns the registry to report: the files of every worker under gunicorn, else this process'"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    workers = CollectorRegistry()
+    multiprocess.MultiProcessCollector(workers)
+    return workers
+
+
+def metrics():
+    """Returns the metrics in the Prometheus text format"""
+    return Response(generate_latest(registry()), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+def observe_statement(_conn, _cursor, statement: str, _parameters, _executemany: bool, seconds: float) -> None:
+    """Counts a statement that took seconds, by its type"""
+    kind = statement_type(statement)
+    QUERIES.labels(kind).inc()
+    QUERY_SECONDS.labels(kind).observe(seconds)
+
+
+def instrument_engine(engine) -> None:
+    """Times the statements executed by engine and counts the connections of its pool"""
+    statement_timing.subscribe(engine, observe_statement)
+    event.listen(engine.pool, "connect", lambda *_: POOL_CONNECTIONS.inc())
+    event.listen(engine.pool, "close", lambda *_: POOL_CONNECTIONS.dec())
+    event.listen(engine.pool, "close_detached", lambda *_: POOL_CONNECTIONS.dec())
+    event.listen(engine.pool, "checkout", lambda *_: POOL_CHECKED_OUT.inc())
+    event.listen(engine.pool, "checkin", lambda *_: POOL_CHECKED_OUT.dec())
+
+
+def init_app(app, engine) -> None:
+    """Records the metrics of the app and its engine, and reports them on /metrics"""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    instrument_engine(engine)
+    app.add_url_rule("/metrics", "metrics", metrics)
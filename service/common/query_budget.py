@@ -0,0 +1,184 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: query_budget
+
+Catches the requests that run more SQL statements than they should.
+
+Every restx resource method declares the most statements a request may
+execute with @query_budget(limit). While the check is on, the statements
+of every request are recorded, and a request that runs more than its
+budget, or runs the same statement shape (the statement with its
+parameters and literals taken out) QUERY_REPEAT_LIMIT times or more, as
+an N+1 lazy load does, is reported. Streamed responses are only checked
+until they start.
+
+QUERY_BUDGETS selects what happens: "raise" raises QueryBudgetExceeded,
+which fails the test that made the request, "warn" logs a warning, "off"
+records nothing, and "auto" (the default) raises when the app is testing,
+warns in debug mode and is off otherwise.
+
+QueryRecorder records the statements of a block in the same way:
+
+    with QueryRecorder() as queries:
+        wishlist.serialize()
+    queries.check(limit=2)
+"""
+import re
+from collections import Counter
+from contextvars import ContextVar
+from flask import current_app, g, request
+from sqlalchemy import event
+
+PARAMETER = re.compile(r"%\(\w+\)s|%s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PARAMETER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE = re.compile(r"\s+")
+
+_recorders = ContextVar("query_recorders", default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request or a block runs more statements than its budget allows"""
+
+
+def statement_shape(statement: str) -> str:
+    """Returns a statement with its parameters, literals and lists of values replaced by ?"""
+    statement = PARAMETER.sub("?", WHITESPACE.sub(" ", statement).strip())
+    return PARAMETER_LIST.sub("?", statement)
+
+
+class QueryRecorder:
+    """Records the shapes of the statements executed while it is entered"""
+
+    def __init__(self):
+        self.statements = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _recorders.set(_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _recorders.reset(self._token)
+
+    @property
+    def count(self) -> int:
+        """The number of statements executed"""
+        return len(self.statements)
+
+    def repeated(self, repeat_limit: int) -> dict:
+        """Returns the shapes executed repeat_limit times or more, with how many times"""
+        return {shape: count for shape, count in Counter(self.statements).items() if count >= repeat_limit}
+
+    def problems(self, limit: int = None, repeat_limit: int = None) -> list:
+        """Returns what is wrong with the statements, an empty list if they are within the limits"""
+        problems = []
+        if limit is not None and self.count > limit:
+            problems.append(f"{self.count} statements executed, the budget is {limit}")
+        for shape, count in self.repeated(repeat_limit).items() if repeat_limit else ():
+            problems.append(f"{count} statements of the same shape (N+1?): {shape}")
+        return problems
+
+    def check(self, limit: int = None, repeat_limit: int = None) -> None:
+        """Raises QueryBudgetExceeded if the statements are not within the limits"""
+        problems = self.problems(limit, repeat_limit)
+        if problems:
+            raise QueryBudgetExceeded("; ".join(problems))
+
+
+def query_budget(limit: int, repeat_limit: int = None):
+    """Declares the most statements a request to a restx resource method may execute
+
+    repeat_limit overrides QUERY_REPEAT_LIMIT for the methods that run the
+    same statement several times on purpose, and 0 turns the N+1 check off.
+    A limit of None only checks the repeated statements.
+    """
+
+    def decorator(func):
+        func.query_budget = (limit, repeat_limit)
+        return func
+
+    return decorator
+
+
+def request_budget() -> tuple:
+    """Returns the (limit, repeat_limit) declared on the resource method of the request"""
+    view_class = getattr(current_app.view_functions.get(request.endpoint), "view_class", None)
+    method = getattr(view_class, request.method.lower(), None)
+    if method is None and request.method == "HEAD":
+        method = getattr(view_class, "get", None)
+    return getattr(method, "query_budget", (None, None))
+
+
+def mode() -> str:
+    """Returns what to do with the requests over their budget: raise, warn or off"""
+    setting = current_app.config.get("QUERY_BUDGETS", "auto")
+    if setting != "auto":
+        return setting
+    if current_app.testing:
+        return "raise"
+    return "warn" if current_app.debug else "off"
+
+
+def before_request() -> None:
+    """Starts recording the statements of the request"""
+    if mode() != "off":
+        g.query_recorder = QueryRecorder().__enter__()
+
+
+def after_request(response):
+    """Reports the request if it ran more statements than its budget or repeated one"""
+    recorder = g.pop("query_recorder", None)
+    if recorder is None:
+        return response
+    recorder.__exit__(None, None, None)
+    limit, repeat_limit = request_budget()
+    if repeat_limit is None:
+        repeat_limit = current_app.config.get("QUERY_REPEAT_LIMIT", 5)
+    problems = recorder.problems(limit, repeat_limit)
+    if problems:
+        message = f"{request.method} {request.path}: {'; '.join(problems)}"
+        if mode() == "raise":
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning("Query budget exceeded by %s", message)
+    return response
+
+
+def teardown_request(_error=None) -> None:
+    """Stops recording the statements of a request that failed before after_request()"""
+    recorder = g.pop("query_recorder", None)
+    if recorder is not None:
+        recorder.__exit__(None, None, None)
+
+
+def instrument_engine(engine) -> None:
+    """Adds the statements executed by engine to the recorders that are entered"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record_query(_conn, _cursor, statement, _parameters, _context, _executemany):
+        recorders = _recorders.get()
+        if recorders:
+            shape = statement_shape(statement)
+            for recorder in recorders:
+                recorder.statements.append(shape)
+
+
+def init_app(app, engine) -> None:
+    """Checks the query budgets of the requests to the app"""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    instrument_engine(engine)
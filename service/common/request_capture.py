@@ -0,0 +1,150 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: request_capture
+
+Records the requests the service receives so they can be replayed.
+
+When CAPTURE_FILE is set, every request is written as one JSON line to
+that file: its start time, method, path, query string, the SHA-256 and
+size of its body (and the body itself with CAPTURE_BODIES=full), the
+response status and how long the response took until its last byte was
+sent, plus the X-Request-ID header of the request when it has one. The
+file is rotated when it reaches CAPTURE_MAX_BYTES, keeping
+CAPTURE_BACKUP_COUNT older files. "{pid}" in the file name is replaced
+with the process id, so that every gunicorn worker writes its own file.
+
+The capture wraps the WSGI input rather than reading the body itself, so
+only the bytes the app reads are recorded and streamed uploads are not
+buffered. benchmarks.replay sends the captured requests again.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from werkzeug.wsgi import ClosingIterator
+
+
+class RecordingInput:
+    """A WSGI input stream that hashes what is read and keeps the first keep bytes"""
+
+    def __init__(self, stream, keep: int = 0):
+        self.stream = stream
+        self.keep = keep
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = bytearray()
+
+    def _record(self, data: bytes) -> bytes:
+        self.sha256.update(data)
+        self.size += len(data)
+        if len(self.head) < self.keep:
+            self.head += data[: self.keep - len(self.head)]
+        return data
+
+    def read(self, size=-1) -> bytes:
+        """Reads from the stream"""
+        return self._record(self.stream.read(size))
+
+    def readline(self, size=-1) -> bytes:
+        """Reads a line from the stream"""
+        return self._record(self.stream.readline(size))
+
+    def readlines(self, hint=-1) -> list:
+        """Reads the remaining lines of the stream"""
+        return [self._record(line) for line in self.stream.readlines(hint)]
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def body(self) -> dict:
+        """Returns the fields that describe the body read so far"""
+        fields = {"body_bytes": self.size, "body_sha256": self.sha256.hexdigest()}
+        if self.keep and self.size <= self.keep:
+            try:
+                fields["body"] = self.head.decode()
+            except UnicodeDecodeError:
+                fields["body_base64"] = base64.b64encode(self.head).decode()
+        return fields
+
+
+class RequestCapture:
+    """WSGI middleware that writes one JSON line per request to a logger"""
+
+    def __init__(self, wsgi_app, capture_logger: logging.Logger, max_body_bytes: int = 0):
+        self.wsgi_app = wsgi_app
+        self.logger = capture_logger
+        self.max_body_bytes = max_body_bytes
+
+    def __call__(self, environ, start_response):
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        body = RecordingInput(environ["wsgi.input"], self.max_body_bytes)
+        environ["wsgi.input"] = body
+        response = {"status": 500}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            return start_response(status, headers, exc_info)
+
+        def write_record():
+            record = {
+                "time": started_at.isoformat(),
+                "method": environ["REQUEST_METHOD"],
+                "path": environ.get("SCRIPT_NAME", "") + environ.get("PATH_INFO", ""),
+                "query": environ.get("QUERY_STRING", ""),
+                "content_type": environ.get("CONTENT_TYPE", ""),
+                **body.body(),
+                "status": response["status"],
+                "seconds": round(time.perf_counter() - start, 6),
+            }
+            if "HTTP_X_REQUEST_ID" in environ:
+                record["request_id"] = environ["HTTP_X_REQUEST_ID"]
+            self.logger.info(json.dumps(record))
+
+        try:
+            return ClosingIterator(self.wsgi_app(environ, capture_start_response), write_record)
+        except Exception:
+            write_record()
+            raise
+
+
+def capture_logger(filename: str, max_bytes: int, backup_count: int) -> logging.Logger:
+    """Returns a logger that writes bare lines to a rotating file"""
+    handler = RotatingFileHandler(filename.format(pid=os.getpid()), maxBytes=max_bytes, backupCount=backup_count)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    capture = logging.getLogger(f"{__name__}.{filename}")
+    capture.handlers = [handler]
+    capture.setLevel(logging.INFO)
+    capture.propagate = False
+    return capture
+
+
+def init_app(app) -> None:
+    """Captures the requests of the app when CAPTURE_FILE is set"""
+    filename = app.config.get("CAPTURE_FILE")
+    if not filename:
+        return
+    capture = capture_logger(
+        filename, app.config.get("CAPTURE_MAX_BYTES", 10485760), app.config.get("CAPTURE_BACKUP_COUNT", 5)
+    )
+    max_body_bytes = app.config.get("CAPTURE_MAX_BODY_BYTES", 65536) if app.config.get("CAPTURE_BODIES") == "full" else 0
+    app.wsgi_app = RequestCapture(app.wsgi_app, capture, max_body_bytes)
+    app.logger.info("Capturing requests to %s", filename)
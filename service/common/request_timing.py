@@ -0,0 +1,125 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: request_timing
+
+Splits the time of every request between the database and Python.
+
+With REQUEST_TIMING set (it can be changed while the app runs), every
+response gets a Server-Timing header and one JSON line is logged per
+request, with:
+
+- db: the SQL statements executed and the time spent executing them;
+- serialize: the time spent marshalling the model objects into
+  dictionaries (the compiled serializers), less the queries it ran;
+- encode: the time spent encoding JSON or MessagePack;
+- compress: the time spent compressing the body (see compression);
+- app: the rest of the time spent in Python;
+- total: the time until the response starts.
+
+The phases are timed with timed(), which does nothing when the timing is
+off. Streamed responses are timed until they start.
+"""
+import json
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from service.common import statement_timing
+from service.common.metrics import route
+
+PHASES = ("serialize", "encode", "compress")
+
+
+class RequestTiming:
+    """The statements and the time of each phase of a request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+    def durations(self) -> dict:
+        """Returns the seconds spent in each phase, in Python and in total"""
+        total = time.perf_counter() - self.start
+        durations = {"db": self.db_seconds, **self.phases}
+        durations["app"] = max(0.0, total - sum(durations.values()))
+        durations["total"] = total
+        return durations
+
+    def server_timing(self, durations: dict) -> str:
+        """Returns the Server-Timing header of the durations"""
+        metrics = [f'db;dur={durations["db"] * 1e3:.2f};desc="{self.queries} queries"']
+        metrics += [f"{name};dur={durations[name] * 1e3:.2f}" for name in (*PHASES, "app", "total")]
+        return ", ".join(metrics)
+
+
+@contextmanager
+def timed(phase: str):
+    """Adds the time spent in the block to a phase of the request, less the queries it ran"""
+    timing = g.get("timing") if has_app_context() else None
+    if timing is None:
+        yield
+        return
+    start, db_seconds = time.perf_counter(), timing.db_seconds
+    try:
+        yield
+    finally:
+        timing.phases[phase] += time.perf_counter() - start - (timing.db_seconds - db_seconds)
+
+
+def before_request() -> None:
+    """Starts timing the request when REQUEST_TIMING is set"""
+    if current_app.config.get("REQUEST_TIMING"):
+        g.timing = RequestTiming()
+
+
+def after_request(response):
+    """Adds the Server-Timing header and logs the timing of the request"""
+    timing = g.pop("timing", None)
+    if timing is None:
+        return response
+    durations = timing.durations()
+    response.headers["Server-Timing"] = timing.server_timing(durations)
+    record = {
+        "method": request.method,
+        "route": route(),
+        "status": response.status_code,
+        "queries": timing.queries,
+        **{f"{name}_ms": round(seconds * 1e3, 3) for name, seconds in durations.items()},
+    }
+    current_app.logger.info("Request timing %s", json.dumps(record))
+    return response
+
+
+def add_statement(_conn, _cursor, _statement: str, _parameters, _executemany: bool, seconds: float) -> None:
+    """Adds a statement that took seconds to the timing of the request that ran it"""
+    timing = g.get("timing") if has_app_context() else None
+    if timing is not None:
+        timing.queries += 1
+        timing.db_seconds += seconds
+
+
+def instrument_engine(engine) -> None:
+    """Adds the statements executed by engine to the timing of the request that runs them"""
+    statement_timing.subscribe(engine, add_statement)
+
+
+def init_app(app, engine) -> None:
+    """Times the requests of the app and the statements of its engine"""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    instrument_engine(engine)
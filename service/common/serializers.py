@@ -0,0 +1,115 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: serializers
+
+Precompiled serializers for the flask-restx response models.
+
+Marshalling a model object normally takes two passes: serialize() builds
+a dictionary and marshal() walks the field tree of the restx model over
+it again. compile_serializer() generates, once per model and mask, a
+plain Python function that reads the attributes of a model object (or of
+a read-only record) and returns the marshalled dictionary in one pass.
+The restx models stay the single source of truth for the Swagger docs.
+"""
+from datetime import date
+from functools import lru_cache, partial, wraps
+from flask import current_app as app
+from flask import request
+from flask_restx import fields
+from flask_restx.mask import Mask
+from flask_restx.utils import unpack
+from sqlalchemy import inspect
+from service.common.request_timing import timed
+
+
+def compile_serializer(model, source, mask=None):
+    """Generates a function that serializes an object like marshal(obj, model, mask)
+
+    source is the SQLAlchemy model class the objects are mapped from. Columns
+    holding dates are written in ISO format, and lists of nested models are
+    serialized with the compiled serializers of their relationship.
+    """
+    mask = Mask(mask) if isinstance(mask, str) else mask
+    mapper = inspect(source)
+    namespace = {}
+    entries = []
+    for key, field in model.resolved.items():
+        if mask and key not in mask:
+            continue
+        attribute = field.attribute or key
+        if isinstance(field, fields.List) and isinstance(field.container, fields.Nested):
+            name = f"serialize_{attribute}"
+            nested_mask = mask[key] if mask and isinstance(mask[key], Mask) else None
+            namespace[name] = compile_serializer(
+                field.container.model,
+                mapper.relationships[attribute].mapper.class_,
+                nested_mask,
+            )
+            entries.append(f"{key!r}: [{name}(item) for item in obj.{attribute}]")
+        elif isinstance(field, fields.Date) or _holds_dates(mapper, attribute):
+            entries.append(
+                f"{key!r}: None if (value := obj.{attribute}) is None else value.isoformat()"
+            )
+        elif isinstance(field, (fields.Integer, fields.String)):
+            entries.append(f"{key!r}: obj.{attribute}")
+        else:
+            raise TypeError(f"Cannot compile {type(field).__name__} field {key!r}")
+
+    source_code = "def serialize(obj):\n    return {" + ", ".join(entries) + "}\n"
+    exec(compile(source_code, f"<serializer {model.name}>", "exec"), namespace)  # pylint: disable=exec-used
+    return namespace["serialize"]
+
+
+def _holds_dates(mapper, attribute: str) -> bool:
+    """Returns True if the mapped column attribute holds dates or datetimes"""
+    column = mapper.columns.get(attribute)
+    return column is not None and issubclass(column.type.python_type, date)
+
+
+def serializer(model, source):
+    """Returns a function that gives the compiled serializer of model for a mask
+
+    Serializers are compiled on first use and cached per mask.
+    """
+    return lru_cache(maxsize=64)(partial(compile_serializer, model, source))
+
+
+def serialize_with(api, model, source, as_list: bool = False, code: int = 200, description=None):
+    """A drop-in replacement for @api.marshal_with that uses compiled serializers
+
+    The handler returns the model object(s) instead of dictionaries. The
+    Swagger documentation is the one @api.marshal_with generates, and a
+    mask in the X-Fields header is applied as marshal_with would.
+    """
+    serializers = serializer(model, source)
+
+    def decorator(func):
+        # Only used for the documentation that it attaches to func
+        api.marshal_with(model, as_list=as_list, code=code, description=description)(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            data, status_code, headers = unpack(func(*args, **kwargs))
+            serialize = serializers(request.headers.get(app.config["RESTX_MASK_HEADER"]))
+            with timed("serialize"):
+                if isinstance(data, (list, tuple)):
+                    return [serialize(obj) for obj in data], status_code, headers
+                return serialize(data), status_code, headers
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,175 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: slow_queries
+
+Logs the SQL statements that take longer than SLOW_QUERY_SECONDS.
+
+Every slow statement is logged as one JSON line with its SQL, how long it
+took, the rows it returned or changed, its parameters with the strings
+redacted (numbers, dates and None are kept, which is usually enough to
+reproduce it), and the line of service/models that ran it.
+
+With SLOW_QUERY_EXPLAIN set, the plan of the statement is logged too:
+EXPLAIN (ANALYZE, BUFFERS) for SELECT statements, which runs them again,
+and a plain EXPLAIN for every other statement, WITH queries included
+since they can change data. The plan is taken on
+the same connection, in the same transaction, inside a savepoint that is
+rolled back, with a statement timeout of SLOW_QUERY_EXPLAIN_TIMEOUT
+seconds. String literals in the plan are redacted as well.
+
+No more than SLOW_QUERY_SAMPLES_PER_MINUTE statements are logged (and
+explained) per minute by each process, so that the log cannot add load
+when everything is slow. The next line logged says how many were left
+out. The statements are timed by service.common.statement_timing.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date
+from service.common import statement_timing
+from service.common.metrics import statement_type
+
+logger = logging.getLogger(__name__)  # a child of app.logger
+
+MODELS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+MODIFYING = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+class RateLimiter:
+    """A token bucket that allows rate events per minute, in bursts of up to rate"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Takes a token and returns True if there is one left"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate / 60)
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def redact(value):
+    """Returns a parameter value with the strings and bytes replaced by their type and length"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} of {len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    return f"<{type(value).__name__}>"
+
+
+def caller() -> str:
+    """Returns the innermost line of service/models on the stack, as path:line in function"""
+    frame = sys._getframe(1)
+    while frame:
+        filename = frame.f_code.co_filename
+        if filename.startswith(MODELS_DIRECTORY):
+            path = os.path.relpath(filename, os.path.dirname(os.path.dirname(MODELS_DIRECTORY)))
+            return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def explain_statement(statement: str) -> str:
+    """Returns the EXPLAIN of a statement, with ANALYZE for the SELECT statements that do not change data"""
+    if statement_type(statement) == "SELECT" and not MODIFYING.search(statement):
+        return f"EXPLAIN (ANALYZE, BUFFERS) {statement}"
+    return f"EXPLAIN {statement}"
+
+
+class SlowQueryLog:  # pylint: disable=too-few-public-methods
+    """Logs the statements slower than threshold seconds, at most samples_per_minute of them"""
+
+    def __init__(self, threshold: float, samples_per_minute: float = 10, explain: bool = False, explain_timeout: float = 5):
+        self.threshold = threshold
+        self.explain = explain
+        self.explain_timeout = explain_timeout
+        self.limiter = RateLimiter(samples_per_minute)
+        self.suppressed = 0
+
+    def record(self, conn, cursor, statement: str, parameters, executemany: bool, seconds: float) -> None:
+        """Logs a statement that took seconds, if it is slow and the rate allows it"""
+        if seconds < self.threshold:
+            return
+        if not self.limiter.allow():
+            self.suppressed += 1
+            return
+        entry = {
+            "seconds": round(seconds, 6),
+            "statement": statement,
+            "parameters": redact(parameters),
+            "rows": cursor.rowcount,
+            "caller": caller(),
+        }
+        if self.explain and not executemany:
+            entry["plan"] = self.plan(conn, statement, parameters)
+        if self.suppressed:
+            entry["suppressed"], self.suppressed = self.suppressed, 0
+        logger.warning("Slow query %s", json.dumps(entry, default=str))
+
+    def plan(self, conn, statement: str, parameters) -> list:
+        """Returns the lines of the plan of a statement, or the error that prevented it"""
+        # the DBAPI cursor runs EXPLAIN without the engine events, so it is not timed itself
+        dbapi_connection = conn.connection.dbapi_connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(self.explain_timeout * 1000)}")
+                cursor.execute(explain_statement(statement), parameters or None)
+                return [STRING_LITERAL.sub("'?'", row[0]) for row in cursor.fetchall()]
+            except Exception as error:  # pylint: disable=broad-except
+                return [f"EXPLAIN failed: {type(error).__name__}"]
+            finally:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+
+    def instrument_engine(self, engine) -> None:
+        """Logs the slow statements executed by engine"""
+        statement_timing.subscribe(engine, self.record)
+
+
+def init_app(app, engine) -> None:
+    """Logs the slow statements of the engine when SLOW_QUERY_SECONDS is more than 0"""
+    threshold = app.config.get("SLOW_QUERY_SECONDS", 0)
+    if threshold <= 0:
+        return
+    slow_query_log = SlowQueryLog(
+        threshold,
+        app.config.get("SLOW_QUERY_SAMPLES_PER_MINUTE", 10),
+        app.config.get("SLOW_QUERY_EXPLAIN", False),
+        app.config.get("SLOW_QUERY_EXPLAIN_TIMEOUT", 5),
+    )
+    slow_query_log.instrument_engine(engine)
+    app.extensions["slow_queries"] = slow_query_log
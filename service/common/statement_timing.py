@@ -0,0 +1,65 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: statement_timing
+
+Times the SQL statements of an engine once, for every module that needs it.
+
+The first subscribe() to an engine adds its cursor event listeners, which
+keep the start of every statement on its connection (a stack, since a
+statement can run inside another's events). When a statement ends, every
+subscriber is called, in the order they subscribed, with:
+
+    subscriber(conn, cursor, statement, parameters, executemany, seconds)
+
+Statements that fail are not published. The Prometheus metrics, the
+request timing and the slow query log are the subscribers.
+"""
+import time
+from weakref import WeakKeyDictionary
+from sqlalchemy import event
+
+START_KEY = "statement_timing_start"
+
+_subscribers = WeakKeyDictionary()  # engine -> subscribers
+
+
+def subscribe(engine, subscriber) -> None:
+    """Calls subscriber with the elapsed seconds of every statement that engine executes"""
+    if engine not in _subscribers:
+        _subscribers[engine] = []
+        instrument_engine(engine, _subscribers[engine])
+    _subscribers[engine].append(subscriber)
+
+
+def instrument_engine(engine, subscribers: list) -> None:
+    """Times the statements executed by engine and publishes them to subscribers"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, _cursor, _statement, _parameters, _context, _executemany):
+        conn.info.setdefault(START_KEY, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_statement(conn, cursor, statement, parameters, _context, executemany):
+        seconds = time.perf_counter() - conn.info[START_KEY].pop()
+        for subscriber in subscribers:
+            subscriber(conn, cursor, statement, parameters, executemany, seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def failed_statement(context):
+        starts = context.connection.info.get(START_KEY) if context.connection else None
+        if starts:
+            starts.pop()
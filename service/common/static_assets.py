@@ -0,0 +1,160 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Module: static_assets
+
+Content-hashed, precompressed static assets.
+
+build_assets() copies every file of the static folder to the assets
+folder under a name that contains a hash of its contents (for example
+css/cerulean_bootstrap.min.3f2a9c1d0b7e.css), writes gzip and brotli
+versions of the text files next to it at the highest compression level,
+and rewrites the links in index.html to point at /assets/. Run it when
+the image is built:
+
+    python -m service.common.static_assets
+
+Because a hashed file never changes, /assets/ responses can be cached
+for a year. index.html itself is revalidated on every request.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from flask import current_app, request, send_from_directory
+from service.common.compression import brotli
+
+ASSETS_URL = "/assets"
+MANIFEST = "manifest.json"
+INDEX = "index.html"
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE_EXTENSIONS = {".css", ".html", ".js", ".json", ".svg", ".txt"}
+
+# File suffix of the precompressed version for each content coding
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def hashed_name(path: str, data: bytes) -> str:
+    """Returns path with a hash of data inserted before the extension"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+
+def write_asset(output_folder: str, name: str, data: bytes) -> None:
+    """Writes an asset and, for text files, its gzip and brotli versions"""
+    path = os.path.join(output_folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+    if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+        return
+    compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli:
+        compressed["br"] = brotli.compress(data, quality=11)
+    for encoding, body in compressed.items():
+        if len(body) < len(data):
+            with open(path + SUFFIXES[encoding], "wb") as file:
+                file.write(body)
+
+
+def build_assets(static_folder: str, output_folder: str) -> dict:
+    """Builds the assets of static_folder into output_folder
+
+    Returns the manifest, which maps each static path to its hashed name.
+    """
+    static_folder, output_folder = os.path.abspath(static_folder), os.path.abspath(output_folder)
+    shutil.rmtree(output_folder, ignore_errors=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        # Never descend into a previous build
+        dirs[:] = [name for name in dirs if os.path.join(root, name) != output_folder]
+        for filename in files:
+            path = os.path.relpath(os.path.join(root, filename), static_folder).replace(os.sep, "/")
+            if path == INDEX:
+                continue
+            with open(os.path.join(root, filename), "rb") as file:
+                data = file.read()
+            manifest[path] = hashed_name(path, data)
+            write_asset(output_folder, manifest[path], data)
+
+    with open(os.path.join(static_folder, INDEX), encoding="utf-8") as file:
+        index = file.read()
+    write_asset(output_folder, INDEX, rewrite_links(index, manifest).encode())
+    with open(os.path.join(output_folder, MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def rewrite_links(html: str, manifest: dict) -> str:
+    """Replaces the static/... links of an HTML page with their hashed /assets/... URLs"""
+
+    def replace(match):
+        path = match.group(2)
+        if path not in manifest:
+            return match.group(0)
+        return f"{match.group(1)}{ASSETS_URL}/{manifest[path]}"
+
+    return re.sub(r"""((?:href|src)\s*=\s*["'])/?static/([^"']+)""", replace, html)
+
+
+def send_asset(filename: str, cache_control: str = IMMUTABLE):
+    """Sends a built asset, precompressed when the client accepts it"""
+    folder = current_app.config["ASSETS_FOLDER"]
+    available = [
+        encoding for encoding, suffix in SUFFIXES.items()
+        if os.path.isfile(os.path.join(folder, filename + suffix))
+    ]
+    encoding = request.accept_encodings.best_match(available) if available else None
+    if encoding is None:
+        response = send_from_directory(folder, filename)
+    else:
+        response = send_from_directory(folder, filename + SUFFIXES[encoding], mimetype=_mimetype(filename))
+        response.headers["Content-Encoding"] = encoding
+    if available:
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def _mimetype(filename: str):
+    """Returns the mimetype of the uncompressed file"""
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def send_index():
+    """Sends the built index.html, or the one of the static folder if the assets are not built"""
+    if not os.path.isfile(os.path.join(current_app.config["ASSETS_FOLDER"], INDEX)):
+        return current_app.send_static_file(INDEX)
+    return send_asset(INDEX, cache_control="no-cache")
+
+
+def main(argv=None):
+    """Builds the static assets from the command line"""
+    static_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--static-folder", default=static_folder)
+    parser.add_argument("--output", default=os.path.join(static_folder, "dist"))
+    args = parser.parse_args(argv)
+    manifest = build_assets(args.static_folder, args.output)
+    print(f"Built {len(manifest)} assets into {args.output}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
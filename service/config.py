@@ -15,6 +15,66 @@ SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 # SQLALCHEMY_POOL_SIZE = 2
 
+# Let Postgres build the JSON documents of the GET endpoints (json_build_object
+# and json_agg) and stream them back without serializing them in Python
+DATABASE_JSON = os.getenv("DATABASE_JSON", "False").lower() == "true"
+
+# JSON encoder for requests and responses: orjson, msgspec, json or auto
+# (the fastest one installed, falling back to the standard library)
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+
+# Responses smaller than this (in bytes) are not compressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+# Content-hashed, precompressed static assets built by
+# python -m service.common.static_assets
+ASSETS_FOLDER = os.getenv(
+    "ASSETS_FOLDER", os.path.join(os.path.dirname(__file__), "static", "dist")
+)
+
+# Swagger specification written by "flask api-spec" (generated at startup
+# when the file does not exist)
+API_SPEC_FILE = os.getenv("API_SPEC_FILE")
+
+# NDJSON uploads to /api/wishlists/imports are committed every IMPORT_BATCH_SIZE
+# lines, and lines longer than IMPORT_MAX_LINE_BYTES are rejected
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", "1048576"))
+# A running upload without a new batch for IMPORT_STALE_SECONDS lost its worker
+IMPORT_STALE_SECONDS = float(os.getenv("IMPORT_STALE_SECONDS", "600"))
+
+# Requests are written to CAPTURE_FILE as NDJSON when it is set ("{pid}" is
+# replaced with the process id), with the SHA-256 of their body, or the body
+# itself up to CAPTURE_MAX_BODY_BYTES when CAPTURE_BODIES is "full". The file
+# is rotated every CAPTURE_MAX_BYTES, keeping CAPTURE_BACKUP_COUNT old files.
+CAPTURE_FILE = os.getenv("CAPTURE_FILE")
+CAPTURE_BODIES = os.getenv("CAPTURE_BODIES", "hash")
+CAPTURE_MAX_BODY_BYTES = int(os.getenv("CAPTURE_MAX_BODY_BYTES", "65536"))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", "10485760"))
+CAPTURE_BACKUP_COUNT = int(os.getenv("CAPTURE_BACKUP_COUNT", "5"))
+
+# Every response gets a Server-Timing header splitting its time between the
+# SQL statements, serialization, encoding and the rest of Python, which is
+# also logged as one JSON line per request
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "False").lower() == "true"
+
+# Requests that run more SQL statements than the @query_budget of their resource
+# method, or the same statement shape QUERY_REPEAT_LIMIT times (N+1), raise
+# QueryBudgetExceeded ("raise"), are logged ("warn") or are not checked ("off").
+# "auto" raises in tests, warns in debug mode and is off otherwise.
+QUERY_BUDGETS = os.getenv("QUERY_BUDGETS", "auto")
+QUERY_REPEAT_LIMIT = int(os.getenv("QUERY_REPEAT_LIMIT", "5"))
+
+# Statements slower than SLOW_QUERY_SECONDS (0 for none) are logged with their
+# redacted parameters and the line of service/models that ran them, and with
+# SLOW_QUERY_EXPLAIN their plan (EXPLAIN (ANALYZE, BUFFERS) for queries, stopped
+# after SLOW_QUERY_EXPLAIN_TIMEOUT seconds). Each process logs at most
+# SLOW_QUERY_SAMPLES_PER_MINUTE of them.
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.5"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "False").lower() == "true"
+SLOW_QUERY_EXPLAIN_TIMEOUT = float(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT", "5"))
+SLOW_QUERY_SAMPLES_PER_MINUTE = float(os.getenv("SLOW_QUERY_SAMPLES_PER_MINUTE", "10"))
+
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "sup3r-s3cr3t")
 LOGGING_LEVEL = logging.INFO
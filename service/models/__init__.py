@@ -4,6 +4,8 @@ Models for Wishlists
 All of the models are stored in this package
 """
 
-from .persistent_base import db, DataValidationError
+from .persistent_base import db, DataValidationError, VersionConflictError
 from .wishlists import Wishlists
 from .wishlist_items import WishlistItems
+from .import_jobs import ImportJobs
+from .records import WishlistRecord, WishlistItemRecord
@@ -0,0 +1,231 @@
+######################################################################
+# Copyright 2025 Dingwen Wang. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Parallel export of the wishlists and wishlist_items tables
+
+TableExport splits the key of each table (wishlists.id and
+wishlist_items.wishlist_id) into ranges and a process pool writes one
+file per range: CSV straight from COPY ... TO STDOUT, or Parquet with
+pyarrow when it is installed. Every worker process opens one connection
+of its own, and all of them read the snapshot exported by the connection
+that planned the ranges, like pg_dump --jobs, so the files are
+consistent with each other however long the export takes.
+"""
+import glob
+import os
+import multiprocessing
+import psycopg
+from sqlalchemy import Date, DateTime, Integer, String, text
+from .wishlists import Wishlists
+from .wishlist_items import WishlistItems
+
+try:
+    import pyarrow
+    from pyarrow import parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+# Tables that can be exported, with the key their ranges are taken on
+EXPORT_TABLES = {
+    "wishlists": (Wishlists.__table__, "id"),
+    "wishlist_items": (WishlistItems.__table__, "wishlist_id"),
+}
+
+FORMATS = ("csv", "parquet")
+
+# Rows fetched and written per Parquet row group
+PARQUET_BATCH_SIZE = 65536
+
+
+def formats() -> tuple:
+    """Returns the file formats that can be written"""
+    return FORMATS if pyarrow else FORMATS[:1]
+
+
+def check_columns(table_name: str, columns=None) -> list:
+    """Returns the columns to export from a table, all of them by default
+
+    Raises ValueError for an unknown table or column.
+    """
+    if table_name not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table_name}; use {', '.join(EXPORT_TABLES)}")
+    names = EXPORT_TABLES[table_name][0].columns.keys()
+    unknown = [column for column in columns or [] if column not in names]
+    if unknown:
+        raise ValueError(f"Unknown {table_name} columns: {', '.join(unknown)}; use {', '.join(names)}")
+    return list(columns or names)
+
+
+def id_ranges(low: int, high: int, partitions: int, bounds=None) -> list:
+    """Splits low..high into at most partitions contiguous (start, end) ranges
+
+    bounds are the histogram bounds Postgres keeps for the key: ranges are
+    cut at evenly spaced bounds so that they hold about as many rows each
+    however the ids are spread. They are of equal width when there are no
+    bounds, or too few between low and high because the statistics are stale.
+    """
+    if low is None:
+        return []
+    bounds = [bound for bound in bounds or [] if low < bound <= high]
+    cuts = {bounds[len(bounds) * index // partitions] for index in range(1, partitions)} if bounds else set()
+    if len(cuts) < partitions - 1:
+        size = -(-(high - low + 1) // partitions)  # rounded up
+        cuts = range(low + size, high + 1, size)
+    starts = [low] + sorted(cuts)
+    return [(start, end - 1) for start, end in zip(starts, starts[1:] + [high + 1])]
+
+
+def table_ranges(connection, table_name: str, partitions: int) -> list:
+    """Splits the keys of a table into ranges with id_ranges(), using the statistics of the key"""
+    key = EXPORT_TABLES[table_name][1]
+    low, high = connection.execute(text(f"SELECT min({key}), max({key}) FROM {table_name}")).one()
+    bounds = connection.execute(
+        text(
+            "SELECT histogram_bounds::text::bigint[] FROM pg_stats "
+            "WHERE schemaname = current_schema() AND tablename = :table AND attname = :key"
+        ),
+        {"table": table_name, "key": key},
+    ).scalar()
+    return id_ranges(low, high, partitions, bounds)
+
+
+class TableExport:
+    """Exports tables into output_dir/<table>/part-NNNNN.<file_format> with a pool of workers
+
+    progress is called with (table, path, rows) after every file.
+    """
+
+    def __init__(self, output_dir: str, file_format: str = "csv", workers: int = None, progress=None):
+        if file_format not in formats():
+            raise ValueError(f"Unsupported format: {file_format}; use {', '.join(formats())}")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.workers = workers or os.cpu_count()
+        self.progress = progress or (lambda table, path, rows: None)
+
+    def plan(self, connection, tables: dict, partitions: int, snapshot: str) -> list:
+        """Lists one task per range of each table, numbered in key order, and clears the last export"""
+        tasks = []
+        for table_name, columns in tables.items():
+            folder = self._clear_folder(table_name)
+            for index, (start, end) in enumerate(table_ranges(connection, table_name, partitions)):
+                path = os.path.join(folder, f"part-{index:05d}.{self.file_format}")
+                tasks.append((table_name, columns, start, end, path, self.file_format, snapshot))
+        return tasks
+
+    def _clear_folder(self, table_name: str) -> str:
+        """Creates the folder of a table, or removes the files of the last export from it"""
+        folder = os.path.join(self.output_dir, table_name)
+        os.makedirs(folder, exist_ok=True)
+        for extension in FORMATS:
+            for old in glob.glob(os.path.join(folder, f"part-*.{extension}")):
+                os.remove(old)
+        return folder
+
+    def run(self, connection, tables: dict, partitions: int = None) -> dict:
+        """Exports tables, a dict of table names to the columns to export (None for all)
+
+        partitions is the number of ranges per table, 4 per worker by
+        default. The ranges are planned on connection, a SQLAlchemy
+        connection that holds the exported snapshot open until every worker
+        is done. Returns the number of rows and files written per table.
+        """
+        tables = {name: check_columns(name, columns) for name, columns in tables.items()}
+        conninfo = connection.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = connection.execution_options(isolation_level="REPEATABLE READ")
+        with connection.begin():
+            snapshot = connection.execute(text("SELECT pg_export_snapshot()")).scalar()
+            tasks = self.plan(connection, tables, partitions or self.workers * 4, snapshot)
+            return self._export(tasks, conninfo, tables)
+
+    def _export(self, tasks: list, conninfo: str, tables: dict) -> dict:
+        """Runs the tasks in a pool of processes connected to conninfo and totals their rows"""
+        totals = {name: {"rows": 0, "files": 0} for name in tables}
+        with multiprocessing.Pool(min(self.workers, len(tasks)) or 1, _connect, (conninfo,)) as pool:
+            for table_name, path, rows in pool.imap_unordered(export_partition, tasks):
+                totals[table_name]["rows"] += rows
+                totals[table_name]["files"] += 1
+                self.progress(table_name, path, rows)
+        return totals
+
+
+######################################################################
+#  W O R K E R S
+######################################################################
+_worker = {}
+
+
+def _connect(conninfo: str) -> None:
+    """Opens the connection of a worker process"""
+    _worker["connection"] = psycopg.connect(conninfo, autocommit=True)
+
+
+def export_partition(task: tuple) -> tuple:
+    """Writes the rows of one key range of a table to a file, in the snapshot of the export
+
+    Returns (table, path, rows).
+    """
+    table_name, columns, start, end, path, file_format, snapshot = task
+    key = EXPORT_TABLES[table_name][1]
+    query = (
+        f"SELECT {', '.join(columns)} FROM {table_name} WHERE {key} BETWEEN {int(start)} AND {int(end)} "
+        f"ORDER BY {', '.join(column.name for column in EXPORT_TABLES[table_name][0].primary_key)}"
+    )
+    connection = _worker["connection"]
+    with connection.transaction():
+        connection.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        connection.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+        if file_format == "csv":
+            rows = _write_csv(connection, query, path)
+        else:
+            rows = _write_parquet(connection, query, path, arrow_schema(table_name, columns))
+    return table_name, path, rows
+
+
+def _write_csv(connection, query: str, path: str) -> int:
+    """Copies the rows of a query into a CSV file with a header line"""
+    with connection.cursor() as cursor, open(path, "wb") as file:
+        with cursor.copy(f"COPY ({query}) TO STDOUT (FORMAT csv, HEADER)") as copy:
+            for block in copy:
+                file.write(block)
+        return cursor.rowcount
+
+
+def arrow_schema(table_name: str, columns: list):
+    """Returns the Parquet schema of columns of a table"""
+    table = EXPORT_TABLES[table_name][0]
+    types = {Integer: pyarrow.int32(), String: pyarrow.string(), Date: pyarrow.date32()}
+    fields = []
+    for name in columns:
+        column = table.columns[name]
+        if isinstance(column.type, DateTime):
+            arrow_type = pyarrow.timestamp("us", tz="UTC")
+        else:
+            arrow_type = next(value for kind, value in types.items() if isinstance(column.type, kind))
+        fields.append(pyarrow.field(name, arrow_type, nullable=column.nullable))
+    return pyarrow.schema(fields)
+
+
+def _write_parquet(connection, query: str, path: str, schema) -> int:
+    """Writes the rows of a query into a Parquet file, one row group per PARQUET_BATCH_SIZE rows"""
+    rows = 0
+    with connection.cursor(name="export") as cursor, parquet.ParquetWriter(path, schema) as writer:
+        cursor.execute(query)
+        while batch := cursor.fetchmany(PARQUET_BATCH_SIZE):
+            arrays = [pyarrow.array(values, field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    return rows
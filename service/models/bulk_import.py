@@ -0,0 +1,446 @@
+######################################################################
+# Copyright 2025 Dingwen Wang. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Bulk import of Wishlists and their items
+
+WishlistImport streams CSV or NDJSON files into temporary staging tables
+with COPY, checks every row in SQL against the JSON Schemas that validate
+the REST API payloads, and merges the valid rows into wishlists and
+wishlist_items with a few INSERT ... ON CONFLICT statements per batch of
+Wishlist ids. Invalid rows are skipped and reported with their line.
+
+A row that has an id updates (or restores) the Wishlist with that id, so
+the output of wishlists-export can be imported again; the other rows
+create new Wishlists. Imported items replace the items with the same
+product_id, and items without a position are appended to their Wishlist.
+"""
+import csv
+from flask import current_app
+from sqlalchemy import text
+from .schemas import WISHLIST_ITEM_SCHEMA, WISHLIST_SCHEMA
+
+# Columns of the CSV files, and of the staging tables
+WISHLIST_COLUMNS = ("id", "customer_id", "name", "description", "category", "created_date")
+ITEM_COLUMNS = ("wishlist_id", "product_id", "description", "position")
+
+# Items that are appended get positions this far apart, like POST /items
+POSITION_GAP = 1000
+
+# Amount of NDJSON sent to COPY at a time
+COPY_BLOCK_SIZE = 1 << 20
+
+# NDJSON is copied as CSV with delimiter and quote characters that JSON
+# cannot contain unescaped, so that documents are copied verbatim
+NDJSON_COPY = "COPY import_documents (line, doc, error) FROM STDIN (FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01')"
+
+JSONB_TYPES = {"integer": "number", "string": "string", "null": "null"}
+
+DATE_PATTERN = "^(?!0000)[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$"
+
+
+######################################################################
+#  V A L I D A T I O N   R U L E S   I N   S Q L
+######################################################################
+def _types(prop: dict) -> list:
+    """Returns the JSON Schema types of a property as a list"""
+    return prop["type"] if isinstance(prop["type"], list) else [prop["type"]]
+
+
+def json_type_errors(schema: dict, doc: str) -> str:
+    """Builds a SQL expression that checks the JSON types of the properties of a jsonb document
+
+    It evaluates to the message of the first property of the wrong type,
+    worded like the errors of compile_schema(), or NULL.
+    """
+    cases = []
+    for key, prop in schema["properties"].items():
+        allowed = ", ".join(f"'{JSONB_TYPES[name]}'" for name in _types(prop))
+        message = f"Invalid type: {key} must be {' or '.join(_types(prop))}"
+        cases.append(f"WHEN jsonb_typeof({doc} -> '{key}') NOT IN ({allowed}) THEN '{message}'")
+    return "CASE " + " ".join(cases) + " END"
+
+
+def text_errors(schema: dict, columns) -> str:
+    """Builds a SQL expression that checks text columns against the rules of a JSON Schema
+
+    It evaluates to the message of the first rule that fails, worded like
+    the errors of compile_schema(), or NULL. Only the rules used by the
+    schemas of this service are supported: required, integer, minLength,
+    maxLength and the date format.
+    """
+    cases = [f"WHEN {key} IS NULL THEN 'Missing key: {key}'" for key in schema.get("required", [])]
+    for key in columns:
+        prop = schema["properties"][key]
+        if "integer" in _types(prop):
+            # A CASE guarantees that only digits are cast; translate() is cheaper than a regular expression
+            cases.append(
+                f"WHEN CASE WHEN length({key}) BETWEEN 1 AND 11 AND {key} <> '-' "
+                f"AND translate(left({key}, 1), '-0123456789', '') = '' "
+                f"AND translate(substr({key}, 2), '0123456789', '') = '' "
+                f"THEN {key}::bigint NOT BETWEEN -2147483648 AND 2147483647 "
+                f"ELSE {key} IS NOT NULL END THEN 'Invalid type: {key} must be integer'"
+            )
+        if "minLength" in prop:
+            cases.append(
+                f"WHEN length({key}) < {prop['minLength']} "
+                f"THEN 'Invalid value: {key} must be longer than or equal to {prop['minLength']} characters'"
+            )
+        if "maxLength" in prop:
+            cases.append(
+                f"WHEN length({key}) > {prop['maxLength']} "
+                f"THEN 'Invalid value: {key} must be shorter than or equal to {prop['maxLength']} characters'"
+            )
+        if prop.get("format") == "date":
+            cases.append(
+                f"WHEN CASE WHEN {key} ~ '{DATE_PATTERN}' "
+                f"THEN substr({key}, 9, 2)::integer > extract(day from "
+                f"(substr({key}, 1, 8) || '01')::date + interval '1 month - 1 day') "
+                f"ELSE {key} IS NOT NULL END THEN 'Invalid value: {key} must be date'"
+            )
+    return "CASE " + " ".join(cases) + " END"
+
+
+######################################################################
+#  I M P O R T
+######################################################################
+class WishlistImport:
+    """Imports Wishlists and their items in bulk through staging tables
+
+    Everything runs on one connection of its own, because the staging
+    tables are temporary: load the files with load_ndjson() or load_csv(),
+    then call validate() and merge(), and close() to drop the staging
+    tables before the connection goes back to the pool. progress is called
+    with a message after every step.
+    """
+
+    STAGING_TABLES = ("import_wishlists", "import_items", "import_documents", "valid_wishlists", "valid_items",
+                      "import_targets")
+
+    def __init__(self, connection, batch_size: int = 10000, progress=None):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.counts = {"wishlists": 0, "items": 0, "invalid_wishlists": 0, "invalid_items": 0}
+        self._create_staging_tables()
+
+    def _execute(self, sql: str, **params):
+        """Runs a statement on the import connection"""
+        return self.connection.execute(text(sql), params)
+
+    def _create_staging_tables(self) -> None:
+        """Creates the temporary tables the files are copied into"""
+        columns = " text, ".join(WISHLIST_COLUMNS)
+        self._execute(
+            f"""CREATE TEMP TABLE import_wishlists (
+                line bigint GENERATED BY DEFAULT AS IDENTITY (START WITH 2), {columns} text, error text)"""
+        )
+        columns = " text, ".join(ITEM_COLUMNS)
+        self._execute(
+            f"""CREATE TEMP TABLE import_items (
+                line bigint GENERATED BY DEFAULT AS IDENTITY (START WITH 2), item integer,
+                wishlist_line bigint, {columns} text, error text)"""
+        )
+        self._execute("CREATE TEMP TABLE import_documents (line bigint, doc jsonb, error text)")
+
+    def close(self) -> None:
+        """Drops the staging tables"""
+        self.connection.rollback()
+        self._execute(f"DROP TABLE IF EXISTS {', '.join(self.STAGING_TABLES)}")
+        self.connection.commit()
+
+    def _copy(self, sql: str, blocks) -> int:
+        """Streams blocks of bytes to a COPY ... FROM STDIN statement and returns the bytes sent"""
+        size = 0
+        with self.connection.connection.driver_connection.cursor() as cursor:
+            with cursor.copy(sql) as copy:
+                for block in blocks:
+                    copy.write(block)
+                    size += len(block)
+                    if size // (64 << 20) != (size - len(block)) // (64 << 20):
+                        self.progress(f"Copied {size / 2**20:,.0f} MiB")
+        return size
+
+    # ------------------------------------------------------------------
+    # L O A D
+    # ------------------------------------------------------------------
+    def load_csv(self, file, items: bool = False) -> int:
+        """Copies a CSV file of Wishlists, or of items with items=True, into the staging tables
+
+        The first line must name the columns, which can be any of
+        WISHLIST_COLUMNS (or ITEM_COLUMNS) in any order. Returns the number
+        of bytes read.
+        """
+        table, allowed = ("import_items", ITEM_COLUMNS) if items else ("import_wishlists", WISHLIST_COLUMNS)
+        header_line = file.readline()
+        header = next(csv.reader([header_line.decode("utf-8-sig")]), [])
+        unknown = [name for name in header if name not in allowed]
+        if not header or unknown:
+            raise ValueError(f"Unknown CSV columns: {', '.join(unknown) or '(none)'}; use {', '.join(allowed)}")
+
+        def blocks():
+            yield header_line
+            yield from iter(lambda: file.read(COPY_BLOCK_SIZE), b"")
+
+        size = self._copy(f"COPY {table} ({', '.join(header)}) FROM STDIN (FORMAT csv, HEADER true)", blocks())
+        self.progress(f"Copied {size:,} bytes of {table[7:]} CSV")
+        return size
+
+    def load_ndjson(self, file) -> int:
+        """Copies a file with one Wishlist document per line (items embedded) into the staging tables
+
+        Lines are checked to be JSON objects on the way and the documents
+        are then unpacked in SQL. Returns the number of bytes read.
+        """
+        size = self._copy(NDJSON_COPY, self._ndjson_blocks(file))
+        self.progress(f"Copied {size:,} bytes of NDJSON")
+        self._execute(
+            f"""INSERT INTO import_wishlists (line, {", ".join(WISHLIST_COLUMNS)}, error)
+            SELECT line, {", ".join(f"doc ->> '{key}'" for key in WISHLIST_COLUMNS)},
+                   coalesce(error, {json_type_errors(WISHLIST_SCHEMA, "doc")},
+                            CASE WHEN jsonb_typeof(doc -> 'wishlist_items') <> 'array'
+                                 THEN 'Invalid type: wishlist_items must be array' END)
+            FROM import_documents"""
+        )
+        self._execute(
+            f"""INSERT INTO import_items (line, item, wishlist_line, {", ".join(ITEM_COLUMNS[1:])}, error)
+            SELECT line, item, line, {", ".join(f"element ->> '{key}'" for key in ITEM_COLUMNS[1:])},
+                   CASE WHEN jsonb_typeof(element) <> 'object' THEN 'Invalid type: item must be object'
+                        ELSE {json_type_errors(WISHLIST_ITEM_SCHEMA, "element")} END
+            FROM (SELECT line, doc -> 'wishlist_items' AS items FROM import_documents WHERE error IS NULL) AS documents,
+                 jsonb_array_elements(CASE WHEN jsonb_typeof(items) = 'array' THEN items END)
+                     WITH ORDINALITY AS elements (element, item)"""
+        )
+        self._execute("TRUNCATE import_documents")
+        return size
+
+    @staticmethod
+    def _ndjson_blocks(file):
+        """Turns NDJSON lines into blocks of COPY rows: line number, document and error"""
+        rows = []
+        buffered = 0
+        for number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            error = _document_error(line)
+            row = b"%d\x02%s\x02%s\n" % (number, b"" if error else line, error.encode() if error else b"")
+            rows.append(row)
+            buffered += len(row)
+            if buffered >= COPY_BLOCK_SIZE:
+                yield b"".join(rows)
+                rows, buffered = [], 0
+        if rows:
+            yield b"".join(rows)
+
+    # ------------------------------------------------------------------
+    # V A L I D A T E
+    # ------------------------------------------------------------------
+    def validate(self) -> dict:
+        """Checks the staged rows and copies the valid ones, typed, into valid_wishlists and valid_items
+
+        Only the invalid rows of the staging tables are updated, so each
+        valid row is written once more. Returns the counts of staged and
+        invalid rows.
+        """
+        checks = text_errors(WISHLIST_SCHEMA, WISHLIST_COLUMNS)
+        self._execute(f"UPDATE import_wishlists SET error = {checks} WHERE error IS NULL AND {checks} IS NOT NULL")
+        self._execute(
+            """UPDATE import_wishlists SET error = 'Invalid value: duplicate id ' || id
+            FROM (SELECT line AS duplicate, row_number() OVER (PARTITION BY id ORDER BY line) AS occurrence
+                  FROM import_wishlists WHERE error IS NULL AND id IS NOT NULL) AS ids
+            WHERE line = duplicate AND occurrence > 1"""
+        )
+        self._execute(
+            """CREATE TEMP TABLE valid_wishlists AS
+            SELECT line, coalesce(id::integer, nextval(pg_get_serial_sequence('wishlists', 'id'))) AS id,
+                   customer_id::integer AS customer_id, name, description, category,
+                   coalesce(created_date::date, current_date) AS created_date
+            FROM import_wishlists WHERE error IS NULL"""
+        )
+
+        # Items are checked once their Wishlist is known
+        self._execute(
+            """UPDATE import_items
+            SET error = 'Invalid value: the Wishlist on line ' || wishlists.line || ' is invalid'
+            FROM import_wishlists AS wishlists
+            WHERE wishlists.line = import_items.wishlist_line AND wishlists.error IS NOT NULL
+              AND import_items.error IS NULL"""
+        )
+        checks = (
+            "coalesce(CASE WHEN wishlist_line IS NULL AND wishlist_id IS NULL THEN 'Missing key: wishlist_id' END, "
+            f"{text_errors(WISHLIST_ITEM_SCHEMA, ITEM_COLUMNS)})"
+        )
+        self._execute(f"UPDATE import_items SET error = {checks} WHERE error IS NULL AND {checks} IS NOT NULL")
+        self._execute(
+            """CREATE TEMP TABLE valid_items AS
+            SELECT items.line, item, coalesce(wishlists.id, wishlist_id::integer) AS wishlist_id,
+                   product_id::integer AS product_id, items.description, position::integer AS position
+            FROM import_items AS items LEFT JOIN valid_wishlists AS wishlists ON wishlists.line = items.wishlist_line
+            WHERE error IS NULL"""
+        )
+        self._reject_items(
+            "'Invalid value: unknown wishlist_id ' || rejected.wishlist_id",
+            """NOT EXISTS (SELECT 1 FROM valid_wishlists AS wishlists WHERE wishlists.id = valid_items.wishlist_id)
+            AND NOT EXISTS (SELECT 1 FROM wishlists WHERE wishlists.id = valid_items.wishlist_id)""",
+        )
+        self._reject_items(
+            "'Invalid value: duplicate product_id ' || rejected.product_id",
+            """ctid IN (SELECT ctid FROM (
+                SELECT ctid, row_number() OVER (PARTITION BY wishlist_id, product_id ORDER BY line, item) AS occurrence
+                FROM valid_items) AS products WHERE occurrence > 1)""",
+        )
+
+        # The ids of the Wishlists to merge, which are processed in batches
+        self._execute(
+            """CREATE TEMP TABLE import_targets AS
+            SELECT id FROM valid_wishlists UNION SELECT wishlist_id FROM valid_items"""
+        )
+        self._execute("ALTER TABLE import_targets ADD PRIMARY KEY (id)")
+        self._execute("CREATE INDEX ON valid_wishlists (id)")
+        self._execute("CREATE INDEX ON valid_items (wishlist_id)")
+        self._execute("ANALYZE valid_wishlists")
+        self._execute("ANALYZE valid_items")
+
+        counts = self._execute(
+            """SELECT (SELECT count(*) FROM import_wishlists), (SELECT count(*) FROM valid_wishlists),
+                      (SELECT count(*) FROM import_items), (SELECT count(*) FROM valid_items)"""
+        ).one()
+        self.counts.update(
+            staged_wishlists=counts[0],
+            invalid_wishlists=counts[0] - counts[1],
+            staged_items=counts[2],
+            invalid_items=counts[2] - counts[3],
+        )
+        self.connection.commit()
+        self.progress(
+            f"Validated {counts[0]:,} wishlists ({self.counts['invalid_wishlists']:,} invalid) "
+            f"and {counts[2]:,} items ({self.counts['invalid_items']:,} invalid)"
+        )
+        return self.counts
+
+    def _reject_items(self, message: str, condition: str) -> None:
+        """Moves the valid items that match a condition back to import_items with an error"""
+        self._execute(
+            f"""WITH rejected AS (
+                DELETE FROM valid_items WHERE {condition} RETURNING line, item, wishlist_id, product_id)
+            UPDATE import_items SET error = {message}
+            FROM rejected WHERE import_items.line = rejected.line AND import_items.item IS NOT DISTINCT FROM rejected.item"""
+        )
+
+    def errors(self, limit: int = 20) -> list:
+        """Returns up to limit invalid rows as (table, line, item, message), in file order
+
+        table is "wishlists" or "items"; item is the position of an item in
+        its NDJSON line. Items skipped because their Wishlist is invalid are
+        not repeated.
+        """
+        return [
+            tuple(row)
+            for row in self._execute(
+                """SELECT 'wishlists' AS source, line, NULL AS item, error FROM import_wishlists
+                WHERE error IS NOT NULL
+                UNION ALL
+                SELECT 'items', line, item, error FROM import_items
+                WHERE error IS NOT NULL AND error NOT LIKE 'Invalid value: the Wishlist on line %'
+                ORDER BY source DESC, line, item NULLS FIRST LIMIT :limit""",
+                limit=limit,
+            )
+        ]
+
+    # ------------------------------------------------------------------
+    # M E R G E
+    # ------------------------------------------------------------------
+    def merge(self) -> dict:
+        """Merges the valid rows into the tables, committing one batch of Wishlist ids at a time"""
+        start = self._execute("SELECT min(id) FROM import_targets").scalar()
+        while start is not None:
+            end = self._execute(
+                """SELECT max(id) FROM (
+                    SELECT id FROM import_targets WHERE id >= :start ORDER BY id LIMIT :size) AS batch""",
+                start=start,
+                size=self.batch_size,
+            ).scalar()
+            self._merge_batch(start, end)
+            self.connection.commit()
+            self.progress(
+                f"Merged ids {start}-{end} ({self.counts['wishlists']:,} wishlists, "
+                f"{self.counts['items']:,} items so far)"
+            )
+            start = self._execute("SELECT min(id) FROM import_targets WHERE id > :end", end=end).scalar()
+
+        # Ids given in the files must not be handed out again
+        self._execute(
+            """SELECT setval(sequence, greatest(coalesce(pg_sequence_last_value(sequence::regclass), 1),
+                                                (SELECT coalesce(max(id), 1) FROM wishlists)))
+            FROM pg_get_serial_sequence('wishlists', 'id') AS sequence"""
+        )
+        self.connection.commit()
+        return self.counts
+
+    def _merge_batch(self, start: int, end: int) -> None:
+        """Upserts the Wishlists and items with start <= wishlist id <= end"""
+        columns = ", ".join(WISHLIST_COLUMNS)
+        self.counts["wishlists"] += self._execute(
+            f"""INSERT INTO wishlists ({columns}, version, item_count)
+            SELECT {columns}, 1, 0 FROM valid_wishlists WHERE id BETWEEN :start AND :end
+            ON CONFLICT (id) DO UPDATE SET
+                customer_id = excluded.customer_id, name = excluded.name, description = excluded.description,
+                category = excluded.category, updated_date = current_date, version = wishlists.version + 1""",
+            start=start,
+            end=end,
+        ).rowcount
+
+        self.counts["items"] += self._execute(
+            f"""INSERT INTO wishlist_items (wishlist_id, product_id, description, position)
+            SELECT staged.wishlist_id, product_id, staged.description,
+                   coalesce(staged.position, coalesce(last.position, 0) + {POSITION_GAP} * row_number() OVER (
+                       PARTITION BY staged.wishlist_id, staged.position IS NULL ORDER BY line, item))
+            FROM valid_items AS staged
+            LEFT JOIN (SELECT wishlist_id, max(position) AS position FROM wishlist_items
+                       WHERE wishlist_id BETWEEN :start AND :end GROUP BY wishlist_id) AS last
+                ON last.wishlist_id = staged.wishlist_id
+            WHERE staged.wishlist_id BETWEEN :start AND :end
+            ON CONFLICT (wishlist_id, product_id) DO UPDATE SET
+                description = excluded.description, position = excluded.position""",
+            start=start,
+            end=end,
+        ).rowcount
+
+        # Keep the item summary in step, and version the Wishlists that only got items
+        self._execute(
+            """UPDATE wishlists SET item_count = counts.item_count, last_item_added_at = now(),
+                version = wishlists.version + CASE WHEN staged.id IS NULL THEN 1 ELSE 0 END,
+                updated_date = CASE WHEN staged.id IS NULL THEN current_date ELSE updated_date END
+            FROM (SELECT wishlist_id, count(*) AS item_count FROM wishlist_items
+                  WHERE wishlist_id IN (SELECT wishlist_id FROM valid_items WHERE wishlist_id BETWEEN :start AND :end)
+                  GROUP BY wishlist_id) AS counts
+            LEFT JOIN (SELECT id FROM valid_wishlists WHERE id BETWEEN :start AND :end) AS staged
+                ON staged.id = counts.wishlist_id
+            WHERE wishlists.id = counts.wishlist_id""",
+            start=start,
+            end=end,
+        )
+
+
+def _document_error(line: bytes):
+    """Returns why an NDJSON line cannot be imported, or None"""
+    if b"\\u0000" in line:
+        return "Invalid value: \\u0000 is not supported"
+    try:
+        document = current_app.json.loads(line)
+    except ValueError:
+        return "Invalid JSON"
+    return None if isinstance(document, dict) else "Invalid type: line must be object"
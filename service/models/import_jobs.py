@@ -0,0 +1,268 @@
+######################################################################
+# Copyright 2025 Dingwen Wang. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Model class for ImportJobs
+
+An ImportJob creates Wishlists from NDJSON read line by line from a
+stream, such as the body of an upload, without holding more than one
+batch in memory. Every line is validated with the rules of
+Wishlists.deserialize() and WishlistItems.deserialize(), like the POST
+endpoints, and every batch of lines is committed in a transaction of its
+own together with the progress of the job, so the row of the job always
+tells how far the upload got, from any process.
+
+A job that fails is marked as failed with the error that stopped it.
+A job whose process was killed cannot say so itself, so a running job
+that made no progress for a while is marked as failed by
+abandon_stale() when the jobs are read.
+
+Jobs are only created by uploads, never from a document, so unlike the
+other models they are not PersistentBase records.
+"""
+
+import logging
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import JSONB
+from .persistent_base import db, DataValidationError
+from .wishlists import Wishlists
+from .schemas import validate_wishlist_item
+
+logger = logging.getLogger("flask.app")
+
+# Invalid lines that are described in the job, the others are only counted
+MAX_JOB_ERRORS = 100
+
+# Columns set by Wishlists.deserialize(), and the columns of the items
+WISHLIST_COLUMNS = ("customer_id", "name", "description", "category", "created_date", "updated_date")
+ITEM_COLUMNS = ("product_id", "description", "position")
+
+
+class ImportJobs(db.Model):
+    """Class that represents the upload of Wishlists in bulk"""
+
+    __tablename__ = "import_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(16), nullable=False, default="running")
+    lines = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    invalid = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=False, default=list)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f"<ImportJobs id=[{self.id}] {self.status}>"
+
+    def serialize(self) -> dict:
+        """Convert an ImportJob into a dictionary"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "lines": self.lines,
+            "imported": self.imported,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at and self.updated_at.isoformat(),
+        }
+
+    def create(self) -> None:
+        """Commits a new job, so that its id can be polled"""
+        db.session.add(self)
+        db.session.commit()
+
+    @classmethod
+    def find(cls, job_id: int):
+        """Returns the job with the given id, or None"""
+        return db.session.get(cls, job_id)
+
+    @classmethod
+    def recent(cls, limit: int = 20):
+        """Returns the last jobs that were started, the newest first"""
+        return cls.query.order_by(cls.id.desc()).limit(limit).all()
+
+    @classmethod
+    def abandon_stale(cls, seconds: float) -> int:
+        """Marks as failed the running jobs with no progress for seconds, and returns how many
+
+        Their process was stopped in the middle of the upload (a killed or
+        recycled worker), so they will never finish.
+        """
+        message = f"Import abandoned: no progress for {seconds:g} seconds"
+        cutoff = db.func.now() - db.func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+        failure = db.func.jsonb_build_array(
+            db.func.jsonb_build_object("line", cls.lines, "item", None, "message", message)
+        )
+        result = db.session.execute(
+            db.update(cls)
+            .where(
+                cls.status == "running",
+                db.func.coalesce(cls.updated_at, cls.created_at) < cutoff,
+            )
+            .values(status="failed", errors=db.cast(db.cast(cls.errors, JSONB).op("||")(failure), db.JSON))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def run(self, stream, batch_size: int = 500, max_line_bytes: int = 1048576) -> None:
+        """Creates the Wishlists of the NDJSON lines read from a binary stream
+
+        The job must have been created so that its id can be polled. Every
+        batch_size lines are committed with the Wishlists they hold. A
+        failure rolls back the current batch only, marks the job as failed
+        with the error, and is raised again.
+        """
+        logger.info("Import job %s started", self.id)
+        pending = []
+        line_number = 0
+        try:
+            for line_number, line in read_lines(stream, max_line_bytes):
+                if line is None:
+                    self._reject(line_number, f"Invalid value: line must be shorter than or equal to {max_line_bytes} bytes")
+                elif line.strip():
+                    pending.extend(self._parse(line_number, line))
+                if line_number % batch_size == 0:
+                    self._commit(pending, line_number)
+                    pending = []
+            self._commit(pending, line_number, "completed")
+        except Exception as error:
+            db.session.rollback()
+            logger.exception("Import job %s failed after %s lines", self.id, self.lines)
+            self.status = "failed"
+            # always kept, even past MAX_JOB_ERRORS, since it is why the job stopped
+            self.errors = self.errors + [
+                {"line": line_number, "item": None, "message": f"Import failed: {type(error).__name__}: {error}"}
+            ]
+            db.session.commit()
+            raise
+        logger.info("Import job %s imported %s Wishlists from %s lines", self.id, self.imported, self.lines)
+
+    def _parse(self, line_number: int, line: bytes) -> list:
+        """Returns the rows of a line in a list, or nothing when the line is invalid"""
+        try:
+            return [rows_from_line(line)]
+        except DataValidationError as error:
+            self._reject(line_number, str(error), getattr(error, "item", None))
+            return []
+
+    def _reject(self, line_number: int, message: str, item: int = None) -> None:
+        """Counts an invalid line and describes the first MAX_JOB_ERRORS of them"""
+        self.invalid += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors = self.errors + [{"line": line_number, "item": item, "message": message}]
+
+    def _commit(self, rows: list, lines: int, status: str = "running") -> None:
+        """Inserts a batch of Wishlists and the progress of the job in one transaction"""
+        insert_wishlists(rows)
+        self.lines = lines
+        self.imported += len(rows)
+        self.status = status
+        db.session.commit()
+
+
+def insert_wishlists(rows: list) -> list:
+    """Inserts (wishlist, items) rows in the transaction of the session and returns the new ids
+
+    Each wishlist is a dict of Wishlists columns and its items are tuples of
+    ITEM_COLUMNS. The Wishlists are inserted with multi-row INSERTs that
+    return their ids and the items are copied, instead of flushing every
+    object, so item_count must be given with the other columns. The items
+    are stamped with the last_item_added_at of their Wishlist.
+    """
+    if not rows:
+        return []
+    # render_nulls keeps the NULL columns in the INSERT, or the rows would be
+    # grouped into a statement per set of non-NULL columns
+    ids = db.session.scalars(
+        insert(Wishlists).returning(Wishlists.id, sort_by_parameter_order=True),
+        [wishlist for wishlist, _ in rows],
+        execution_options={"render_nulls": True},
+    ).all()
+    columns = ", ".join(("wishlist_id",) + ITEM_COLUMNS + ("created_at",))
+    with db.session.connection().connection.driver_connection.cursor() as cursor:
+        with cursor.copy(f"COPY wishlist_items ({columns}) FROM STDIN") as copy:
+            for wishlist_id, (wishlist, items) in zip(ids, rows):
+                for item in items:
+                    copy.write_row((wishlist_id,) + item + (wishlist["last_item_added_at"],))
+    return ids
+
+
+def read_lines(stream, max_line_bytes: int):
+    """Yields (line number, line) for every line of a binary stream
+
+    At most max_line_bytes are read at a time, a longer line is skipped and
+    yielded as None.
+    """
+    line_number = 0
+    while line := stream.readline(max_line_bytes + 1):
+        line_number += 1
+        if len(line) > max_line_bytes and not line.endswith(b"\n"):
+            while (rest := stream.readline(max_line_bytes)) and not rest.endswith(b"\n"):
+                pass
+            line = None
+        yield line_number, line
+
+
+def rows_from_line(line: bytes) -> tuple:
+    """Returns the row of the new Wishlist described by an NDJSON line, and the rows of its items
+
+    The Wishlist and its items are checked by their deserialize() methods.
+    Items are numbered 1000, 2000, ... unless they have a position. Raises
+    DataValidationError with the messages of "flask wishlists-import".
+    """
+    if b"\\u0000" in line:
+        raise DataValidationError("Invalid value: \\u0000 is not supported")
+    try:
+        data = current_app.json.loads(line)
+    except ValueError as error:
+        raise DataValidationError("Invalid JSON") from error
+    if not isinstance(data, dict):
+        raise DataValidationError("Invalid type: line must be object")
+    items = data.get("wishlist_items", [])
+    if not isinstance(items, list):
+        raise DataValidationError("Invalid type: wishlist_items must be array")
+    wishlist = Wishlists().deserialize(data)
+    product_ids = set()
+    item_rows = []
+    for index, item_data in enumerate(items, start=1):
+        try:
+            item_rows.append(item_row(item_data, index, product_ids))
+        except DataValidationError as error:
+            error.item = index
+            raise
+    row = {column: getattr(wishlist, column) for column in WISHLIST_COLUMNS}
+    row["item_count"] = len(item_rows)
+    row["last_item_added_at"] = datetime.now(timezone.utc) if item_rows else None
+    return row, item_rows
+
+
+def item_row(data, index: int, product_ids: set) -> tuple:
+    """Returns the ITEM_COLUMNS of item number index of a new Wishlist, unless its product is in product_ids
+
+    The item is checked like WishlistItems.deserialize() does, without
+    building a mapped object that would never be flushed.
+    """
+    if not isinstance(data, dict):
+        raise DataValidationError("Invalid type: item must be object")
+    validate_wishlist_item(data)
+    if data["product_id"] in product_ids:
+        raise DataValidationError(f"Invalid value: duplicate product_id {data['product_id']}")
+    product_ids.add(data["product_id"])
+    return data["product_id"], data.get("description"), data.get("position", index * 1000)
@@ -21,6 +21,7 @@ Persistent Base class for database CRUD functions
 import logging
 from abc import abstractmethod
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm.exc import StaleDataError
 
 logger = logging.getLogger("flask.app")
 
@@ -28,7 +29,18 @@ db = SQLAlchemy()
 
 
 class DataValidationError(Exception):
-    """Used for an data validation errors when deserializing"""
+    """Used for an data validation errors when deserializing
+
+    errors optionally describes each invalid field for the 400 response.
+    """
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class VersionConflictError(Exception):
+    """Used when a record was changed by another request since it was read"""
 
 
 ######################################################################
@@ -58,6 +70,10 @@ class PersistentBase:
         try:
             db.session.add(self)
             db.session.commit()
+        except StaleDataError as e:
+            db.session.rollback()
+            logger.warning("Version conflict creating record: %s", self)
+            raise VersionConflictError(e) from e
         except Exception as e:
             db.session.rollback()
             logger.error("Error creating record: %s", self)
@@ -72,6 +88,10 @@ class PersistentBase:
             raise DataValidationError("Update called with empty ID field")
         try:
             db.session.commit()
+        except StaleDataError as e:
+            db.session.rollback()
+            logger.warning("Version conflict updating record: %s", self)
+            raise VersionConflictError(e) from e
         except Exception as e:
             db.session.rollback()
             logger.error("Error updating record: %s", self)
@@ -83,6 +103,10 @@ class PersistentBase:
         try:
             db.session.delete(self)
             db.session.commit()
+        except StaleDataError as e:
+            db.session.rollback()
+            logger.warning("Version conflict deleting record: %s", self)
+            raise VersionConflictError(e) from e
         except Exception as e:
             db.session.rollback()
             logger.error("Error deleting record: %s", self)
@@ -0,0 +1,213 @@
+######################################################################
+# Copyright 2025 Dingwen Wang. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Read-only records for Wishlists and WishlistItems
+
+The GET endpoints only turn what they read into dictionaries, so these
+finders run Core SELECTs and map each row into a small __slots__ object
+instead of hydrating ORM instances into the session identity map.
+Records serialize exactly like the models they mirror.
+
+The *_json finders go one step further and let Postgres build the JSON
+documents themselves with json_build_object and json_agg, so that they
+can be sent to the client as-is.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from .persistent_base import db
+from .wishlists import Wishlists
+from .wishlist_items import WishlistItems
+
+
+class WishlistItemRecord:
+    """A read-only row of wishlist_items"""
+
+    __slots__ = ("wishlist_id", "product_id", "description", "position")
+
+    COLUMNS = tuple(getattr(WishlistItems, name) for name in __slots__)
+
+    # Serializes exactly like the model
+    serialize = WishlistItems.serialize
+
+    def __init__(self, wishlist_id, product_id, description, position):
+        self.wishlist_id = wishlist_id
+        self.product_id = product_id
+        self.description = description
+        self.position = position
+
+    def __repr__(self):
+        return f"<WishlistItemRecord {self.product_id} in Wishlist {self.wishlist_id}>"
+
+    @classmethod
+    def find_all_by_wishlist_id(cls, wishlist_id: int) -> list:
+        """Find all the items of a Wishlist in position order"""
+        rows = db.session.execute(
+            select(*cls.COLUMNS)
+            .where(WishlistItems.wishlist_id == wishlist_id)
+            .order_by(WishlistItems.position)
+        )
+        return [cls(*row) for row in rows]
+
+
+def json_object(model, keys, **extra) -> db.ColumnElement:
+    """Builds a json_build_object of the columns of model named by keys (in order)
+
+    Any extra keyword arguments are added last as keys with SQL expressions.
+    """
+    pairs = []
+    for key, value in [(key, getattr(model, key)) for key in keys] + list(extra.items()):
+        if isinstance(getattr(value, "type", None), db.DateTime):
+            value = isoformat(value)
+        pairs += [db.cast(db.literal(key), db.Text), value]
+    return db.func.json_build_object(*pairs)
+
+
+def isoformat(column) -> db.ColumnElement:
+    """Formats a timestamp with time zone like datetime.isoformat()
+
+    Postgres drops the trailing zeros of the fractional seconds, whereas
+    Python writes all six digits, or none when the microseconds are zero.
+    """
+    fraction = db.case(
+        (db.func.extract("microseconds", column) % 1000000 == 0, ""),
+        else_=db.func.to_char(column, ".US"),
+    )
+    return (
+        db.func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS')
+        + fraction
+        + db.func.to_char(column, "TZH:TZM")
+    )
+
+
+def items_json(item_keys) -> db.ColumnElement:
+    """Builds the JSON array of the items of each Wishlist in position order"""
+    return (
+        select(
+            db.func.coalesce(
+                db.func.json_agg(
+                    aggregate_order_by(
+                        json_object(WishlistItems, item_keys), WishlistItems.position
+                    )
+                ),
+                db.func.json_build_array(),
+            )
+        )
+        .where(WishlistItems.wishlist_id == Wishlists.id)
+        .scalar_subquery()
+    )
+
+
+class WishlistRecord:
+    """A read-only row of wishlists, optionally with its items"""
+
+    __slots__ = Wishlists.FIELDS + ("wishlist_items",)
+
+    # Serializes exactly like the model, including sparse fieldsets
+    FIELDS = Wishlists.FIELDS
+    serialize = Wishlists.serialize
+
+    def __init__(self, fields, row):
+        for field, value in zip(fields, row):
+            setattr(self, field, value)
+        self.wishlist_items = []
+
+    def __repr__(self):
+        return f"<WishlistRecord id=[{getattr(self, 'id', None)}]>"
+
+    @classmethod
+    def find_all(cls, clauses=(), fields=None, expand_items: bool = False) -> list:
+        """Find all Wishlists matching the WHERE clauses (see Wishlists.filters)
+
+        Only the given fields are SELECTed, and with expand_items the items
+        of all the matching Wishlists are read in one extra query.
+        """
+        return cls._select(clauses, fields, expand_items)
+
+    @classmethod
+    def find(cls, wishlist_id: int, fields=None, expand_items: bool = False):
+        """Find a Wishlist by its ID (None if not found)"""
+        records = cls._select([Wishlists.id == wishlist_id], fields, expand_items)
+        return records[0] if records else None
+
+    @classmethod
+    def _select(cls, clauses, fields, expand_items: bool) -> list:
+        """Runs the SELECT for the given WHERE clauses and maps the rows to records"""
+        Wishlists.check_fields(fields)
+        fields = tuple(fields or Wishlists.FIELDS)
+        if expand_items and "id" not in fields:
+            fields += ("id",)
+        rows = db.session.execute(
+            select(*(getattr(Wishlists, field) for field in fields))
+            .where(*clauses)
+            .order_by(Wishlists.id)
+        )
+        records = [cls(fields, row) for row in rows]
+        if expand_items and records:
+            cls._load_items(records, clauses)
+        return records
+
+    @staticmethod
+    def _load_items(records: list, clauses) -> None:
+        """Reads the items of all the records with a single SELECT"""
+        by_id = {record.id: record for record in records}
+        matching = select(Wishlists.id).where(*clauses)
+        rows = db.session.execute(
+            select(*WishlistItemRecord.COLUMNS)
+            .where(WishlistItems.wishlist_id.in_(matching))
+            .order_by(WishlistItems.wishlist_id, WishlistItems.position)
+        )
+        for row in rows:
+            record = by_id.get(row.wishlist_id)
+            if record is not None:
+                record.wishlist_items.append(WishlistItemRecord(*row))
+
+    @classmethod
+    def find_json(cls, wishlist_id: int, keys) -> str:
+        """Find a Wishlist by its ID as a JSON object with the given keys (None if not found)"""
+        Wishlists.check_fields(keys)
+        return db.session.scalar(
+            select(db.cast(json_object(Wishlists, keys), db.Text)).where(
+                Wishlists.id == wishlist_id
+            )
+        )
+
+    @classmethod
+    def find_items_json(cls, wishlist_id: int, item_keys) -> str:
+        """Find the items of a Wishlist as a JSON array (None if the Wishlist is not found)"""
+        return db.session.scalar(
+            select(db.cast(items_json(item_keys), db.Text)).where(
+                Wishlists.id == wishlist_id
+            )
+        )
+
+    @classmethod
+    def stream_json(cls, clauses, keys, item_keys=None, batch_size: int = 500):
+        """Find the Wishlists matching the WHERE clauses as JSON objects
+
+        With item_keys the items are embedded as "wishlist_items". The result
+        reads a server-side cursor batch_size rows at a time, so it is never
+        held in memory as a whole; iterate over it or over its partitions().
+        """
+        Wishlists.check_fields(keys)
+        extra = {} if item_keys is None else {"wishlist_items": items_json(item_keys)}
+        document = json_object(Wishlists, keys, **extra)
+        return db.session.scalars(
+            select(db.cast(document, db.Text))
+            .where(*clauses)
+            .order_by(Wishlists.id)
+            .execution_options(yield_per=batch_size)
+        )
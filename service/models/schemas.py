@@ -0,0 +1,179 @@
+######################################################################
+# Copyright 2025 Dingwen Wang. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+JSON Schemas of the request bodies and query strings
+
+Every schema is compiled once, when this module is imported, into a
+plain Python validation function with fastjsonschema. Validation errors
+are raised as DataValidationError carrying a structured description of
+the offending field, which the error handlers return with the 400.
+"""
+from datetime import date
+import fastjsonschema
+from .persistent_base import DataValidationError
+
+WISHLIST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "customer_id": {"type": "integer"},
+        "name": {"type": "string", "minLength": 1, "maxLength": 63},
+        "description": {"type": ["string", "null"], "maxLength": 255},
+        "category": {"type": ["string", "null"], "maxLength": 63},
+        "created_date": {"type": "string", "format": "date"},
+    },
+    "required": ["customer_id", "name"],
+}
+
+WISHLIST_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "wishlist_id": {"type": ["integer", "null"]},
+        "product_id": {"type": "integer"},
+        "description": {"type": ["string", "null"], "maxLength": 255},
+        "position": {"type": "integer"},
+    },
+    "required": ["product_id"],
+}
+
+MOVE_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "before_position": {"type": ["integer", "null"]},
+        "position": {"type": ["integer", "null"]},
+    },
+}
+
+WISHLIST_QUERY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "customer_id": {"type": "integer", "description": "List Wishlists by customer_id"},
+        "name": {"type": "string", "description": "List Wishlists by name"},
+        "category": {"type": "string", "description": "List Wishlists by category"},
+        "fields": {
+            "type": "string",
+            "description": "Comma-separated Wishlist fields to return, e.g. id,name,category",
+        },
+        "expand": {
+            "type": "string",
+            "enum": ["items"],
+            "description": "Use expand=items to embed the Wishlist Items",
+        },
+    },
+}
+
+# Messages in the style of the errors raised by deserialize()
+RULE_MESSAGES = {"type": "Invalid type", "required": "Missing key"}
+
+
+def _is_date(value: str) -> bool:
+    """Returns True if value is a valid ISO 8601 date"""
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _types(prop: dict) -> list:
+    """Returns the JSON types a property allows, as a list"""
+    types = prop.get("type", [])
+    return types if isinstance(types, list) else [types]
+
+
+def float_error(data, integers: dict) -> DataValidationError:
+    """Returns the error of the first integer property given as a float, or None
+
+    JSON Schema counts 2.0 as an integer, but the models need an int.
+    """
+    if not isinstance(data, dict):
+        return None
+    for name, types in integers.items():
+        if isinstance(data.get(name), float):
+            message = f"{name} must be {' or '.join(types)}"
+            return DataValidationError(
+                f"Invalid type: {message}", errors=[{"field": name, "rule": "type", "message": message}]
+            )
+    return None
+
+
+def compile_schema(schema: dict):
+    """Compiles a JSON Schema into a function that validates and returns data
+
+    The function raises DataValidationError with an errors list such as
+    [{"field": "name", "rule": "type", "message": "name must be string"}].
+    Integer properties reject floats, even those with an integral value.
+    """
+    validate = fastjsonschema.compile(schema, formats={"date": _is_date})
+    integers = {
+        name: _types(prop) for name, prop in schema.get("properties", {}).items() if "integer" in _types(prop)
+    }
+
+    def validator(data):
+        try:
+            data = validate(data)
+        except fastjsonschema.JsonSchemaValueException as error:
+            raise validation_error(error, data) from error
+        error = float_error(data, integers)
+        if error:
+            raise error
+        return data
+
+    validator.schema = schema
+    return validator
+
+
+def validation_error(error, data) -> DataValidationError:
+    """Converts a fastjsonschema error into a structured DataValidationError"""
+    field = ".".join(str(part) for part in error.path[1:])
+    message = error.message.replace("data.", "", 1)
+    if error.rule == "required":
+        field = ", ".join(key for key in error.rule_definition if key not in data)
+        message = f"{field} is required"
+    detail = {"field": field or None, "rule": error.rule, "message": message}
+    summary = field if error.rule == "required" else message
+    prefix = RULE_MESSAGES.get(error.rule, "Invalid value")
+    return DataValidationError(f"{prefix}: {summary}", errors=[detail])
+
+
+def compile_query(schema: dict):
+    """Compiles a JSON Schema for query string arguments
+
+    The returned function takes the request args, converts the values of
+    integer properties and validates the result like compile_schema().
+    Arguments that are not in the schema are ignored.
+    """
+    validate = compile_schema(schema)
+    properties = schema["properties"]
+    integers = {name for name, prop in properties.items() if prop["type"] == "integer"}
+
+    def validator(args) -> dict:
+        data = {name: args[name] for name in properties if name in args}
+        for name in integers.intersection(data):
+            try:
+                data[name] = int(data[name])
+            except ValueError:
+                pass  # the schema reports it
+        return validate(data)
+
+    validator.schema = schema
+    return validator
+
+
+validate_wishlist = compile_schema(WISHLIST_SCHEMA)
+validate_wishlist_item = compile_schema(WISHLIST_ITEM_SCHEMA)
+validate_move_item = compile_schema(MOVE_ITEM_SCHEMA)
+validate_wishlist_query = compile_query(WISHLIST_QUERY_SCHEMA)
@@ -0,0 +1,185 @@
+######################################################################
+# Copyright 2025 Dingwen Wang. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Synthetic Wishlists shaped like production data
+
+DatasetGenerator draws Wishlists and their items from a seeded random
+generator, so the same options always give the same rows. The skew of
+production is reproduced with Zipf distributions: most Wishlists hold a
+few items and a few hold hundreds, a few customers own many Wishlists,
+and a few products are on many Wishlists. Names, descriptions and
+categories come from small vocabularies, weighted like the real ones.
+"""
+
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import accumulate, islice
+from sqlalchemy import text
+from .persistent_base import db
+from .import_jobs import insert_wishlists
+
+# Zipf exponents of how many Wishlists a customer owns and of how many
+# Wishlists a product is on (the most popular one is about 1% of the items)
+CUSTOMER_EXPONENT = 0.6
+PRODUCT_EXPONENT = 0.8
+
+# Category of a Wishlist, with how often it is used
+CATEGORIES = {
+    "gifts": 24,
+    "home": 14,
+    "electronics": 12,
+    "books": 10,
+    "fashion": 9,
+    "toys": 8,
+    "garden": 5,
+    "sports": 5,
+    "beauty": 4,
+    "baby": 3,
+    "grocery": 3,
+    "travel": 3,
+}
+
+# Wishlist names are an occasion or a theme of their category
+OCCASIONS = (
+    "Birthday", "Christmas", "Wedding", "Anniversary", "Housewarming", "Baby shower",
+    "Graduation", "Back to school", "Black Friday", "Mother's Day", "Father's Day", "Valentine's Day",
+)
+THEMES = {
+    "gifts": ("Gift ideas", "Presents for mom", "Presents for dad", "Secret Santa", "Stocking stuffers"),
+    "home": ("Kitchen upgrades", "Living room", "New apartment", "Bedroom refresh", "Home office"),
+    "electronics": ("Gadgets", "Gaming setup", "Camera gear", "Smart home", "Audio"),
+    "books": ("Books to read", "Reading list", "Sci-fi favorites", "Cookbooks", "Book club picks"),
+    "fashion": ("Winter wardrobe", "Shoes", "Summer outfits", "Accessories", "Work clothes"),
+    "toys": ("Toys for the kids", "Board games", "Lego sets", "Puzzles", "Outdoor toys"),
+    "garden": ("Garden tools", "Plants", "Patio", "Vegetable garden", "Bird feeders"),
+    "sports": ("Running gear", "Camping", "Gym equipment", "Cycling", "Ski trip"),
+    "beauty": ("Skincare", "Makeup", "Fragrances", "Hair care", "Spa day"),
+    "baby": ("Baby registry", "Nursery", "Baby clothes", "Stroller shopping", "First toys"),
+    "grocery": ("Pantry staples", "Coffee and tea", "Snacks", "Party supplies", "Weekly groceries"),
+    "travel": ("Travel essentials", "Luggage", "Beach vacation", "Road trip", "City break"),
+}
+DESCRIPTIONS = (
+    "Things I would love to get", "Ideas for later", "Shared with the family", "Waiting for a sale",
+    "Must haves", "Just browsing", "For the holidays", "Compare before buying",
+)
+# Item descriptions are "<adjective> <product>"
+ADJECTIVES = ("Classic", "Compact", "Deluxe", "Wireless", "Organic", "Vintage", "Ergonomic", "Waterproof", "Handmade")
+PRODUCTS = (
+    "coffee maker", "headphones", "backpack", "desk lamp", "water bottle", "novel", "sneakers",
+    "board game", "blender", "yoga mat", "scarf", "phone case", "candle", "teddy bear", "tent",
+)
+
+
+def zipf_weights(size: int, exponent: float) -> list:
+    """Cumulative weights of ranks 0..size-1 with a Zipf distribution, rank k weighing 1 / (k + 1) ** exponent"""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+def batched(iterable, size: int):
+    """Yields lists of size elements of iterable (the last one may be shorter)"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class DatasetGenerator:  # pylint: disable=too-many-instance-attributes
+    """Generates Wishlists for customers 1..customers and products 1..products
+
+    Every Wishlist holds 0 to max_items items, with a Zipf distribution of
+    the given exponent (a higher exponent gives more small Wishlists).
+    Dates are spread over the three years before until.
+    """
+
+    def __init__(self, seed: int = 42, customers: int = 1000, products: int = 100000, **options):
+        self.max_items = options.get("max_items", 200)
+        self.exponent = options.get("exponent", 1.2)
+        self.until = options.get("until", date(2025, 12, 31))
+        if customers < 1 or products < 1:
+            raise ValueError("There must be at least one customer and one product")
+        if self.max_items > products:
+            raise ValueError(f"max_items ({self.max_items}) cannot be more than the {products} products")
+        self.random = random.Random(seed)
+        # popular customers and products are spread over the ids
+        self.customer_ids = self.random.sample(range(1, customers + 1), customers)
+        self.customer_weights = zipf_weights(customers, CUSTOMER_EXPONENT)
+        self.product_ids = self.random.sample(range(1, products + 1), products)
+        self.product_weights = zipf_weights(products, PRODUCT_EXPONENT)
+        self.item_weights = zipf_weights(self.max_items + 1, self.exponent)
+        self.categories = list(CATEGORIES)
+        self.category_weights = list(accumulate(CATEGORIES.values()))
+
+    def wishlists(self, count: int):
+        """Yields count (wishlist, items) rows, in the format of insert_wishlists()"""
+        for _ in range(count):
+            yield self.wishlist()
+
+    def wishlist(self) -> tuple:
+        """Returns the row of one Wishlist and the rows of its items"""
+        draw = self.random
+        category = draw.choices(self.categories, cum_weights=self.category_weights)[0]
+        name = draw.choice(THEMES[category])
+        if draw.random() < 0.3:
+            name = f"{draw.choice(OCCASIONS)} {draw.randint(self.until.year - 2, self.until.year)}"
+        created = self.until - timedelta(days=draw.randrange(3 * 365))
+        updated = created + timedelta(days=draw.randrange((self.until - created).days + 1))
+        count = draw.choices(range(self.max_items + 1), cum_weights=self.item_weights)[0]
+        items = [
+            (product_id, f"{ADJECTIVES[product_id % len(ADJECTIVES)]} {PRODUCTS[product_id % len(PRODUCTS)]}",
+             position * 1000)
+            for position, product_id in enumerate(self.products(count), start=1)
+        ]
+        wishlist = {
+            "customer_id": draw.choices(self.customer_ids, cum_weights=self.customer_weights)[0],
+            "name": name,
+            "description": draw.choice(DESCRIPTIONS) if draw.random() < 0.6 else None,
+            "category": category if draw.random() < 0.9 else None,
+            "created_date": created,
+            "updated_date": updated if draw.random() < 0.5 else None,
+            "item_count": count,
+            "last_item_added_at": datetime.combine(updated, time(draw.randrange(24), draw.randrange(60)), timezone.utc)
+            if items else None,
+        }
+        return wishlist, items
+
+    def products(self, count: int) -> list:
+        """Draws count different products, the popular ones more often"""
+        chosen = {}
+        while len(chosen) < count:
+            picks = self.random.choices(self.product_ids, cum_weights=self.product_weights, k=count - len(chosen))
+            chosen.update(dict.fromkeys(picks))
+        return list(chosen)
+
+    def load(self, count: int, batch_size: int = 10000, progress=None) -> dict:
+        """Inserts count Wishlists, committing batch_size of them at a time
+
+        progress is called with the totals after every batch, which are
+        returned at the end.
+        """
+        totals = {"wishlists": 0, "items": 0}
+        for batch in batched(self.wishlists(count), batch_size):
+            insert_wishlists(batch)
+            db.session.commit()
+            totals["wishlists"] += len(batch)
+            totals["items"] += sum(len(items) for _, items in batch)
+            if progress:
+                progress(totals)
+        return totals
+
+
+def truncate_wishlists() -> None:
+    """Deletes every Wishlist and item, and restarts their ids from 1"""
+    db.session.execute(text("TRUNCATE wishlist_items, wishlists RESTART IDENTITY"))
+    db.session.commit()
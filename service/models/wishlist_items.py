@@ -20,6 +20,7 @@ Model class for WishlistItems
 
 import logging
 from .persistent_base import db, PersistentBase, DataValidationError
+from .schemas import validate_wishlist_item
 
 # from .wishlists import Wishlists
 
@@ -37,6 +38,8 @@ class WishlistItems(db.Model, PersistentBase):
     product_id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(255))
     position = db.Column(db.Integer, nullable=False)
+    # When the item was added, the source of Wishlists.last_item_added_at
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
 
     # wishlist = db.relationship('Wishlists', backref=db.backref('wishlist_items', lazy=True))
 
@@ -53,22 +56,17 @@ class WishlistItems(db.Model, PersistentBase):
         }
 
     def deserialize(self, data: dict) -> None:
-        """Convert a dictionary into a WishlistItem"""
-        # pylint: disable=duplicate-code
-        try:
-            if not isinstance(data["product_id"], int):
-                raise TypeError("product_id must be an integer")
-            self.wishlist_id = data.get("wishlist_id")
-            self.product_id = data["product_id"]
-            self.description = data.get("description")
-            if self.position is None:
-                self.position = data.get("position", 0)
-        except AttributeError as e:
-            raise DataValidationError(f"Invalid attribute: {e.args[0]}") from e
-        except KeyError as e:
-            raise DataValidationError(f"Missing key: {e.args[0]}") from e
-        except TypeError as e:
-            raise DataValidationError(f"Invalid type: {e}") from e
+        """Convert a dictionary into a WishlistItem
+
+        The data is checked against WISHLIST_ITEM_SCHEMA, which raises a
+        DataValidationError describing the first invalid field.
+        """
+        validate_wishlist_item(data)
+        self.wishlist_id = data.get("wishlist_id")
+        self.product_id = data["product_id"]
+        self.description = data.get("description")
+        if self.position is None:
+            self.position = data.get("position", 0)
         return self
 
     @classmethod
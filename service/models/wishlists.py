@@ -19,9 +19,13 @@ Model class for Wishlists
 """
 
 import logging
+from collections import Counter
 from datetime import date
+from sqlalchemy import event, select
+from sqlalchemy.orm.attributes import flag_modified
 from .persistent_base import db, PersistentBase, DataValidationError
 from .wishlist_items import WishlistItems
+from .schemas import validate_wishlist
 
 logger = logging.getLogger("flask.app")
 
@@ -38,6 +42,11 @@ class Wishlists(db.Model, PersistentBase):
     category = db.Column(db.String(63))
     created_date = db.Column(db.Date, nullable=False, default=date.today())
     updated_date = db.Column(db.Date, onupdate=date.today())
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # Summary of wishlist_items, maintained on every item write so that
+    # listing Wishlists does not need to load their items
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    last_item_added_at = db.Column(db.DateTime(timezone=True))
 
     wishlist_items = db.relationship(
         "WishlistItems",
@@ -48,85 +57,121 @@ class Wishlists(db.Model, PersistentBase):
         order_by="WishlistItems.position",
     )
 
+    # Every UPDATE or DELETE is issued with "WHERE version = <version read>"
+    # and raises StaleDataError if another request has written in between
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Wishlists {self.name} id=[{self.id}]>"
 
-    def serialize(self) -> dict:
-        """Convert a Wishlist into a dictionary"""
-        return {
-            "id": self.id,
-            "customer_id": self.customer_id,
-            "name": self.name,
-            "description": self.description,
-            "category": self.category,
-            "created_date": self.created_date.isoformat(),
-            "updated_date": (
-                self.updated_date.isoformat() if self.updated_date else None
-            ),
-            "wishlist_items": [item.serialize() for item in self.wishlist_items],
-        }
+    # Columns that can be requested in a sparse fieldset, in serialization order
+    FIELDS = (
+        "id",
+        "customer_id",
+        "name",
+        "description",
+        "category",
+        "created_date",
+        "updated_date",
+        "version",
+        "item_count",
+        "last_item_added_at",
+    )
+
+    def serialize(self, fields=None, expand_items: bool = True) -> dict:
+        """Convert a Wishlist into a dictionary
+
+        Only the given fields are included (all FIELDS by default), and the
+        wishlist_items are only loaded and embedded when expand_items is set.
+        """
+        data = {}
+        for field in fields or self.FIELDS:
+            value = getattr(self, field)
+            data[field] = value.isoformat() if isinstance(value, date) else value
+        if expand_items:
+            data["wishlist_items"] = [item.serialize() for item in self.wishlist_items]
+        return data
 
     def deserialize(self, data: dict) -> None:
-        """Convert a dictionary into a Wishlist"""
-        # pylint: disable=duplicate-code
-        try:
-            if not isinstance(data["customer_id"], int):
-                raise TypeError("customer_id must be an integer")
-            if not isinstance(data["name"], str):
-                raise TypeError("name must be a string")
-            self.customer_id = data["customer_id"]
-            self.name = data["name"]
-            self.description = data.get("description")
-            self.category = data.get("category")
-            if self.created_date is None:
-                self.created_date = (
-                    date.fromisoformat(data["created_date"])
-                    if "created_date" in data
-                    else date.today()
-                )
-            self.updated_date = date.today()
-        except AttributeError as e:
-            raise DataValidationError(f"Invalid attribute: {e.args[0]}") from e
-        except KeyError as e:
-            raise DataValidationError(f"Missing key: {e.args[0]}") from e
-        except TypeError as e:
-            raise DataValidationError(f"Invalid type: {e}") from e
+        """Convert a dictionary into a Wishlist
+
+        The data is checked against WISHLIST_SCHEMA, which raises a
+        DataValidationError describing the first invalid field.
+        """
+        validate_wishlist(data)
+        self.customer_id = data["customer_id"]
+        self.name = data["name"]
+        self.description = data.get("description")
+        self.category = data.get("category")
+        if self.created_date is None:
+            self.created_date = (
+                date.fromisoformat(data["created_date"])
+                if "created_date" in data
+                else date.today()
+            )
+        self.updated_date = date.today()
         return self
 
+    @classmethod
+    def check_fields(cls, fields) -> None:
+        """Raises DataValidationError if any of the fields is not in FIELDS"""
+        unknown = [field for field in fields or () if field not in cls.FIELDS]
+        if unknown:
+            raise DataValidationError(f"Unknown fields: {', '.join(unknown)}")
+
+    @classmethod
+    def filters(cls, customer_id: int = None, name: str = None, category: str = None) -> list:
+        """Returns the WHERE clauses used to search Wishlists
+
+        customer_id must match exactly, category matches case-insensitively and
+        name matches any Wishlist whose name contains it (case-insensitive).
+        """
+        clauses = []
+        if customer_id is not None:
+            clauses.append(cls.customer_id == customer_id)
+        if category is not None:
+            clauses.append(cls.category.ilike(category))
+        if name is not None:
+            clauses.append(cls.name.ilike(f"%{name}%"))
+        return clauses
+
     @classmethod
     def find_by_id(cls, wishlist_id: int):
         """Find a Wishlist by its ID"""
         return db.session.get(cls, wishlist_id)
 
+    @classmethod
+    def find_version(cls, wishlist_id: int):
+        """Find the current version of a Wishlist without loading it (None if not found)"""
+        return db.session.query(cls.version).filter(cls.id == wishlist_id).scalar()
+
     @classmethod
     def find_all_by_customer_id(cls, customer_id: int):
         """Find all Wishlists for a given customer ID"""
-        return cls.query.filter(cls.customer_id == customer_id).all()
+        return cls.query.filter(*cls.filters(customer_id=customer_id)).all()
 
     @classmethod
     def find_all_by_customer_id_and_name_like(cls, customer_id: int, name: str):
         """Find all Wishlists for a given customer where the name contains the given substring (case-insensitive)."""
-        pattern = f"%{name}%"
         return cls.query.filter(
-            cls.customer_id == customer_id, cls.name.ilike(pattern)
+            *cls.filters(customer_id=customer_id, name=name)
         ).all()
 
     @classmethod
     def find_by_category(cls, category: str):
         """Find all Wishlists by category only (case-insensitive, global)."""
-        return cls.query.filter(cls.category.ilike(category)).all()
+        return cls.query.filter(*cls.filters(category=category)).all()
 
     @classmethod
     def find_by_name_like(cls, name: str):
         """Find all Wishlists by name like."""
-        pattern = f"%{name}%"
-        return cls.query.filter(cls.name.ilike(pattern)).all()
+        return cls.query.filter(*cls.filters(name=name)).all()
 
     @classmethod
     def find_by_customer_and_category(cls, customer_id: int, category: str):
         """Find all Wishlists by customer_id AND category (case-insensitive)."""
         return cls.query.filter(
-            cls.customer_id == customer_id, cls.category.ilike(category)
+            *cls.filters(customer_id=customer_id, category=category)
         ).all()
 
     @classmethod
@@ -134,13 +179,48 @@ class Wishlists(db.Model, PersistentBase):
         cls, customer_id: int, category: str, name: str
     ):
         """Find all Wishlists by customer_id AND category AND name-like (case-insensitive)."""
-        pattern = f"%{name}%"
         return cls.query.filter(
-            cls.customer_id == customer_id,
-            cls.category.ilike(category),
-            cls.name.ilike(pattern),
+            *cls.filters(customer_id=customer_id, category=category, name=name)
         ).all()
 
+    @classmethod
+    def reconcile_item_counts(cls, first_id: int, last_id: int) -> int:
+        """Recount the items of the Wishlists with first_id <= id <= last_id
+
+        Repairs item_count wherever it has drifted from wishlist_items (e.g. after
+        a bulk load that bypassed the ORM), and last_item_added_at wherever an item
+        was added after it (the newest created_at of the items), and returns the
+        number of Wishlists fixed. Deleting the newest item leaves last_item_added_at
+        as it was, so an older one is not a drift. The caller is responsible for
+        committing.
+        """
+        actual = (
+            select(db.func.count())
+            .where(WishlistItems.wishlist_id == cls.id)
+            .scalar_subquery()
+        )
+        latest = (
+            select(db.func.max(WishlistItems.created_at))
+            .where(WishlistItems.wishlist_id == cls.id)
+            .scalar_subquery()
+        )
+        behind = db.and_(
+            latest.is_not(None),
+            db.or_(cls.last_item_added_at.is_(None), cls.last_item_added_at < latest),
+        )
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.id.between(first_id, last_id), db.or_(cls.item_count != actual, behind))
+            .values(
+                item_count=actual,
+                # greatest() ignores NULL, so this is latest wherever it is behind
+                last_item_added_at=db.func.greatest(cls.last_item_added_at, latest),
+                version=cls.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
     @classmethod
     def reposition(cls, wishlist_id: int):
         """Reposition items in a Wishlist to ensure positions are sequential starting from 1000, with increments of 1000"""
@@ -248,3 +328,58 @@ class Wishlists(db.Model, PersistentBase):
             db.session.rollback()
             raise e
         return item
+
+
+######################################################################
+#  I T E M   C H A N G E   T R A C K I N G
+######################################################################
+def _item_changes(session):
+    """Sums the pending item changes of a session by wishlist_id
+
+    Returns a Counter of the change in the number of items and the set of
+    wishlist ids that have items added. A modified item counts as a change of 0.
+    """
+    deltas = Counter()
+    added = set()
+    for obj in session.new:
+        if isinstance(obj, WishlistItems):
+            deltas[obj.wishlist_id] += 1
+            added.add(obj.wishlist_id)
+    for obj in session.deleted:
+        if isinstance(obj, WishlistItems):
+            deltas[obj.wishlist_id] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, WishlistItems) and session.is_modified(obj):
+            deltas[obj.wishlist_id] += 0
+    return deltas, added
+
+
+@event.listens_for(db.session, "before_flush")
+def track_item_changes(session, flush_context, instances):  # pylint: disable=unused-argument
+    """Keep the version and item summary of each Wishlist in step with its items
+
+    Changes to the Wishlist columns are versioned by the mapper itself, this
+    makes sure an item add, change or delete also issues a versioned UPDATE of
+    its Wishlist in the same transaction, incrementing the version and
+    adjusting item_count and last_item_added_at.
+    """
+    for obj in session.new:
+        if isinstance(obj, Wishlists):
+            obj.item_count = len(obj.wishlist_items)
+            if obj.wishlist_items:
+                obj.last_item_added_at = db.func.now()
+
+    deltas, added = _item_changes(session)
+    # items of new Wishlists have no wishlist_id yet, deleted Wishlists need no update
+    skipped = {None} | {obj.id for obj in session.deleted if isinstance(obj, Wishlists)}
+    with session.no_autoflush:
+        for wishlist_id, delta in deltas.items():
+            wishlist = None if wishlist_id in skipped else session.get(Wishlists, wishlist_id)
+            if wishlist is None or wishlist in session.new:
+                continue
+            wishlist.updated_date = date.today()
+            flag_modified(wishlist, "updated_date")
+            if delta:
+                wishlist.item_count = Wishlists.item_count + delta
+            if wishlist_id in added:
+                wishlist.last_item_added_at = db.func.now()
@@ -32,16 +32,41 @@ POST /api/wishlists/{id}/items - Adds a new item to a Wishlist
 PUT /api/wishlists/{id}/items/{product_id} - Updates an item
 DELETE /api/wishlists/{id}/items/{product_id} - Deletes an item
 PATCH /api/wishlists/{id}/items/{product_id} - Moves an item
+
+GET /api/wishlists/imports - Returns the last upload jobs
+GET /api/wishlists/imports/{job_id} - Returns the progress of an upload
+POST /api/wishlists/imports - Creates Wishlists from an NDJSON upload
 """
 
 # from datetime import date
+from functools import partial
 from flask import jsonify, request
 from flask import current_app as app  # Import Flask application
-from flask_restx import Api, Resource, fields, reqparse
-from service.models import Wishlists, WishlistItems
+from flask_restx import Api, Resource, fields
+from sqlalchemy.orm.exc import StaleDataError
+from service.models import ImportJobs, Wishlists, WishlistItems, WishlistRecord
 from service.common import status
-from service.common.error_handlers import bad_request
-from service.models.persistent_base import DataValidationError
+from service.common.error_handlers import bad_request, version_conflict_error
+from service.common.etags import check_if_match, conditional_get, etag_header
+from service.common.json_provider import output_json
+from service.common.message_pack import MSGPACK_MIMETYPES, output_msgpack
+from service.common.query_budget import query_budget
+from service.common.request_timing import timed
+from service.common.serializers import serializer, serialize_with
+from service.common.static_assets import send_asset, send_index
+from service.common.database_json import (
+    NDJSON,
+    database_json_enabled,
+    json_array_response,
+    json_from_database,
+    ndjson_response,
+)
+from service.models.persistent_base import DataValidationError, VersionConflictError
+from service.models.schemas import (
+    WISHLIST_QUERY_SCHEMA,
+    validate_move_item,
+    validate_wishlist_query,
+)
 
 # It should be based on the authenticated user
 # For now, a hardcoded value is used
@@ -61,6 +86,11 @@ api = Api(
     doc="/apidocs",  # default also could use doc='/apidocs/'
     prefix="/api",
 )
+# Encode responses with the JSON provider of the app, or as MessagePack
+# for clients that ask for it in their Accept header
+api.representation("application/json")(output_json)
+for mimetype in MSGPACK_MIMETYPES:
+    api.representation(mimetype)(output_msgpack)
 
 
 ######################################################################
@@ -72,13 +102,29 @@ def request_validation_error(error):
     return bad_request(error)
 
 
+@api.errorhandler(VersionConflictError)
+@api.errorhandler(StaleDataError)
+def request_version_conflict_error(error):
+    """Handles writes against a stale version of a Wishlist"""
+    return version_conflict_error(error)
+
+
 ######################################################################
 # GET INDEX
 ######################################################################
 @app.route("/")
 def index():
     """Base URL for our service"""
-    return app.send_static_file("index.html")
+    return send_index()
+
+
+######################################################################
+# GET STATIC ASSETS
+######################################################################
+@app.route("/assets/<path:filename>")
+def assets(filename):
+    """Content-hashed static assets, cached for a year"""
+    return send_asset(filename)
 
 
 ######################################################################
@@ -116,6 +162,16 @@ wishlist_model = api.inherit(
         "updated_date": fields.String(
             readOnly=True, description="Last updated date (ISO format)"
         ),
+        "version": fields.Integer(
+            readOnly=True,
+            description="Incremented on every change to the Wishlist or its items",
+        ),
+        "item_count": fields.Integer(
+            readOnly=True, description="Number of items in the Wishlist"
+        ),
+        "last_item_added_at": fields.String(
+            readOnly=True, description="When an item was last added (ISO format)"
+        ),
     },
 )
 
@@ -140,33 +196,55 @@ wishlist_item_model = api.inherit(
     },
 )
 
-# query string arguments
-wishlist_args = reqparse.RequestParser()
-
-wishlist_args.add_argument(
-    "customer_id",
-    type=int,
-    location="args",
-    required=False,
-    help="List Wishlists by customer_id",
+wishlist_expanded_model = api.inherit(
+    "WishlistExpandedModel",
+    wishlist_model,
+    {
+        "wishlist_items": fields.List(
+            fields.Nested(wishlist_item_model),
+            description="The items of the Wishlist (only with expand=items)",
+        ),
+    },
 )
 
-wishlist_args.add_argument(
-    "name",
-    type=str,
-    location="args",
-    required=False,
-    help="List Wishlists by name",
+import_error_model = api.model(
+    "ImportError",
+    {
+        "line": fields.Integer(description="The line of the upload, from 1"),
+        "item": fields.Integer(description="The item of the line, from 1, if the error is in an item"),
+        "message": fields.String(description="Why the line was skipped"),
+    },
 )
 
-wishlist_args.add_argument(
-    "category",
-    type=str,
-    location="args",
-    required=False,
-    help="List Wishlists by category",
+import_job_model = api.model(
+    "ImportJob",
+    {
+        "id": fields.Integer(readOnly=True, description="The id of the upload job"),
+        "status": fields.String(readOnly=True, description="running, completed or failed"),
+        "lines": fields.Integer(readOnly=True, description="Lines committed so far"),
+        "imported": fields.Integer(readOnly=True, description="Wishlists created so far"),
+        "invalid": fields.Integer(readOnly=True, description="Lines skipped so far"),
+        "errors": fields.List(
+            fields.Nested(import_error_model),
+            description="The first skipped lines and why they were skipped",
+        ),
+        "created_at": fields.String(readOnly=True, description="When the upload started (ISO format)"),
+        "updated_at": fields.String(readOnly=True, description="When the last batch was committed (ISO format)"),
+    },
 )
 
+# Compiled serializers of the list responses, by mask
+wishlist_serializers = serializer(wishlist_model, Wishlists)
+expanded_wishlist_serializers = serializer(wishlist_expanded_model, Wishlists)
+
+# Swagger documentation of the query string arguments
+wishlist_query_params = {
+    name: {"in": "query", **prop}
+    for name, prop in WISHLIST_QUERY_SCHEMA["properties"].items()
+}
+# The export always embeds the items
+export_query_params = {name: param for name, param in wishlist_query_params.items() if name != "expand"}
+
 
 ######################################################################
 #  PATH: /wishlists/{id}
@@ -187,8 +265,14 @@ class WishlistResource(Resource):
     # RETRIEVE A WISHLIST
     # ------------------------------------------------------------------
     @api.doc("get_wishlist")
+    @query_budget(3)
+    @api.response(304, "Wishlist not modified since the ETag in If-None-Match")
     @api.response(404, "Wishlist not found")
-    @api.marshal_with(wishlist_model)
+    @conditional_get
+    @json_from_database(
+        lambda wishlist_id: WishlistRecord.find_json(wishlist_id, list(wishlist_model.resolved))
+    )
+    @serialize_with(api, wishlist_model, Wishlists)
     def get(self, wishlist_id):
         """
         Retrieve a single Wishlist
@@ -196,7 +280,7 @@ class WishlistResource(Resource):
         This endpoint will return a Wishlist based on its id.
         """
         app.logger.info("Request for Wishlist with id: %s", wishlist_id)
-        wishlist = Wishlists.find(wishlist_id)
+        wishlist = WishlistRecord.find(wishlist_id)
         if not wishlist:
             app.logger.warning("Wishlist with id [%s] was not found.", wishlist_id)
             abort(
@@ -204,16 +288,18 @@ class WishlistResource(Resource):
                 f"Wishlist with id '{wishlist_id}' was not found.",
             )
 
-        return wishlist.serialize(), status.HTTP_200_OK
+        return wishlist, status.HTTP_200_OK
 
     # ------------------------------------------------------------------
     # Update AN EXISTING WISHLIST
     # ------------------------------------------------------------------
     @api.doc("update_wishlist")
+    @query_budget(3)
     @api.response(404, "Wishlist not found")
     @api.response(400, "The posted Wishlist data was not valid")
+    @api.response(412, "The Wishlist does not match the ETag in If-Match")
     @api.expect(wishlist_create_model)
-    @api.marshal_with(wishlist_model)
+    @serialize_with(api, wishlist_model, Wishlists)
     def put(self, wishlist_id):
         """
         Update a Wishlist
@@ -234,6 +320,7 @@ class WishlistResource(Resource):
                 status.HTTP_403_FORBIDDEN,
                 "You do not have permission to update this wishlist.",
             )
+        check_if_match(wishlist)
 
         data = api.payload
         if "id" in data and data["id"] != wishlist_id:
@@ -243,19 +330,18 @@ class WishlistResource(Resource):
             )
         data["customer_id"] = wishlist.customer_id
 
-        try:
-            wishlist.deserialize(data)
-            wishlist.update()
-        except DataValidationError as error:
-            abort(status.HTTP_400_BAD_REQUEST, str(error))
+        wishlist.deserialize(data)
+        wishlist.update()
 
-        return wishlist.serialize(), status.HTTP_200_OK
+        return wishlist, status.HTTP_200_OK, etag_header(wishlist)
 
     # ------------------------------------------------------------------
     # Delete A WISHLIST
     # ------------------------------------------------------------------
     @api.doc("delete_wishlist")
+    @query_budget(2)
     @api.response(204, "Wishlist deleted")
+    @api.response(412, "The Wishlist does not match the ETag in If-Match")
     def delete(self, wishlist_id):
         """
         Delete a Wishlist
@@ -267,6 +353,7 @@ class WishlistResource(Resource):
         # Retrieve the wishlist to delete and delete it if it exists
         wishlist = Wishlists.find(wishlist_id)
         if wishlist:
+            check_if_match(wishlist)
             app.logger.info("Deleting wishlist with id: %s", wishlist_id)
             wishlist.delete()
             app.logger.info("Wishlist with id: %s deleted", wishlist_id)
@@ -285,64 +372,38 @@ class WishlistCollection(Resource):
     # LIST ALL WISHLISTS
     # ------------------------------------------------------------------
     @api.doc("list_wishlists")
-    @api.expect(wishlist_args, validate=True)
-    @api.marshal_list_with(wishlist_model)
+    @query_budget(2)
+    @api.doc(params=wishlist_query_params)
+    @api.response(200, "Success", [wishlist_expanded_model])
+    @api.response(400, "Invalid query string or unknown field requested")
     def get(self):
         """Returns all of the Wishlists"""
         app.logger.info("Request to list all Wishlists")
 
         # Parse query parameters
-        args = wishlist_args.parse_args()
+        args = validate_wishlist_query(request.args)
         customer_id = args.get("customer_id")
         name_query = args.get("name")
         category_query = args.get("category")
+        field_names = parse_fields(args.get("fields"))
+        expand_items = args.get("expand") == "items"
 
-        if (
-            customer_id is not None
-            and category_query is not None
-            and name_query is not None
-        ):
-            app.logger.info(
-                "Filter by customer_id=%s, category=%s, name like=%s",
-                customer_id,
-                category_query,
-                name_query,
-            )
-            wishlists = Wishlists.find_by_customer_category_name_like(
-                customer_id, category_query, name_query
-            )
-
-        elif customer_id is not None and category_query is not None:
-            app.logger.info(
-                "Filter by customer_id=%s AND category=%s", customer_id, category_query
-            )
-            wishlists = Wishlists.find_by_customer_and_category(
-                customer_id, category_query
-            )
-
-        elif customer_id is not None and name_query is not None:
-            app.logger.info(
-                "Filter by customer_id=%s AND name like=%s", customer_id, name_query
-            )
-            wishlists = Wishlists.find_all_by_customer_id_and_name_like(
-                customer_id, name_query
-            )
-
-        elif customer_id is not None:
-            app.logger.info("Filter by customer_id=%s", customer_id)
-            wishlists = Wishlists.find_all_by_customer_id(customer_id)
-        elif name_query is not None:
-            wishlists = Wishlists.find_by_name_like(name_query)
-        elif category_query is not None:
-            app.logger.info(
-                "Filter by category=%s (global, no customer_id)", category_query
-            )
-            wishlists = Wishlists.find_by_category(category_query)
-        else:
-            app.logger.info("Returning all Wishlists")
-            wishlists = Wishlists.all()
-
-        results = [wishlist.serialize() for wishlist in wishlists]
+        app.logger.info(
+            "Filter by customer_id=%s, category=%s, name like=%s",
+            customer_id,
+            category_query,
+            name_query,
+        )
+        clauses = Wishlists.filters(customer_id, name_query, category_query)
+        if database_json_enabled():
+            return list_wishlists_json(clauses, field_names, expand_items)
+
+        # Only SELECT the requested columns and only read items when asked to
+        wishlists = WishlistRecord.find_all(clauses, field_names, expand_items)
+        serializers = expanded_wishlist_serializers if expand_items else wishlist_serializers
+        serialize = serializers(field_mask(field_names, expand_items))
+        with timed("serialize"):
+            results = [serialize(wishlist) for wishlist in wishlists]
         app.logger.info("Returning %d wishlists", len(results))
 
         return results, status.HTTP_200_OK
@@ -351,9 +412,10 @@ class WishlistCollection(Resource):
     # ADD A NEW WISHLIST
     # ------------------------------------------------------------------
     @api.doc("create_wishlist")
+    @query_budget(2)
     @api.response(400, "The posted data was not valid")
     @api.expect(wishlist_create_model)
-    @api.marshal_with(wishlist_model, code=201)
+    @serialize_with(api, wishlist_model, Wishlists, code=201)
     def post(self):
         """
         Creates a Wishlist
@@ -366,14 +428,111 @@ class WishlistCollection(Resource):
         # NOTE: Validate customer_id once authentication is implemented
         wishlist.create()
 
-        # Create a message to return
-        message = wishlist.serialize()
-
         location_url = api.url_for(
             WishlistResource, wishlist_id=wishlist.id, _external=True
         )
 
-        return message, status.HTTP_201_CREATED, {"Location": location_url}
+        return wishlist, status.HTTP_201_CREATED, {"Location": location_url}
+
+
+######################################################################
+#  PATH: /wishlists/export
+######################################################################
+@api.route("/wishlists/export")
+class WishlistExport(Resource):
+    """Exports Wishlists in bulk"""
+
+    # ------------------------------------------------------------------
+    # EXPORT ALL WISHLISTS
+    # ------------------------------------------------------------------
+    @api.doc("export_wishlists")
+    @api.doc(params=export_query_params)
+    @api.produces([NDJSON])
+    @api.response(200, "One Wishlist with its items per line", wishlist_expanded_model)
+    @api.response(400, "Invalid query string or unknown field requested")
+    def get(self):
+        """
+        Exports the Wishlists as newline-delimited JSON
+
+        Every Wishlist is written on its own line with its items embedded.
+        The rows are read from a server-side cursor and streamed as they
+        arrive, so exporting the whole table takes constant memory.
+        """
+        app.logger.info("Request to export Wishlists")
+        args = validate_wishlist_query(request.args)
+        clauses = Wishlists.filters(args.get("customer_id"), args.get("name"), args.get("category"))
+        keys, item_keys = wishlist_json_keys(parse_fields(args.get("fields")), expand_items=True)
+        return ndjson_response(partial(WishlistRecord.stream_json, clauses, keys, item_keys))
+
+
+######################################################################
+#  PATH: /wishlists/imports
+######################################################################
+@api.route("/wishlists/imports", strict_slashes=False)
+class ImportJobCollection(Resource):
+    """Uploads Wishlists in bulk"""
+
+    # ------------------------------------------------------------------
+    # LIST THE LAST UPLOADS
+    # ------------------------------------------------------------------
+    @api.doc("list_import_jobs")
+    @query_budget(2)
+    @api.marshal_list_with(import_job_model)
+    def get(self):
+        """Returns the last upload jobs, the newest first"""
+        app.logger.info("Request to list the upload jobs")
+        abandon_stale_jobs()
+        return [job.serialize() for job in ImportJobs.recent()], status.HTTP_200_OK
+
+    # ------------------------------------------------------------------
+    # UPLOAD WISHLISTS
+    # ------------------------------------------------------------------
+    @api.doc("import_wishlists")
+    @query_budget(None, repeat_limit=0)  # grows with the number of batches
+    @api.response(415, "The body is not NDJSON")
+    @api.marshal_with(import_job_model, code=201)
+    def post(self):
+        """
+        Creates Wishlists from newline-delimited JSON
+
+        Every line of the body is a Wishlist like the ones POSTed to
+        /wishlists, optionally with its wishlist_items. The body is parsed
+        line by line as it is received: invalid lines are skipped and
+        counted, and the Wishlists are committed in batches of
+        IMPORT_BATCH_SIZE lines along with the progress of the job, which
+        can be followed at the Location of the job while the upload goes on.
+        """
+        app.logger.info("Request to upload Wishlists")
+        if request.mimetype != NDJSON:
+            abort(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, f"Content-Type must be {NDJSON}")
+        job = ImportJobs()
+        job.create()
+        job.run(request.stream, app.config["IMPORT_BATCH_SIZE"], app.config["IMPORT_MAX_LINE_BYTES"])
+
+        location_url = api.url_for(ImportJobResource, job_id=job.id, _external=True)
+        return job.serialize(), status.HTTP_201_CREATED, {"Location": location_url}
+
+
+######################################################################
+#  PATH: /wishlists/imports/{job_id}
+######################################################################
+@api.route("/wishlists/imports/<int:job_id>")
+@api.param("job_id", "The upload job identifier")
+class ImportJobResource(Resource):
+    """Follows an upload of Wishlists"""
+
+    @api.doc("get_import_job")
+    @query_budget(2)
+    @api.response(404, "Upload job not found")
+    @api.marshal_with(import_job_model)
+    def get(self, job_id):
+        """Returns the progress of an upload job"""
+        app.logger.info("Request for upload job %s", job_id)
+        abandon_stale_jobs()
+        job = ImportJobs.find(job_id)
+        if not job:
+            abort(status.HTTP_404_NOT_FOUND, f"Upload job with id '{job_id}' was not found.")
+        return job.serialize(), status.HTTP_200_OK
 
 
 ######################################################################
@@ -397,8 +556,9 @@ class WishlistItemResource(Resource):
     # RETRIEVE A WISHLIST ITEM
     # ------------------------------------------------------------------
     @api.doc("get_wishlist_item")
+    @query_budget(2)
     @api.response(404, "Wishlist or Wishlist Item not found")
-    @api.marshal_with(wishlist_item_model)
+    @serialize_with(api, wishlist_item_model, WishlistItems)
     def get(self, wishlist_id, product_id):
         """
         Retrieve a single Wishlist Item
@@ -427,16 +587,18 @@ class WishlistItemResource(Resource):
                 f"Wishlist Item with id '{product_id}' not found in Wishlist with id '{wishlist_id}'",
             )
 
-        return wishlist_item.serialize(), status.HTTP_200_OK
+        return wishlist_item, status.HTTP_200_OK
 
     # ------------------------------------------------------------------
     # Update A WISHLIST ITEM
     # ------------------------------------------------------------------
     @api.doc("update_wishlist_item")
+    @query_budget(3)
     @api.response(404, "Wishlist or Wishlist Item not found")
     @api.response(400, "Invalid request body")
+    @api.response(412, "The Wishlist does not match the ETag in If-Match")
     @api.expect(wishlist_item_create_model)
-    @api.marshal_with(wishlist_item_model)
+    @serialize_with(api, wishlist_item_model, WishlistItems)
     def put(self, wishlist_id, product_id):
         """
         Update a Wishlist Item
@@ -454,6 +616,7 @@ class WishlistItemResource(Resource):
             abort(
                 status.HTTP_404_NOT_FOUND, f"Wishlist with id '{wishlist_id}' not found"
             )
+        check_if_match(wishlist)
 
         wishlist_item = WishlistItems.find_by_wishlist_and_product(
             wishlist_id, product_id
@@ -471,13 +634,15 @@ class WishlistItemResource(Resource):
         wishlist_item.product_id = product_id
         wishlist_item.update()
 
-        return wishlist_item.serialize(), status.HTTP_200_OK
+        return wishlist_item, status.HTTP_200_OK
 
     # ------------------------------------------------------------------
     # Delete A WISHLIST ITEM
     # ------------------------------------------------------------------
     @api.doc("delete_wishlist_item")
+    @query_budget(4)
     @api.response(204, "Wishlist Item deleted")
+    @api.response(412, "The Wishlist does not match the ETag in If-Match")
     def delete(self, wishlist_id, product_id):
         """
         Delete a Wishlist Item
@@ -495,6 +660,7 @@ class WishlistItemResource(Resource):
             abort(
                 status.HTTP_404_NOT_FOUND, f"Wishlist with id '{wishlist_id}' not found"
             )
+        check_if_match(wishlist)
 
         wishlist_item = WishlistItems.find_by_wishlist_and_product(
             wishlist_id, product_id
@@ -513,8 +679,10 @@ class WishlistItemResource(Resource):
     # MOVE A WISHLIST ITEM
     # ------------------------------------------------------------------
     @api.doc("move_wishlist_item")
+    @query_budget(5)
     @api.response(400, "Invalid request body")
     @api.response(404, "Wishlist or Wishlist Item not found")
+    @api.response(412, "The Wishlist does not match the ETag in If-Match")
     def patch(self, wishlist_id, product_id):
         """
         Move a Wishlist Item
@@ -533,6 +701,7 @@ class WishlistItemResource(Resource):
                 status.HTTP_400_BAD_REQUEST,
                 f"Wishlist with id '{wishlist_id}' not found",
             )
+        check_if_match(wishlist)
 
         wishlist_item = WishlistItems.find_by_wishlist_and_product(
             wishlist_id, product_id
@@ -543,11 +712,11 @@ class WishlistItemResource(Resource):
                 f"Wishlist Item with id '{product_id}' not found in Wishlist with id '{wishlist_id}'",
             )
 
-        data = request.get_json()
+        data = validate_move_item(request.get_json())
         before_position = data.get("before_position")
         if before_position is None:
             before_position = data.get("position")
-        if before_position is None or not isinstance(before_position, int):
+        if before_position is None:
             abort(
                 status.HTTP_400_BAD_REQUEST,
                 "before_position must be provided and must be an integer",
@@ -573,34 +742,41 @@ class WishlistItemCollection(Resource):
     # LIST ALL ITEMS IN A WISHLIST
     # ------------------------------------------------------------------
     @api.doc("list_wishlist_items")
+    @query_budget(3)
+    @api.response(304, "Wishlist Items not modified since the ETag in If-None-Match")
     @api.response(404, "Wishlist or Wishlist Item not found")
-    @api.marshal_list_with(wishlist_item_model)
+    @conditional_get
+    @json_from_database(
+        lambda wishlist_id: WishlistRecord.find_items_json(
+            wishlist_id, list(wishlist_item_model.resolved)
+        )
+    )
+    @serialize_with(api, wishlist_item_model, WishlistItems, as_list=True)
     def get(self, wishlist_id):
         """Returns all of the Wishlist Items"""
         app.logger.info(
             "Request to list all Wishlist Items for Wishlist with id: %s", wishlist_id
         )
 
-        wishlist = Wishlists.find(wishlist_id)
+        wishlist = WishlistRecord.find(wishlist_id, ["id"], expand_items=True)
         if not wishlist:
             abort(
                 status.HTTP_404_NOT_FOUND, f"Wishlist with id '{wishlist_id}' not found"
             )
 
-        items = wishlist.wishlist_items
-        results = [item.serialize() for item in items]
-
-        return results, status.HTTP_200_OK
+        return wishlist.wishlist_items, status.HTTP_200_OK
 
     # ------------------------------------------------------------------
     # ADD A NEW WISHLIST ITEM
     # ------------------------------------------------------------------
     @api.doc("create_wishlist_item")
+    @query_budget(6)
     @api.response(400, "Invalid request body")
     @api.response(404, "Wishlist or Wishlist Item not found")
     @api.response(409, "Product already exists in wishlist")
+    @api.response(412, "The Wishlist does not match the ETag in If-Match")
     @api.expect(wishlist_item_create_model)
-    @api.marshal_with(wishlist_item_model, code=201)
+    @serialize_with(api, wishlist_item_model, WishlistItems, code=201)
     def post(self, wishlist_id):
         """
         Create a Wishlist Item
@@ -617,13 +793,11 @@ class WishlistItemCollection(Resource):
             abort(
                 status.HTTP_404_NOT_FOUND, f"Wishlist with id '{wishlist_id}' not found"
             )
+        check_if_match(wishlist)
 
         data = request.get_json()
         wishlist_item = WishlistItems()
-        try:
-            wishlist_item.deserialize(data)
-        except DataValidationError as error:
-            abort(status.HTTP_400_BAD_REQUEST, str(error))
+        wishlist_item.deserialize(data)
 
         existing_items = WishlistItems.find_by_wishlist_and_product(
             wishlist_id, wishlist_item.product_id
@@ -639,10 +813,9 @@ class WishlistItemCollection(Resource):
         wishlist_item.position = last_position + 1000
         wishlist_item.create()
 
-        message = wishlist_item.serialize()
         location_url = f"/api/wishlists/{wishlist_id}/items/{wishlist_item.product_id}"
 
-        return message, status.HTTP_201_CREATED, {"location": location_url}
+        return wishlist_item, status.HTTP_201_CREATED, {"location": location_url}
 
 
 ######################################################################
@@ -650,6 +823,41 @@ class WishlistItemCollection(Resource):
 ######################################################################
 
 
+def parse_fields(fields_query):
+    """Splits a comma-separated fields query string into a list (None if not given)"""
+    if not fields_query:
+        return None
+    return [field.strip() for field in fields_query.split(",") if field.strip()] or None
+
+
+def field_mask(field_names, expand_items: bool):
+    """Builds the marshalling mask for a sparse fieldset (None for all fields)"""
+    if not field_names:
+        return None
+    if expand_items:
+        field_names = field_names + ["wishlist_items"]
+    return "{" + ",".join(field_names) + "}"
+
+
+def wishlist_json_keys(field_names=None, expand_items: bool = False):
+    """Returns the keys of the Wishlist and item documents, in the order of the models"""
+    Wishlists.check_fields(field_names)
+    keys = [key for key in wishlist_model.resolved if not field_names or key in field_names]
+    item_keys = list(wishlist_item_model.resolved) if expand_items else None
+    return keys, item_keys
+
+
+def list_wishlists_json(clauses, field_names, expand_items: bool):
+    """Streams the Wishlists as JSON built by the database"""
+    keys, item_keys = wishlist_json_keys(field_names, expand_items)
+    return json_array_response(partial(WishlistRecord.stream_json, clauses, keys, item_keys))
+
+
+def abandon_stale_jobs():
+    """Fails the upload jobs whose worker went away, so that they do not look running forever"""
+    ImportJobs.abandon_stale(app.config["IMPORT_STALE_SECONDS"])
+
+
 def abort(error_code: int, message: str):
     """Logs errors before aborting"""
     app.logger.error(message)
@@ -0,0 +1,104 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Cached Swagger Specification Test Suite
+"""
+
+# pylint: disable=duplicate-code
+import os
+import json
+import logging
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from flask_restx import Swagger
+from wsgi import app
+from service.common import status
+from service.common.api_spec import generate_spec, load_spec, write_spec
+from service.routes import api
+
+SPEC_URL = "/api/swagger.json"
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestApiSpec(TestCase):
+    """Swagger Specification Tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Run once before all tests"""
+        app.config["TESTING"] = True
+        app.logger.setLevel(logging.CRITICAL)
+        app.app_context().push()
+
+    def setUp(self):
+        """Runs before each test"""
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """This runs after each test"""
+        app.config["API_SPEC_FILE"] = None
+
+    def test_get_spec(self):
+        """It should serve the specification flask-restx generates"""
+        resp = self.client.get(SPEC_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.mimetype, "application/json")
+        self.assertEqual(resp.headers["Cache-Control"], "no-cache")
+        with app.test_request_context(SPEC_URL):
+            expected = json.loads(json.dumps(Swagger(api).as_dict()))
+        self.assertEqual(resp.get_json(), expected)
+
+    def test_get_spec_not_modified(self):
+        """It should answer 304 Not Modified when the ETag matches"""
+        etag = self.client.get(SPEC_URL).headers["ETag"]
+        resp = self.client.get(SPEC_URL, headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.data, b"")
+        resp = self.client.get(SPEC_URL, headers={"If-None-Match": '"stale"'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_get_docs(self):
+        """It should serve the documentation page with an ETag"""
+        resp = self.client.get("/apidocs")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.mimetype, "text/html")
+        self.assertIn(b"Wishlists REST API Service", resp.data)
+        resp = self.client.get("/apidocs", headers={"If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_and_load_spec(self):
+        """It should read the specification from API_SPEC_FILE"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "swagger.json")
+            app.config["API_SPEC_FILE"] = path
+            self.assertEqual(load_spec(api), generate_spec(api))  # not written yet
+            size = write_spec(api, path)
+            with open(path, "r+b") as file:
+                self.assertEqual(len(file.read()), size)
+                file.seek(0)
+                file.write(b" ")
+            self.assertEqual(load_spec(api)[:1], b" ")
+
+    def test_generate_spec_error(self):
+        """It should raise an error when the specification cannot be generated"""
+        with patch("flask_restx.api.Swagger.as_dict", side_effect=KeyError("boom")):
+            with patch.object(api, "_schema", None), patch.dict(api.__dict__):
+                del api.__dict__["__schema__"]  # cached by flask-restx
+                self.assertRaises(RuntimeError, generate_spec, api)
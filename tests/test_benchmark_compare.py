@@ -0,0 +1,125 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Benchmark Regression Check Test Suite
+"""
+
+import io
+import os
+import sys
+import json
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+from benchmarks.compare import case_key, compare, load_results, main
+
+BASELINE = [
+    {"name": "find", "size": 10, "median_seconds": 0.010, "runs": 5},
+    {"name": "find", "size": 100, "median_seconds": 0.100, "runs": 5},
+    {"name": "serialize", "size": 10, "median_seconds": 0.020, "runs": 5},
+    {"name": "gone", "size": 10, "median_seconds": 0.001, "runs": 5},
+]
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestBenchmarkCompare(TestCase):
+    """Benchmark Regression Check Tests"""
+
+    def setUp(self):
+        """Runs before each test"""
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        """This runs after each test"""
+        self.folder.cleanup()
+
+    def _write(self, name: str, report) -> str:
+        """Writes a JSON report and returns its path"""
+        path = os.path.join(self.folder.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file)
+        return path
+
+    def _main(self, current: list, *options) -> tuple:
+        """Runs the command line on BASELINE and current, and returns its exit status and output"""
+        output = io.StringIO()
+        code = 0
+        with redirect_stdout(output):
+            try:
+                main([self._write("baseline.json", {"results": BASELINE}), self._write("current.json", current), *options])
+            except SystemExit as error:
+                code = error.code
+        return code, output.getvalue()
+
+    def test_case_key(self):
+        """It should identify a result by the fields that are not measurements"""
+        result = {"name": "find", "size": 10, "seconds": 1.0, "peak_bytes": 5, "rows_per_second": 9, "statuses": {}}
+        self.assertEqual(case_key(result), (("name", "find"), ("size", 10)))
+        self.assertEqual(case_key({"size": 10, "name": "find", "median_seconds": 2}), case_key(result))
+
+    def test_compare(self):
+        """It should flag the regressions and improvements beyond the threshold, and the new cases"""
+        current = [
+            {"name": "find", "size": 10, "median_seconds": 0.013, "runs": 5},
+            {"name": "find", "size": 100, "median_seconds": 0.080, "runs": 5},
+            {"name": "serialize", "size": 10, "median_seconds": 0.021, "runs": 5},
+            {"name": "serialize", "size": 100, "seconds": 0.2},
+        ]
+        comparisons = compare(BASELINE, current, 0.2)
+        self.assertEqual([comparison["status"] for comparison in comparisons], ["regression", "improvement", "ok", "new"])
+        self.assertAlmostEqual(comparisons[0]["ratio"], 1.3)
+        self.assertEqual(comparisons[0]["baseline_seconds"], 0.010)
+        self.assertEqual(comparisons[0]["case"], "name=find, size=10")
+        self.assertNotIn("ratio", comparisons[3])
+        comparisons = compare([{"name": "x", "seconds": 0}], [{"name": "x", "seconds": 0.1}], 0.2)
+        self.assertEqual(comparisons[0]["ratio"], float("inf"))
+
+    def test_regression_fails(self):
+        """It should exit with status 1 when a case got slower"""
+        code, output = self._main([{"name": "find", "size": 10, "median_seconds": 0.02}])
+        self.assertEqual(code, 1)
+        self.assertIn("1 regression(s) over 20%", output)
+
+    def test_improvement_passes(self):
+        """It should pass when the cases are faster or within the threshold"""
+        code, output = self._main(
+            [{"name": "find", "size": 10, "median_seconds": 0.005}, {"name": "find", "size": 100, "median_seconds": 0.11}],
+            "--json",
+        )
+        self.assertEqual(code, 0)
+        self.assertEqual([comparison["status"] for comparison in json.loads(output)], ["improvement", "ok"])
+
+    def test_missing_cases(self):
+        """It should report the cases of the baseline that were not run, without failing"""
+        code, output = self._main([{"name": "find", "size": 10, "median_seconds": 0.01}])
+        self.assertEqual(code, 0)
+        self.assertIn("3 case(s) of the baseline were not run", output)
+        self.assertEqual(load_results(self._write("bare.json", BASELINE)), BASELINE)
+
+    def test_without_database(self):
+        """It should compare reports without creating the app or reaching a database"""
+        baseline = self._write("baseline.json", BASELINE)
+        env = dict(os.environ, DATABASE_URI="postgresql+psycopg://nobody@127.0.0.1:1/none")
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.compare", baseline, baseline],
+            env=env, capture_output=True, text=True, check=False,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("0 regression(s)", result.stdout)
@@ -0,0 +1,111 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Load Test Reporting Test Suite
+"""
+
+from collections import Counter
+from unittest import TestCase
+from benchmarks.load import Traffic, arrivals, parse_mix, percentile, report, summarize
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestBenchmarkLoad(TestCase):
+    """Load Test Mix, Percentile and Report Tests"""
+
+    def test_percentile(self):
+        """It should return the nearest-rank percentiles, from the smallest to the largest value"""
+        values = [0.1, 0.2, 0.3, 0.4]
+        self.assertEqual(percentile(values, 0), 0.1)
+        self.assertEqual(percentile(values, 50), 0.2)
+        self.assertEqual(percentile(values, 51), 0.3)
+        self.assertEqual(percentile(values, 99), 0.4)
+        self.assertEqual(percentile(values, 100), 0.4)
+        for percent in (0, 50, 100):
+            self.assertEqual(percentile([0.7], percent), 0.7)
+
+    def test_parse_mix(self):
+        """It should read the weights of the routes"""
+        self.assertEqual(parse_mix("read=70, add=30"), {"read": 70.0, "add": 30.0})
+        self.assertEqual(parse_mix("read=1,search=0"), {"read": 1.0, "search": 0.0})
+
+    def test_parse_bad_mix(self):
+        """It should reject unknown routes, bad weights and mixes that weigh nothing"""
+        for text, message in (
+            ("read=70,delete=30", "Unknown route 'delete'"),
+            ("read", "Invalid weight '' for route 'read'"),
+            ("read=lots", "Invalid weight 'lots'"),
+            ("", "Unknown route ''"),
+            ("read=0,add=0", "must add up to more than 0"),
+        ):
+            with self.assertRaises(ValueError) as raised:
+                parse_mix(text)
+            self.assertIn(message, str(raised.exception))
+
+    def test_summarize(self):
+        """It should summarize the latencies, throughput and errors of a route"""
+        result = summarize("read", [0.3, 0.1, 0.2], Counter({200: 2, 500: 1}), 1, 2.0)
+        self.assertEqual(result["request_count"], 3)
+        self.assertEqual(result["error_count"], 1)
+        self.assertAlmostEqual(result["error_ratio"], 1 / 3)
+        self.assertEqual(result["throughput_per_second"], 1.5)
+        self.assertEqual(result["statuses"], {"200": 2, "500": 1})
+        self.assertEqual((result["p50_seconds"], result["p99_seconds"], result["max_seconds"]), (0.2, 0.3, 0.3))
+        self.assertEqual(result["median_seconds"], 0.2)
+
+        result = summarize("move", [], Counter(), 0, 2.0)
+        self.assertEqual((result["request_count"], result["error_ratio"], result["p90_seconds"], result["max_seconds"]),
+                         (0, 0, 0, 0))
+
+    def test_report_errors(self):
+        """It should count the unexpected statuses and the requests without a response as errors of their route"""
+        records = [
+            ("read", 200, 0.01),
+            ("read", 404, 0.02),
+            ("add", 201, 0.03),
+            ("add", 0, 30.0),  # no response
+            ("move", 204, 0.04),
+        ]
+        results = {result["route"]: result for result in report(records, ["read", "add", "move", "search"], 1.0)}
+        self.assertEqual(list(results), ["read", "add", "move", "search", "total"])
+        self.assertEqual((results["read"]["error_count"], results["read"]["statuses"]), (1, {"200": 1, "404": 1}))
+        self.assertEqual((results["add"]["error_count"], results["add"]["statuses"]), (1, {"0": 1, "201": 1}))
+        self.assertEqual(results["add"]["max_seconds"], 30.0)
+        self.assertEqual(results["move"]["error_ratio"], 0)
+        self.assertEqual(results["search"]["request_count"], 0)
+        self.assertEqual(results["total"]["error_count"], 2)
+        self.assertEqual(results["total"]["error_ratio"], 0.4)
+        self.assertEqual(results["total"]["throughput_per_second"], 5)
+
+    def test_arrivals(self):
+        """It should schedule the requests within the duration, evenly or at random"""
+        self.assertEqual(list(arrivals(4, 1, uniform=True)), [0.25, 0.5, 0.75])
+        times = list(arrivals(1000, 1, uniform=False))
+        self.assertEqual(times, sorted(times))
+        self.assertLess(times[-1], 1)
+        self.assertLess(abs(len(times) - 1000), 150)
+        self.assertEqual(times, list(arrivals(1000, 1, uniform=False)))
+
+    def test_traffic(self):
+        """It should draw the requests of the mix, adding products that are not on a Wishlist yet"""
+        traffic = Traffic({"add": 1, "search": 0}, [7], items_per_wishlist=5)
+        requests = [traffic.request() for _ in range(3)]
+        self.assertEqual([route for route, *_ in requests], ["add"] * 3)
+        self.assertEqual({(method, path) for _, method, path, _ in requests}, {("POST", "/api/wishlists/7/items")})
+        self.assertEqual([body["product_id"] for *_, body in requests], [5, 6, 7])
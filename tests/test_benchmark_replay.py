@@ -0,0 +1,194 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Replay Scheduling and Report Test Suite
+"""
+
+import io
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from unittest import TestCase
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+from benchmarks.load import Client
+from benchmarks.replay import load_capture, main, replayed_seconds, report, request_body, route_of, schedule
+from service.common.request_capture import RequestCapture, capture_logger
+
+
+def make_record(offset: float, method: str = "GET", path: str = "/api/wishlists/1", **fields) -> dict:
+    """Returns a captured request received offset seconds after noon"""
+    return {
+        "time": f"2025-01-31T12:00:{offset:09.6f}+00:00",
+        "method": method,
+        "path": path,
+        "query": "",
+        "content_type": "",
+        "body_bytes": 0,
+        "status": 200,
+        "seconds": 0.010,
+        **fields,
+    }
+
+
+def slow_app(environ, start_response):
+    """A WSGI app that takes 20 ms to start its response, then 20 ms to send its body"""
+    time.sleep(0.02)
+    start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "4")])
+
+    def body():
+        time.sleep(0.02)
+        yield environ["PATH_INFO"][-4:].encode()
+
+    return body()
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Does not log the requests"""
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestBenchmarkReplay(TestCase):
+    """Replay Scheduling and Report Tests"""
+
+    def test_load_capture(self):
+        """It should read the capture files, rotated ones included, in the order the requests came"""
+        with tempfile.TemporaryDirectory() as folder:
+            for name, offsets in (("capture.ndjson", (2, 0)), ("capture.ndjson.1", (1,))):
+                with open(os.path.join(folder, name), "w", encoding="utf-8") as file:
+                    file.write("".join(json.dumps(make_record(offset)) + "\n\n" for offset in offsets))
+            records = load_capture([os.path.join(folder, name) for name in ("capture.ndjson", "capture.ndjson.1")])
+        self.assertEqual([record["time"][17:19] for record in records], ["00", "01", "02"])
+
+    def test_request_body(self):
+        """It should return the captured body, or None when only its hash was kept"""
+        self.assertEqual(request_body({"body": '{"a": 1}', "body_bytes": 8}), b'{"a": 1}')
+        self.assertEqual(request_body({"body_base64": "AAE=", "body_bytes": 2}), b"\x00\x01")
+        self.assertEqual(request_body({"body_bytes": 0}), b"")
+        self.assertIsNone(request_body({"body_sha256": "0" * 64, "body_bytes": 8}))
+
+    def test_schedule(self):
+        """It should send the requests at their original offsets divided by the speed"""
+        records = [
+            make_record(10),
+            make_record(11, "POST", "/api/wishlists/1/items", body='{"product_id": 2}', body_bytes=17,
+                        content_type="application/msgpack"),
+            make_record(14, query="customer_id=5"),
+        ]
+        requests = list(schedule(records, 2, "run"))
+        self.assertEqual([request[0] for request in requests], [0, 0.5, 2])
+        self.assertEqual(requests[1][1], ("run-1", records[1]))
+        self.assertIs(requests[1][1][1], records[1])
+        self.assertEqual(
+            requests[0][2:],
+            ("GET", "/api/wishlists/1", None, {"Content-Type": "application/json", "X-Request-ID": "run-0"}),
+        )
+        self.assertEqual(requests[1][2:5], ("POST", "/api/wishlists/1/items", b'{"product_id": 2}'))
+        self.assertEqual(requests[1][5]["Content-Type"], "application/msgpack")
+        self.assertEqual(requests[2][3], "/api/wishlists/1?customer_id=5")
+
+    def test_route_of(self):
+        """It should group the requests by method and path without their ids"""
+        self.assertEqual(route_of(make_record(0, "PUT", "/api/wishlists/12/items/345")),
+                         "PUT /api/wishlists/{id}/items/{id}")
+        self.assertEqual(route_of(make_record(0, path="/api/wishlists")), "GET /api/wishlists")
+
+    def test_replayed_seconds(self):
+        """It should return the captured seconds of the requests of a run, waiting for the missing ones"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "replay.ndjson")
+            with open(path, "w", encoding="utf-8") as file:
+                for offset, request_id in ((0, "run-0"), (1, None), (2, "other-0"), (3, "run-1")):
+                    fields = {"request_id": request_id} if request_id else {}
+                    file.write(json.dumps(make_record(offset, seconds=offset / 10, **fields)) + "\n")
+            self.assertEqual(replayed_seconds([path], "run", 2), {"run-0": 0, "run-1": 0.3})
+            start = time.monotonic()
+            self.assertEqual(len(replayed_seconds([path], "run", 3, timeout=0.2)), 2)
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_report(self):
+        """It should compare the recorded server times with the replayed ones, per route and in total"""
+        one, two = make_record(0), make_record(1, path="/api/wishlists/2")
+        items = make_record(2, "POST", "/api/wishlists/1/items", status=201, seconds=0.040)
+        results = [
+            (("run-0", one), 200, 9.0, {}),  # the client latency is not compared
+            (("run-1", two), 404, 9.0, {}),
+            (("run-2", items), 201, 9.0, {}),
+            (("run-3", items), 0, 30.0, {}),  # no response
+        ]
+        replayed = {"run-0": 0.020, "run-1": 0.005, "run-2": 0.010}
+        comparisons = {result["route"]: result for result in report(results, replayed)}
+        self.assertEqual(list(comparisons), ["GET /api/wishlists/{id}", "POST /api/wishlists/{id}/items", "total"])
+
+        read = comparisons["GET /api/wishlists/{id}"]
+        self.assertEqual((read["request_count"], read["status_mismatch_count"]), (2, 1))
+        self.assertEqual((read["recorded_p50_seconds"], read["p50_seconds"], read["p99_seconds"]), (0.010, 0.005, 0.020))
+        self.assertAlmostEqual(read["p99_ratio"], 2)
+        self.assertEqual(read["median_seconds"], read["p50_seconds"])
+
+        add = comparisons["POST /api/wishlists/{id}/items"]
+        self.assertEqual((add["request_count"], add["status_mismatch_count"]), (2, 1))
+        self.assertEqual((add["recorded_p99_seconds"], add["p99_seconds"]), (0.040, 0.010))
+        self.assertAlmostEqual(add["p50_ratio"], 0.25)
+
+        total = comparisons["total"]
+        self.assertEqual((total["request_count"], total["status_mismatch_count"]), (4, 2))
+        self.assertEqual(total["p99_seconds"], 0.020)
+
+    def test_report_without_responses(self):
+        """It should report a route whose requests all went unanswered, and nothing at all"""
+        (route, total) = report([(("run-0", make_record(0)), 0, 30.0, {})], {})
+        self.assertEqual((route["request_count"], route["status_mismatch_count"], route["p50_seconds"]), (1, 1, 0))
+        self.assertEqual(total["request_count"], 1)
+        self.assertEqual(report([], {})[0]["request_count"], 0)
+        zero = report([(("run-0", make_record(0, seconds=0)), 200, 0.1, {})], {"run-0": 0.001})[0]
+        self.assertEqual(zero["p50_ratio"], float("inf"))
+
+    def test_unchanged_server(self):
+        """It should find an unchanged server as fast as when it was captured, body included"""
+        with tempfile.TemporaryDirectory() as folder:
+            paths = [os.path.join(folder, name) for name in ("capture.ndjson", "replay.ndjson")]
+            servers = []
+            for path in paths:
+                server = make_server("127.0.0.1", 0, RequestCapture(slow_app, capture_logger(path, 10485760, 1)),
+                                     handler_class=QuietHandler)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                servers.append(server)
+            try:
+                client = Client(f"http://127.0.0.1:{servers[0].server_port}")
+                for number in range(10):
+                    client.send("GET", f"/api/wishlists/{1000 + number}")
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    main([paths[0], "--speed", "10", "--json", "--url", f"http://127.0.0.1:{servers[1].server_port}",
+                          "--replayed", paths[1]])
+            finally:
+                for server in servers:
+                    server.shutdown()
+                    server.server_close()
+        (route, total) = json.loads(output.getvalue())["results"]
+        self.assertEqual((route["route"], route["request_count"], route["status_mismatch_count"]),
+                         ("GET /api/wishlists/{id}", 10, 0))
+        self.assertGreaterEqual(total["recorded_p50_seconds"], 0.04)
+        self.assertAlmostEqual(total["p50_ratio"], 1, delta=0.2)
@@ -20,13 +20,27 @@ CLI Command Extensions for Flask
 
 # pylint: disable=duplicate-code
 import os
+import json
+import logging
+import tempfile
+from datetime import datetime, timezone
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 from click.testing import CliRunner
 
 # pylint: disable=unused-import
 from wsgi import app  # noqa: F401
-from service.common.cli_commands import db_create  # noqa: E402
+from service.common.cli_commands import (  # noqa: E402
+    api_spec,
+    db_create,
+    wishlists_export,
+    wishlists_extract,
+    wishlists_generate,
+    wishlists_import,
+    wishlists_reconcile,
+)
+from service.models import db, Wishlists, WishlistItems
+from tests.factories import WishlistsFactory, WishlistItemsFactory
 
 
 class TestFlaskCLI(TestCase):
@@ -42,3 +56,291 @@ class TestFlaskCLI(TestCase):
         with patch.dict(os.environ, {"FLASK_APP": "wsgi:app"}, clear=True):
             result = self.runner.invoke(db_create)
             self.assertEqual(result.exit_code, 0)
+
+    def test_api_spec(self):
+        """It should write the Swagger specification to a file"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "swagger.json")
+            with app.app_context():
+                result = self.runner.invoke(api_spec, [path])
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn(f"Wrote the Swagger specification to {path}", result.output)
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), app.test_client().get("/api/swagger.json").data)
+
+
+class TestReconcileCommand(TestCase):
+    """wishlists-reconcile Command Tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config["TESTING"] = True
+        app.logger.setLevel(logging.CRITICAL)
+        app.app_context().push()
+
+    @classmethod
+    def tearDownClass(cls):
+        """This runs once after the entire test suite"""
+        db.session.close()
+
+    def setUp(self):
+        self.runner = CliRunner()
+        db.session.rollback()
+        db.session.query(WishlistItems).delete()
+        db.session.query(Wishlists).delete()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+
+    def test_wishlists_reconcile(self):
+        """It should repair item counts that have drifted"""
+        wishlists = []
+        for count in (3, 0, 2):
+            wishlist = WishlistsFactory()
+            wishlist.create()
+            for _ in range(count):
+                WishlistItemsFactory(wishlist_id=wishlist.id).create()
+            wishlists.append(wishlist)
+        # a bulk write that bypasses the ORM leaves the counts stale
+        db.session.query(WishlistItems).filter(
+            WishlistItems.wishlist_id == wishlists[0].id
+        ).delete()
+        db.session.query(Wishlists).filter(Wishlists.id == wishlists[1].id).update(
+            {"item_count": 5}
+        )
+        db.session.commit()
+
+        with patch.dict(os.environ, {"FLASK_APP": "wsgi:app"}, clear=True):
+            result = self.runner.invoke(wishlists_reconcile, ["--batch-size", "2"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Repaired 2 wishlists", result.output)
+        self.assertEqual(
+            [Wishlists.find(wishlist.id).item_count for wishlist in wishlists],
+            [0, 0, 2],
+        )
+
+    def test_wishlists_reconcile_last_item_added_at(self):
+        """It should repair last_item_added_at where an item was added after it"""
+        wishlists = []
+        for count in (2, 1, 0):
+            wishlist = WishlistsFactory()
+            wishlist.create()
+            for _ in range(count):
+                WishlistItemsFactory(wishlist_id=wishlist.id).create()
+            wishlists.append(wishlist)
+        newest = db.session.query(db.func.max(WishlistItems.created_at)).filter(
+            WishlistItems.wishlist_id == wishlists[0].id
+        ).scalar()
+        # a bulk write that bypasses the ORM leaves the times stale
+        db.session.query(Wishlists).filter(Wishlists.id == wishlists[0].id).update(
+            {"last_item_added_at": None}
+        )
+        db.session.query(Wishlists).filter(Wishlists.id == wishlists[1].id).update(
+            {"last_item_added_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+        )
+        db.session.commit()
+        kept = Wishlists.find(wishlists[1].id)
+        later = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        db.session.query(WishlistItems).filter(WishlistItems.wishlist_id == kept.id).update({"created_at": later})
+        db.session.commit()
+
+        with patch.dict(os.environ, {"FLASK_APP": "wsgi:app"}, clear=True):
+            result = self.runner.invoke(wishlists_reconcile)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Repaired 2 wishlists", result.output)
+        self.assertEqual(
+            [Wishlists.find(wishlist.id).last_item_added_at for wishlist in wishlists],
+            [newest, later, None],
+        )
+        # items older than last_item_added_at (the newest was deleted) are not a drift
+        db.session.query(WishlistItems).filter(WishlistItems.wishlist_id == kept.id).update(
+            {"created_at": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+        )
+        db.session.commit()
+        with patch.dict(os.environ, {"FLASK_APP": "wsgi:app"}, clear=True):
+            result = self.runner.invoke(wishlists_reconcile)
+        self.assertIn("Repaired 0 wishlists", result.output)
+        self.assertEqual(Wishlists.find(kept.id).last_item_added_at, later)
+
+    def test_wishlists_reconcile_empty(self):
+        """It should do nothing when there are no wishlists"""
+        with patch.dict(os.environ, {"FLASK_APP": "wsgi:app"}, clear=True):
+            result = self.runner.invoke(wishlists_reconcile)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("No wishlists to reconcile", result.output)
+
+
+class TestExportCommand(TestCase):
+    """wishlists-export Command Tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config["TESTING"] = True
+        app.logger.setLevel(logging.CRITICAL)
+        app.app_context().push()
+
+    @classmethod
+    def tearDownClass(cls):
+        """This runs once after the entire test suite"""
+        db.session.close()
+
+    def setUp(self):
+        self.runner = CliRunner()
+        db.session.rollback()
+        db.session.query(WishlistItems).delete()
+        db.session.query(Wishlists).delete()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+
+    def test_wishlists_export(self):
+        """It should write one Wishlist with its items per line"""
+        for count in (2, 0, 1):
+            wishlist = WishlistsFactory(customer_id=7 if count else 8)
+            wishlist.create()
+            for _ in range(count):
+                WishlistItemsFactory(wishlist_id=wishlist.id).create()
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "wishlists.ndjson")
+            result = self.runner.invoke(
+                wishlists_export, ["--output", path, "--customer-id", "7", "--batch-size", "1"]
+            )
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("Exported 2 wishlists", result.output)
+            with open(path, encoding="utf-8") as file:
+                documents = [json.loads(line) for line in file]
+        self.assertEqual([len(document["wishlist_items"]) for document in documents], [2, 1])
+        self.assertEqual({document["customer_id"] for document in documents}, {7})
+
+    def test_wishlists_extract(self):
+        """It should extract the tables into partitioned CSV files"""
+        for _ in range(3):
+            wishlist = WishlistsFactory()
+            wishlist.create()
+            WishlistItemsFactory(wishlist_id=wishlist.id).create()
+
+        with tempfile.TemporaryDirectory() as folder:
+            result = self.runner.invoke(
+                wishlists_extract,
+                [folder, "--table", "wishlists", "--columns", "wishlists=id,name", "--workers", "2"],
+            )
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("Extracted 3 wishlists into", result.output)
+            self.assertEqual(os.listdir(folder), ["wishlists"])
+            with open(os.path.join(folder, "wishlists", "part-00000.csv"), encoding="utf-8") as file:
+                self.assertEqual(file.readline(), "id,name\n")
+
+            result = self.runner.invoke(wishlists_extract, [folder, "--columns", "items=id"])
+            self.assertEqual(result.exit_code, 2)
+            result = self.runner.invoke(wishlists_extract, [folder, "--columns", "wishlists=secret"])
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn("Unknown wishlists columns: secret", result.output)
+
+
+class TestImportCommand(TestCase):
+    """wishlists-import Command Tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config["TESTING"] = True
+        app.logger.setLevel(logging.CRITICAL)
+        app.app_context().push()
+
+    @classmethod
+    def tearDownClass(cls):
+        """This runs once after the entire test suite"""
+        db.session.close()
+
+    def setUp(self):
+        self.runner = CliRunner()
+        db.session.rollback()
+        db.session.query(WishlistItems).delete()
+        db.session.query(Wishlists).delete()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+
+    def test_wishlists_import_ndjson(self):
+        """It should import an NDJSON file and list the invalid lines"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "wishlists.ndjson")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write('{"customer_id": 7, "name": "a", "wishlist_items": [{"product_id": 1}]}\n')
+                file.write('{"customer_id": 7}\n')
+            result = self.runner.invoke(wishlists_import, [path, "--batch-size", "1"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("wishlists line 2: Missing key: name", result.output)
+        self.assertIn("Imported 1 wishlists and 1 items", result.output)
+        self.assertIn("skipped 1 invalid wishlists and 0 invalid items", result.output)
+        self.assertEqual([wishlist.item_count for wishlist in Wishlists.all()], [1])
+
+    def test_wishlists_import_csv(self):
+        """It should import CSV files of Wishlists and items"""
+        with tempfile.TemporaryDirectory() as folder:
+            wishlists, items = os.path.join(folder, "wishlists.csv"), os.path.join(folder, "items.csv")
+            with open(wishlists, "w", encoding="utf-8") as file:
+                file.write("id,customer_id,name\n77,7,a\n")
+            with open(items, "w", encoding="utf-8") as file:
+                file.write("wishlist_id,product_id\n77,1\n77,x\n")
+            result = self.runner.invoke(wishlists_import, [wishlists, "--items", items])
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("items line 3: Invalid type: product_id must be integer", result.output)
+            self.assertIn("Imported 1 wishlists and 1 items", result.output)
+
+            result = self.runner.invoke(wishlists_import, [items])
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn("Unknown CSV columns: wishlist_id, product_id", result.output)
+            result = self.runner.invoke(wishlists_import, [wishlists, "--format", "ndjson", "--items", items])
+            self.assertEqual(result.exit_code, 2)
+        self.assertEqual(Wishlists.find(77).item_count, 1)
+
+
+class TestGenerateCommand(TestCase):
+    """wishlists-generate Command Tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config["TESTING"] = True
+        app.logger.setLevel(logging.CRITICAL)
+        app.app_context().push()
+
+    @classmethod
+    def tearDownClass(cls):
+        """This runs once after the entire test suite"""
+        db.session.close()
+
+    def setUp(self):
+        self.runner = CliRunner()
+        db.session.rollback()
+
+    def tearDown(self):
+        db.session.remove()
+
+    def test_wishlists_generate(self):
+        """It should replace the Wishlists with the same generated ones for the same seed"""
+        WishlistsFactory(id=None).create()
+        args = ["--wishlists", "30", "--customers", "5", "--products", "50", "--max-items", "10", "--batch-size", "7"]
+        result = self.runner.invoke(wishlists_generate, args + ["--replace"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Created 28 wishlists", result.output)
+        self.assertIn("Generated 30 wishlists", result.output)
+        first = [wishlist.serialize() for wishlist in Wishlists.query.order_by(Wishlists.id)]
+        self.assertEqual([wishlist["id"] for wishlist in first], list(range(1, 31)))
+        self.assertTrue({wishlist["customer_id"] for wishlist in first} <= set(range(1, 6)))
+
+        result = self.runner.invoke(wishlists_generate, args + ["--replace"])
+        self.assertEqual(result.exit_code, 0)
+        db.session.expire_all()
+        self.assertEqual([wishlist.serialize() for wishlist in Wishlists.query.order_by(Wishlists.id)], first)
+
+        result = self.runner.invoke(wishlists_generate, ["--products", "5", "--max-items", "10"])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("max_items (10) cannot be more than the 5 products", result.output)
@@ -0,0 +1,122 @@
+######################################################################
+# Copyright 2016, 2024 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+JSON Provider Test Suite
+"""
+
+# pylint: disable=duplicate-code
+import sys
+import importlib.util
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+from uuid import UUID
+from wsgi import app
+from service.common import status
+from service.common.json_provider import FastJSONProvider, load_backend
+
+SAMPLE = {
+    "name": "Gift ideas",
+    "created_date": date(2025, 1, 31),
+    "last_item_added_at": datetime(2025, 1, 31, 12, 30, 15, 250, tzinfo=timezone.utc),
+    "price": Decimal("9.99"),
+    "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+    "items": [{"product_id": 1, "description": "café"}],
+}
+EXPECTED = (
+    '{"name":"Gift ideas","created_date":"2025-01-31",'
+    '"last_item_added_at":"2025-01-31T12:30:15.000250+00:00",'
+    '"price":"9.99","uuid":"12345678-1234-5678-1234-567812345678",'
+    '"items":[{"product_id":1,"description":"café"}]}'
+)
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestJSONBackends(TestCase):
+    """JSON Backend Tests"""
+
+    def test_json_backend(self):
+        """It should encode dates, decimals and UUIDs with the standard library"""
+        name, dumps, loads = load_backend("json")
+        self.assertEqual(name, "json")
+        self.assertEqual(dumps(SAMPLE).decode(), EXPECTED)
+        self.assertEqual(loads(EXPECTED)["items"][0]["description"], "café")
+        self.assertRaises(TypeError, dumps, {"set": {1, 2}})
+
+    @skipUnless(importlib.util.find_spec("orjson"), "orjson is not installed")
+    def test_orjson_backend(self):
+        """It should encode exactly like the standard library with orjson"""
+        name, dumps, loads = load_backend("orjson")
+        self.assertEqual(name, "orjson")
+        self.assertEqual(dumps(SAMPLE).decode(), EXPECTED)
+        self.assertEqual(loads(dumps(SAMPLE))["price"], "9.99")
+        self.assertEqual(load_backend()[0], "orjson")
+
+    @skipUnless(importlib.util.find_spec("msgspec"), "msgspec is not installed")
+    def test_msgspec_backend(self):  # pragma: no cover
+        """It should encode with msgspec and raise ValueError for bad JSON"""
+        name, dumps, loads = load_backend("msgspec")
+        self.assertEqual(name, "msgspec")
+        self.assertEqual(loads(dumps(SAMPLE))["created_date"], "2025-01-31")
+        self.assertRaises(ValueError, loads, b"{bad json")
+
+    def test_fallback(self):
+        """It should fall back to the standard library when a backend is missing"""
+        with patch.dict(sys.modules, {"orjson": None, "msgspec": None}):
+            self.assertEqual(load_backend("msgspec")[0], "json")
+            self.assertEqual(load_backend("orjson")[0], "json")
+            self.assertEqual(load_backend()[0], "json")
+
+    def test_unknown_backend(self):
+        """It should not accept an unknown backend"""
+        self.assertRaises(ValueError, load_backend, "yaml")
+
+
+class TestJSONProvider(TestCase):
+    """JSON Provider Tests"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_provider(self):
+        """It should use the fast JSON provider for the app"""
+        self.assertIsInstance(app.json, FastJSONProvider)
+        self.assertEqual(app.json.dumps(SAMPLE), EXPECTED)
+        self.assertEqual(app.json.loads(EXPECTED.encode())["name"], "Gift ideas")
+        with app.app_context():
+            response = app.json.response(SAMPLE)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.get_data(as_text=True), EXPECTED)
+
+    def test_responses(self):
+        """It should encode Flask and flask-restx responses with the provider"""
+        resp = self.client.get("/health")
+        self.assertEqual(resp.get_data(as_text=True), '{"status":"OK"}')
+        resp = self.client.get("/api/wishlists/0")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(resp.content_type, "application/json")
+        self.assertNotIn("\n", resp.get_data(as_text=True))
+
+    def test_bad_json(self):
+        """It should return 400 for a body that is not valid JSON"""
+        resp = self.client.post(
+            "/api/wishlists", data="{bad json", content_type="application/json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
@@ -28,7 +28,7 @@ from unittest.mock import patch
 from pytest import warns
 from service.models.persistent_base import PersistentBase
 from wsgi import app
-from service.models import DataValidationError, db
+from service.models import DataValidationError, VersionConflictError, db
 from service.models import Wishlists, WishlistItems
 from .factories import WishlistsFactory, WishlistItemsFactory
 from .factories import CUSTOMER_ID
@@ -400,6 +400,25 @@ class TestWishlistsModel(TestCase):
         )
         self.assertEqual(len(found), 2)
 
+    def test_find_wishlist_by_category_and_name(self):
+        """It should find Wishlists by category and name-like, with or without customer_id"""
+        samples = [
+            (CUSTOMER_ID, "gifts", "Birthday Gift"),
+            (CUSTOMER_ID, "GIFTS", "Holiday"),
+            (CUSTOMER_ID, "books", "gift books"),
+            (999, "gifts", "Gift ideas"),
+        ]
+        for customer_id, category, name in samples:
+            WishlistsFactory(customer_id=customer_id, category=category, name=name).create()
+
+        self.assertEqual(len(Wishlists.find_by_category("Gifts")), 3)
+        self.assertEqual(len(Wishlists.find_by_name_like("GIFT")), 3)
+        self.assertEqual(
+            len(Wishlists.find_by_customer_and_category(CUSTOMER_ID, "gifts")), 2
+        )
+        found = Wishlists.find_by_customer_category_name_like(CUSTOMER_ID, "gifts", "gift")
+        self.assertEqual([wishlist.name for wishlist in found], ["Birthday Gift"])
+
     def test_find_all_by_wishlist_id(self):
         """It should find all WishlistItems by wishlist_id"""
         wishlists = []
@@ -721,6 +740,108 @@ class TestWishlistsModel(TestCase):
         with self.assertRaises(DataValidationError):
             item.update()
 
+    def test_wishlist_version(self):
+        """It should increment the version when a Wishlist or its items change"""
+        wishlist = WishlistsFactory()
+        wishlist.create()
+        self.assertEqual(Wishlists.find_version(wishlist.id), 1)
+        self.assertIsNone(Wishlists.find_version(0))
+
+        wishlist.name = "New Name"
+        wishlist.update()
+        self.assertEqual(Wishlists.find_version(wishlist.id), 2)
+
+        # a flush without changes does not count
+        wishlist.name = "New Name"
+        wishlist.update()
+        self.assertEqual(Wishlists.find_version(wishlist.id), 2)
+
+        item = WishlistItemsFactory(wishlist_id=wishlist.id, product_id=42)
+        item.create()
+        self.assertEqual(Wishlists.find_version(wishlist.id), 3)
+
+        item.description = "changed"
+        item.update()
+        self.assertEqual(Wishlists.find_version(wishlist.id), 4)
+
+        # the Wishlist does not need to be loaded in the session
+        wishlist_id = wishlist.id
+        db.session.expunge_all()
+        item = WishlistItems.find_by_wishlist_and_product(wishlist_id, 42)
+        item.delete()
+        self.assertEqual(Wishlists.find_version(wishlist_id), 5)
+
+    def test_wishlist_item_summary(self):
+        """It should maintain item_count and last_item_added_at as items are added and removed"""
+        wishlist = WishlistsFactory()
+        wishlist.create()
+        self.assertEqual(wishlist.item_count, 0)
+        self.assertIsNone(wishlist.last_item_added_at)
+
+        items = [WishlistItemsFactory(wishlist_id=wishlist.id) for _ in range(3)]
+        for item in items:
+            item.create()
+        wishlist = Wishlists.find(wishlist.id)
+        self.assertEqual(wishlist.item_count, 3)
+        self.assertIsNotNone(wishlist.last_item_added_at)
+
+        items[0].delete()
+        data = Wishlists.find(wishlist.id).serialize()
+        self.assertEqual(data["item_count"], 2)
+        self.assertEqual(data["last_item_added_at"], wishlist.last_item_added_at.isoformat())
+
+    def test_create_wishlist_with_items(self):
+        """It should count the items of a new Wishlist and stamp the time they were added"""
+        wishlist = WishlistsFactory()
+        wishlist.wishlist_items.append(WishlistItemsFactory(position=1000))
+        wishlist.create()
+        found = Wishlists.find(wishlist.id)
+        self.assertEqual(found.item_count, 1)
+        self.assertIsNotNone(found.last_item_added_at)
+        self.assertEqual(found.last_item_added_at, found.wishlist_items[0].created_at)
+
+    @staticmethod
+    def _write_concurrently(wishlist_id: int):
+        """Simulates another request writing a Wishlist in its own transaction"""
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Wishlists)
+                .where(Wishlists.id == wishlist_id)
+                .values(version=Wishlists.version + 1)
+            )
+
+    def test_update_stale_wishlist(self):
+        """It should raise VersionConflictError when the Wishlist was changed by someone else"""
+        wishlist = WishlistsFactory()
+        wishlist.create()
+        self.assertEqual(wishlist.version, 1)
+        self._write_concurrently(wishlist.id)
+        wishlist.name = "New Name"
+        with self.assertRaises(VersionConflictError):
+            wishlist.update()
+        self.assertEqual(Wishlists.find_version(wishlist.id), 2)
+
+    def test_add_item_to_stale_wishlist(self):
+        """It should raise VersionConflictError when adding an item to a Wishlist changed by someone else"""
+        wishlist = WishlistsFactory()
+        wishlist.create()
+        self.assertEqual(wishlist.version, 1)
+        self._write_concurrently(wishlist.id)
+        item = WishlistItemsFactory(wishlist_id=wishlist.id)
+        with self.assertRaises(VersionConflictError):
+            item.create()
+        self.assertEqual(WishlistItems.find_all_by_wishlist_id(wishlist.id), [])
+
+    def test_delete_stale_wishlist(self):
+        """It should raise VersionConflictError when deleting a Wishlist changed by someone else"""
+        wishlist = WishlistsFactory()
+        wishlist.create()
+        self.assertEqual(wishlist.version, 1)
+        self._write_concurrently(wishlist.id)
+        with self.assertRaises(VersionConflictError):
+            wishlist.delete()
+        self.assertIsNotNone(Wishlists.find(wishlist.id))
+
     def test_delete_nonempty_wishlist(self):
         """It should delete a Wishlist with items in it"""
         wishlist = WishlistsFactory()